@@ -2,6 +2,8 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It serves the long lived Server-Sent Events change feed at
+/api/recipe/events, every other endpoint is served by the uwsgi workers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
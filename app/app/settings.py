@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +28,8 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = bool(int(os.environ.get("DEBUG", 0)))
 
+TESTING = "test" in sys.argv
+
 ALLOWED_HOSTS = []
 
 ALLOWED_HOSTS.extend(
@@ -62,15 +65,33 @@ if DEBUG:
 
 
 MIDDLEWARE = [
+    'core.middleware.ProbeMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.LoadSheddingMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.DefaultTimeoutsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PathMiddlewareDispatcher',
 ]
 
+# Middlewares PathMiddlewareDispatcher runs after MIDDLEWARE, for the first
+# prefix matching the request path. The API authenticates with tokens and
+# uses no sessions, CSRF cookies, messages or frames.
+PATH_MIDDLEWARE = {
+    "/api/": [],
+    "/": [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ],
+}
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -101,10 +122,31 @@ DATABASES = {
         'NAME': os.getenv("POSTGRES_DB"),
         "HOST": os.getenv("DB_HOST"),
         "USER": os.getenv("POSTGRES_USER"),
-        "PASSWORD": os.getenv("POSTGRES_PASSWORD")
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
+        # Seconds a connection is reused across requests, 0 closes it after
+        # every request.
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Server-side binding sends query parameters apart from the SQL, so psycopg
+# prepares the statements a connection ran DB_PREPARE_THRESHOLD times and
+# Postgres reuses their plans. Prepared statements belong to a server
+# connection, they are disabled behind a transaction pooling pgbouncer.
+# Statements of several commands, like some migrations, can not be prepared,
+# the threshold is at least 1 so statements run once are never prepared
+DB_PGBOUNCER = bool(int(os.getenv("DB_PGBOUNCER", 0)))
+DB_SERVER_SIDE_BINDING = bool(int(os.getenv("DB_SERVER_SIDE_BINDING", 0)))
+DB_PREPARE_THRESHOLD = max(1, int(os.getenv("DB_PREPARE_THRESHOLD", 5)))
+
+if DB_SERVER_SIDE_BINDING and not DB_PGBOUNCER:
+    DATABASES["default"]["OPTIONS"].update({
+        "server_side_binding": True,
+        "prepare_threshold": DB_PREPARE_THRESHOLD,
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -146,6 +188,39 @@ MEDIA_URL = 'files/media/'
 MEDIA_ROOT = "/vol/web/media"
 STATIC_ROOT = "/vol/web/static"
 
+# Static files get content hashed names in the release step, tests run
+# without collected files
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if TESTING else
+            "core.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Media files are private, Django checks ownership and nginx streams the file
+# from the internal location. Django streams them itself when it is disabled.
+MEDIA_ACCEL_REDIRECT = bool(
+    int(os.environ.get("MEDIA_ACCEL_REDIRECT", int(not DEBUG)))
+)
+MEDIA_ACCEL_REDIRECT_LOCATION = "/protected/media/"
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Resumable recipe image uploads
+RECIPE_IMAGE_UPLOAD_MAX_SIZE = 16 * 1024 * 1024
+RECIPE_IMAGE_UPLOAD_TTL = 60 * 60 * 24
+
+# Resized recipe image variants are created on demand and cached on disk
+RECIPE_IMAGE_MAX_DIMENSION = 2048
+RECIPE_IMAGE_CACHE_MAX_BYTES = int(
+    os.environ.get("RECIPE_IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -158,6 +233,10 @@ AUTH_USER_MODEL = "core.User"
 REST_FRAMEWORK = {
     # YOUR SETTINGS
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    "DEFAULT_THROTTLE_CLASSES": ["core.throttling.TokenBucketThrottle"],
+    # Proxies in front of the app, clients are identified by the address
+    # they added to X-Forwarded-For
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 # DRF-Spectacular Settings
@@ -174,5 +253,139 @@ SPECTACULAR_SETTINGS = {
     # 'SERVE_INCLUDE_SCHEMA': False,
 }
 
-# trailing slash warning silenced
-SILENCED_SYSTEM_CHECKS = ['urls.W002']
+# Version of the deployed code, the prebuilt OpenAPI schema is rebuilt when
+# it changes. Defaults to a digest of the Python sources
+CODE_VERSION = os.environ.get("CODE_VERSION", "")
+SCHEMA_DIR = os.environ.get("SCHEMA_DIR", "/vol/web/schema")
+
+# Most distinct IDs of the tags and ingredients filters of recipes
+FILTER_MAX_IDS = 100
+
+# Seconds the sync cursor overlaps the previous sync, covers transactions
+# committing rows with an updated_at older than the cursor
+SYNC_CURSOR_OVERLAP = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Server-Sent Events change feed, "postgres" fans events out across processes
+# with LISTEN/NOTIFY, from the uwsgi workers to the ASGI process, "local" only
+# reaches subscribers of the same process
+EVENTS_BACKEND = os.environ.get(
+    "EVENTS_BACKEND", "local" if TESTING else "postgres"
+)
+EVENTS_QUEUE_SIZE = 100
+EVENTS_MAX_SUBSCRIBERS = 1000
+EVENTS_KEEPALIVE = 15
+EVENTS_MAX_CONNECTION_AGE = 5 * 60
+
+# Informational messages of the project modules, like the boot time of
+# app.wsgi, go to stderr next to the uwsgi log
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "app": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# Metrics of every worker process are written to METRICS_DIR and summed by
+# the metrics endpoint, only the current process is reported without it
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Server-Timing header of authenticated requests and request profiling,
+# profiles of sampled requests and of requests sending an X-Profile header
+# with a staff token go to PROFILING_DIR
+SERVER_TIMING = bool(int(os.environ.get("SERVER_TIMING", 0)))
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "/tmp/profiles")
+
+# Slow query log, the slowest SELECTs of every SQL fingerprint are kept with
+# their EXPLAIN plan, a threshold of 0 disables the log. EXPLAIN ANALYZE runs
+# the query again within the slow request, only with
+# SLOW_QUERY_EXPLAIN_ANALYZE=1
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_EXPLAIN_TOP = 3
+SLOW_QUERY_EXPLAIN_ANALYZE = bool(
+    int(os.environ.get("SLOW_QUERY_EXPLAIN_ANALYZE", 0))
+)
+SLOW_QUERY_BUFFER_SIZE = 200
+SLOW_QUERY_LOG_DIR = os.environ.get("SLOW_QUERY_LOG_DIR", "/tmp/slow-queries")
+
+# Views over their query budget raise in DEBUG and tests, they are logged
+# and counted in production
+QUERY_BUDGET_RAISE = DEBUG or TESTING
+
+# Postgres statement_timeout and lock_timeout of API view handlers in
+# milliseconds, views override them per action. Cancelled statements get 504
+# responses and lock timeouts 503 responses
+STATEMENT_TIMEOUT_MS = int(os.environ.get("STATEMENT_TIMEOUT_MS", 5000))
+LOCK_TIMEOUT_MS = int(os.environ.get("LOCK_TIMEOUT_MS", 2000))
+
+# Seconds readiness check results are reused
+PROBE_CACHE_TTL = 5
+
+# Responses of these content types larger than COMPRESSION_MIN_SIZE bytes are
+# compressed with brotli, when installed, or gzip. Types ending with a slash
+# match any subtype
+COMPRESSION = bool(int(os.environ.get("COMPRESSION", 1)))
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_CONTENT_TYPES = [
+    "application/json",
+    "application/vnd.oai.openapi",
+    "application/vnd.oai.openapi+json",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+]
+
+# Seconds the nginx micro-cache may reuse recipe, tag and ingredient reads of
+# a token, 0 disables caching
+API_MICROCACHE_SECONDS = int(os.environ.get("API_MICROCACHE_SECONDS", 0))
+
+# Token buckets of API clients per scope, a burst of N requests refilled
+# over the period, users are throttled by account and anonymous clients by
+# address
+THROTTLING = bool(int(os.environ.get("THROTTLING", 1)))
+THROTTLE_RATES = {
+    "login": os.environ.get("THROTTLE_RATE_LOGIN", "10/min"),
+    "read": os.environ.get("THROTTLE_RATE_READ", "600/min"),
+    "write": os.environ.get("THROTTLE_RATE_WRITE", "120/min"),
+    "upload": os.environ.get("THROTTLE_RATE_UPLOAD", "60/min"),
+}
+THROTTLE_BUCKET_IDLE_DAYS = 1
+
+# Load shedding, while requests wait in the uwsgi listen queue or a route
+# class is slower than its target, a growing share of the classes of
+# LOAD_SHEDDING_ORDER is answered with 503 responses, first to last. Reads
+# are never shed
+LOAD_SHEDDING = bool(int(os.environ.get("LOAD_SHEDDING", int(not TESTING))))
+LOAD_SHEDDING_QUEUE_TARGET_MS = int(
+    os.environ.get("LOAD_SHEDDING_QUEUE_TARGET_MS", 100)
+)
+LOAD_SHEDDING_LATENCY_TARGETS_MS = {
+    "read": 500,
+    "auth": 1000,
+    "write": 1000,
+    "upload": 5000,
+}
+LOAD_SHEDDING_ORDER = ["upload", "write", "auth"]
+LOAD_SHEDDING_INTERVAL = 1
+LOAD_SHEDDING_RETRY_AFTER = 5
+
+# trailing slash warning silenced, the session, authentication, messages,
+# CSRF and clickjacking middlewares the admin and security checks look for
+# in MIDDLEWARE run from PATH_MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = [
+    'urls.W002',
+    "admin.E408",
+    "admin.E409",
+    "admin.E410",
+    "security.W002",
+    "security.W003",
+]
@@ -16,29 +16,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
-from django.conf import settings
-
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView
-)
 
 from core import views as core_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/health-check", core_views.health_check, name="health-check"),
-    path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
+    path("api/health/live", core_views.liveness, name="liveness"),
+    path("api/health/ready", core_views.readiness, name="readiness"),
+    path("api/metrics", core_views.metrics, name="metrics"),
+    path("api/schema/", core_views.openapi_schema, name="api-schema"),
     path("api/docs/",
-         SpectacularSwaggerView.as_view(url_name="api-schema"),
+         core_views.SwaggerView.as_view(url_name="api-schema"),
          name="api-docs"),
     path("api/user", include("user.urls", namespace="user")),
     path("api/recipe", include("recipe.urls", namespace="recipe")),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT
-    )
@@ -7,10 +7,64 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 """
 
+import gc
+import logging
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+logger = logging.getLogger(__name__)
+
 application = get_wsgi_application()
+
+# Import every view, serializer and model module and build the URL resolver
+# before uwsgi forks, so workers share them instead of each loading them on
+# their first requests.
+get_resolver().reverse_dict
+
+# Read the schema built at release, or build it once for every worker. DRF
+# modules can only be imported once settings are configured.
+from core import schema  # noqa: E402
+
+for schema_format in schema.RENDERERS:
+    schema.get(schema_format)
+
+# Workers must not share connections opened while loading.
+connections.close_all()
+
+# Objects loaded so far live as long as the process. Moving them out of the
+# collector's generations keeps collections from touching, and so copying,
+# the pages shared with the master.
+gc.freeze()
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    # Not running under uwsgi.
+    postfork = None
+
+if postfork is not None:
+    @postfork
+    def connect_worker() -> None:
+        """Open the persistent database connection of the worker before its
+        first request."""
+        connection = connections["default"]
+
+        if connection.settings_dict["CONN_MAX_AGE"] == 0:
+            return
+
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            # The first request connects again.
+            pass
+
+# run.sh records when the container started booting.
+if "BOOT_STARTED_AT" in os.environ:
+    boot_time = time.time() - float(os.environ["BOOT_STARTED_AT"])
+    logger.info("Application loaded %.2fs after boot started.", boot_time)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self) -> None:
+        from django.db.models import UUIDField
+
+        from core import signals  # noqa: F401
+        from core.lookups import Any
+
+        UUIDField.register_lookup(Any)
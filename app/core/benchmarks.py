@@ -0,0 +1,62 @@
+"""
+Helpers shared by the benchmark commands.
+"""
+import json
+import math
+import platform
+import re
+import statistics
+
+from django.utils import timezone
+
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Return the nearest-rank percentile of the values."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+
+    return ordered[rank - 1]
+
+
+def summarize(durations: list[float], elapsed: float | None = None) -> dict:
+    """Return latency percentiles of durations in seconds as milliseconds,
+    with the throughput when the elapsed wall time is given."""
+    summary = {
+        "count": len(durations),
+        "mean_ms": round(statistics.fmean(durations) * 1000, 3)
+        if durations else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+    }
+
+    if elapsed:
+        summary["throughput_rps"] = round(len(durations) / elapsed, 2)
+
+    return summary
+
+
+def server_timing_queries(header: str | None) -> int | None:
+    """Return the query count reported in a Server-Timing header."""
+    match = _QUERIES.search(header or "")
+    return int(match[1]) if match else None
+
+
+def write_results(path: str, benchmark: str, results: dict) -> None:
+    """Write benchmark results as JSON with the environment they were
+    measured in, so runs can be compared."""
+    document = {
+        "benchmark": benchmark,
+        "created_at": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
@@ -0,0 +1,79 @@
+"""
+Compression of responses and static files.
+
+Brotli is used when the brotli package is installed, gzip otherwise.
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Levels of files compressed once at collectstatic time.
+GZIP_BEST = 9
+BROTLI_BEST = 11
+
+
+def encodings() -> list[str]:
+    """Return the available content codings, preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Return the preferred available coding of an Accept-Encoding header,
+    or None when the client accepts none of them."""
+    weights = {}
+
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        weight = 1.0
+
+        for param in params:
+            key, _, value = param.strip().partition("=")
+
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+
+    for coding in encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+
+        if weight > best_weight:
+            best, best_weight = coding, weight
+
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    """Return whether responses of the content type are compressed, types
+    ending with a slash in COMPRESSION_CONTENT_TYPES match any subtype."""
+    media_type = content_type.split(";")[0].strip().lower()
+
+    return any(
+        media_type.startswith(allowed) if allowed.endswith("/")
+        else media_type == allowed
+        for allowed in settings.COMPRESSION_CONTENT_TYPES
+    )
+
+
+def compress(content: bytes, coding: str, best: bool = False) -> bytes:
+    """Compress the content with the coding, at the slowest and smallest
+    level when best is set."""
+    if coding == "br":
+        quality = BROTLI_BEST if best else settings.COMPRESSION_BROTLI_QUALITY
+        return brotli.compress(content, quality=quality)
+
+    return gzip.compress(
+        content,
+        compresslevel=GZIP_BEST if best else settings.COMPRESSION_GZIP_LEVEL,
+        mtime=0
+    )
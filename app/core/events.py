@@ -0,0 +1,195 @@
+"""
+Change events fan-out to Server-Sent Events subscribers.
+
+Events are published from model signals. The local backend delivers them to
+subscribers of the same process, the postgres backend sends them with
+NOTIFY so every ASGI process LISTENing on the channel receives them.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import AsyncIterator
+
+import psycopg
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "recipe_events"
+RESYNC = {"type": "resync"}
+
+
+class TooManySubscribers(Exception):
+    """Subscriber limit of the process is reached."""
+
+
+class Subscription:
+    """Bounded event queue of a single SSE connection. A client too slow to
+    keep up gets a resync event instead of unbounded buffering."""
+
+    def __init__(self, user_id: str, maxsize: int) -> None:
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event: dict) -> None:
+        """Queue an event, must run in the subscription's event loop."""
+        if self.overflowed:
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+            self.queue.put_nowait(RESYNC)
+
+
+class Broker:
+    """In-process registry of subscriptions per user."""
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Create and register a subscription for the user's events."""
+        subscription = Subscription(
+            str(user_id), settings.EVENTS_QUEUE_SIZE
+        )
+
+        with self._lock:
+            if self._count >= settings.EVENTS_MAX_SUBSCRIBERS:
+                raise TooManySubscribers()
+
+            self._subscriptions[subscription.user_id].add(subscription)
+            self._count += 1
+
+        if settings.EVENTS_BACKEND == "postgres" and (
+                self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove the subscription from the registry."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def deliver(self, user_id: str, event: dict) -> None:
+        """Hand the event to the user's subscriptions, callable from any
+        thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.put, event
+                )
+            except RuntimeError:
+                # Event loop of the subscription is already closed.
+                self.unsubscribe(subscription)
+
+    async def _listen(self) -> None:
+        """Deliver events NOTIFYed by any process to the subscribers of this
+        process, reconnecting after connection failures."""
+        db = settings.DATABASES["default"]
+        delay = 1
+
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    dbname=db["NAME"],
+                    host=db["HOST"],
+                    port=db.get("PORT") or None,
+                    user=db["USER"],
+                    password=db["PASSWORD"],
+                    autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    delay = 1
+
+                    async for notify in conn.notifies():
+                        try:
+                            message = json.loads(notify.payload)
+                            user_id, event = message["user"], message["event"]
+                        except (ValueError, KeyError, TypeError):
+                            logger.exception(
+                                "Malformed change event %r.", notify.payload
+                            )
+                            continue
+
+                        self.deliver(user_id, event)
+            except psycopg.Error:
+                logger.exception("Listening for change events failed.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+broker = Broker()
+
+
+def publish(user_id: str, event: dict) -> None:
+    """Publish a change event of the user once the current transaction
+    commits."""
+    if settings.EVENTS_BACKEND == "postgres":
+        # NOTIFY is transactional, it is only delivered on commit.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                [CHANNEL, json.dumps({"user": str(user_id), "event": event})]
+            )
+    else:
+        transaction.on_commit(lambda: broker.deliver(user_id, event))
+
+
+def format_event(event: dict) -> str:
+    """Format an event in the text/event-stream format."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream(subscription: Subscription) -> AsyncIterator[str]:
+    """Yield the subscription's events as text/event-stream messages with
+    periodic keepalive comments. Connections are closed after
+    EVENTS_MAX_CONNECTION_AGE seconds, so subscriptions of vanished clients
+    can not pile up; EventSource clients reconnect on their own."""
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + settings.EVENTS_MAX_CONNECTION_AGE
+
+    try:
+        yield "retry: 5000\n\n"
+
+        while (timeout := closes_at - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    min(timeout, settings.EVENTS_KEEPALIVE)
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield format_event(event)
+
+            if event is RESYNC:
+                break
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,330 @@
+"""
+Django command to benchmark the API over HTTP.
+"""
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from PIL import Image
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+from django.urls import reverse
+
+from core.benchmarks import server_timing_queries, summarize, write_results
+from core.management.commands.seed_bench import bench_email
+
+SCENARIOS = [
+    "token", "list", "filter", "detail", "create", "update", "upload"
+]
+
+
+class Client:
+    """Minimal HTTP client of a benchmark user."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token: str | None = None
+
+    def request(self, method: str, path: str, body: bytes | None = None,
+                content_type: str | None = None) -> tuple[int, dict, bytes]:
+        """Send a request and return its status, headers and body."""
+        request = Request(self.base_url + path, data=body, method=method)
+
+        if self.token:
+            request.add_header("Authorization", f"Token {self.token}")
+
+        if content_type:
+            request.add_header("Content-Type", content_type)
+
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.headers, response.read()
+        except HTTPError as error:
+            return error.code, error.headers, error.read()
+
+    def json(self, method: str, path: str, data=None) -> tuple[int, Any]:
+        """Send a JSON request and return its status and decoded body."""
+        body = json.dumps(data).encode() if data is not None else None
+        status, _, content = self.request(
+            method, path, body, "application/json" if body else None
+        )
+
+        return status, json.loads(content) if content else None
+
+
+def _image() -> bytes:
+    """Return a small JPEG image."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _multipart(field: str, filename: str,
+               content: bytes) -> tuple[bytes, str]:
+    """Encode a single file as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; '
+        f'filename="{filename}"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Command(BaseCommand):
+    """Django command to measure the latency, throughput and queries per
+    request of the API routes under concurrency."""
+    help = (
+        "Benchmark API routes over HTTP against a running server started "
+        "with THROTTLING=0."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=4,
+            help="Number of seed_bench users the requests are spread over."
+        )
+        parser.add_argument("--password", default="benchpass123")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per scenario."
+        )
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma separated scenarios of {', '.join(SCENARIOS)}."
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to the file."
+        )
+
+    def _login(self, client: Client, email: str, password: str) -> None:
+        """Obtain the auth token of the client's user."""
+        status, data = self._token(client, email, password)
+
+        if status != 200:
+            raise CommandError(f"Login of {email} failed: {data}")
+
+        client.token = data["token"]
+
+    def _token(self, client: Client, email: str,
+               password: str) -> tuple[int, Any]:
+        """Request an auth token."""
+        status, _, content = client.request(
+            "POST", reverse("user:token"),
+            urlencode({"email": email, "password": password}).encode(),
+            "application/x-www-form-urlencoded"
+        )
+
+        return status, json.loads(content) if content else None
+
+    def _prepare(self, options: dict) -> list[dict]:
+        """Log the users in and collect the ids the scenarios use."""
+        users = []
+
+        for number in range(options["users"]):
+            client = Client(options["base_url"], options["timeout"])
+            email = bench_email(number)
+            self._login(client, email, options["password"])
+            _, recipes = client.json("GET", reverse("recipe:recipe-list"))
+            _, tags = client.json("GET", reverse("recipe:tag-list"))
+            _, ingredients = client.json(
+                "GET", reverse("recipe:ingredient-list")
+            )
+
+            if not recipes:
+                raise CommandError(f"{email} has no recipes, run seed_bench.")
+
+            users.append({
+                "client": client,
+                "email": email,
+                "recipes": [recipe["id"] for recipe in recipes],
+                "tags": [tag["id"] for tag in tags],
+                "tag_names": [tag["name"] for tag in tags],
+                "ingredient_names": [
+                    ingredient["name"] for ingredient in ingredients
+                ],
+            })
+
+        return users
+
+    def _scenario(self, name: str, user: dict, options: dict,
+                  rng: random.Random) -> Callable[[], tuple[int, dict]]:
+        """Return a function sending one request of the scenario."""
+        client: Client = user["client"]
+        recipe = rng.choice(user["recipes"])
+        detail = reverse("recipe:recipe-detail", args=(recipe,))
+
+        def send(method, path, body=None, content_type=None):
+            status, headers, _ = client.request(
+                method, path, body, content_type
+            )
+            return status, headers
+
+        if name == "token":
+            return lambda: send(
+                "POST", reverse("user:token"),
+                urlencode({"email": user["email"],
+                           "password": options["password"]}).encode(),
+                "application/x-www-form-urlencoded"
+            )
+        if name == "list":
+            return lambda: send("GET", reverse("recipe:recipe-list"))
+        if name == "filter":
+            tags = ",".join(
+                rng.sample(user["tags"], min(2, len(user["tags"])))
+            )
+            return lambda: send(
+                "GET",
+                f"{reverse('recipe:recipe-list')}?{urlencode({'tags': tags})}"
+            )
+        if name == "detail":
+            return lambda: send("GET", detail)
+        if name == "create":
+            # Existing names, concurrent creates of a new tag would race.
+            body = json.dumps({
+                "title": "Benchmark Recipe",
+                "time_minutes": 10,
+                "price": "4.50",
+                "tags": [
+                    {"name": tag}
+                    for tag in rng.sample(
+                        user["tag_names"], min(2, len(user["tag_names"]))
+                    )
+                ],
+                "ingredients": [
+                    {"name": ingredient}
+                    for ingredient in rng.sample(
+                        user["ingredient_names"],
+                        min(3, len(user["ingredient_names"]))
+                    )
+                ],
+            }).encode()
+            return lambda: send("POST", reverse("recipe:recipe-list"), body,
+                                "application/json")
+        if name == "update":
+            body = json.dumps({"title": f"Updated {rng.random()}"}).encode()
+            return lambda: send("PATCH", detail,
+                                body, "application/json")
+        if name == "upload":
+            body, content_type = _multipart("image", "bench.jpg", _image())
+            return lambda: send(
+                "POST",
+                reverse("recipe:recipe-upload-image", args=(recipe,)),
+                body, content_type
+            )
+
+        raise CommandError(f"Unknown scenario {name}.")
+
+    def _run(self, name: str, users: list[dict], options: dict) -> dict:
+        """Send the requests of a scenario concurrently and summarize
+        them."""
+        rng = random.Random(name)
+        calls = [
+            self._scenario(name, users[index % len(users)], options, rng)
+            for index in range(options["requests"])
+        ]
+        durations, queries, errors, throttled = [], [], 0, 0
+        lock = threading.Lock()
+
+        def timed(call) -> None:
+            nonlocal errors, throttled
+            start = time.perf_counter()
+
+            try:
+                status, headers = call()
+            except (URLError, OSError):
+                status, headers = None, {}
+
+            duration = time.perf_counter() - start
+            count = server_timing_queries(headers.get("Server-Timing"))
+
+            with lock:
+                if status is None or status >= 400:
+                    errors += 1
+
+                if status == 429:
+                    throttled += 1
+                else:
+                    durations.append(duration)
+
+                if count is not None:
+                    queries.append(count)
+
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            list(executor.map(timed, calls))
+
+        # Throttled requests are answered without reaching the view, their
+        # latency would measure the throttle.
+        if throttled:
+            raise CommandError(
+                f"{throttled} {name} requests were throttled, run the server "
+                "with THROTTLING=0."
+            )
+
+        summary = summarize(durations, time.perf_counter() - start)
+        summary["errors"] = errors
+        summary["queries_per_request"] = (
+            round(sum(queries) / len(queries), 2) if queries else None
+        )
+
+        return summary
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        scenarios = [name.strip() for name in options["scenarios"].split(",")]
+        unknown = set(scenarios) - set(SCENARIOS)
+
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}.")
+
+        users = self._prepare(options)
+        results = {
+            "base_url": options["base_url"],
+            "concurrency": options["concurrency"],
+            "scenarios": {},
+        }
+
+        for name in scenarios:
+            summary = self._run(name, users, options)
+            results["scenarios"][name] = summary
+            queries = summary["queries_per_request"]
+            self.stdout.write(
+                f"{name:8} {summary['throughput_rps']:>9.1f} req/s  "
+                f"p50 {summary['p50_ms']:>8.1f} ms  "
+                f"p95 {summary['p95_ms']:>8.1f} ms  "
+                f"p99 {summary['p99_ms']:>8.1f} ms  "
+                f"errors {summary['errors']:>4}  "
+                f"queries {'-' if queries is None else queries}"
+            )
+
+        if options["output"]:
+            write_results(options["output"], "bench_api", results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Results written to {options['output']}."
+            ))
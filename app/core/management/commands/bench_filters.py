@@ -0,0 +1,103 @@
+"""
+Django command to benchmark the recipe ID list filters.
+"""
+import time
+import uuid
+from typing import Any
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+
+from core.benchmarks import summarize, write_results
+from core.management.commands.seed_bench import bench_email
+from core.models import Recipe, Tag, User
+
+LOOKUPS = ["in", "any"]
+
+
+class Command(BaseCommand):
+    """Django command to time filtering the recipes of a benchmark user by
+    lists of tag IDs with a placeholder per ID (`__in`) and with a single
+    array parameter (`__any`)."""
+    help = "Benchmark the IN list and ANY array filters of recipes."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--ids",
+            type=int,
+            action="append",
+            help="Number of IDs filtered, repeatable. Defaults to 10, 100 "
+                 "and 1000."
+        )
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument(
+            "--user",
+            type=int,
+            default=0,
+            help="Number of the benchmark user created by seed_bench."
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to the file."
+        )
+
+    def _run(self, user: User, lookup: str, ids: list[uuid.UUID],
+             options: dict) -> dict:
+        """Run the filter query and summarize its durations."""
+        queryset = Recipe.objects.filter(
+            user=user, **{f"tags__id__{lookup}": ids}
+        ).distinct()
+        durations = []
+
+        for number in range(options["warmup"] + options["queries"]):
+            start = time.perf_counter()
+            list(queryset.values_list("id", flat=True))
+            duration = time.perf_counter() - start
+
+            if number >= options["warmup"]:
+                durations.append(duration)
+
+        sql, params = queryset.values_list("id").query.sql_with_params()
+        summary = summarize(durations, sum(durations))
+        summary["sql_chars"] = len(sql)
+        summary["params"] = len(params)
+
+        return summary
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        try:
+            user = User.objects.get(email=bench_email(options["user"]))
+        except User.DoesNotExist:
+            raise CommandError("Benchmark user not found, run seed_bench.")
+
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list("id", flat=True)
+        )
+        results = {"queries": options["queries"], "ids": {}}
+
+        for count in options["ids"] or [10, 100, 1000]:
+            # The user's tags, padded with IDs matching nothing.
+            ids = (tag_ids + [uuid.uuid4() for _ in range(count)])[:count]
+            results["ids"][count] = {}
+            self.stdout.write(f"{count} IDs")
+
+            for lookup in LOOKUPS:
+                summary = self._run(user, lookup, ids, options)
+                results["ids"][count][lookup] = summary
+                self.stdout.write(
+                    f"  {lookup:4} sql {summary['sql_chars']:>6} chars  "
+                    f"params {summary['params']:>5}  "
+                    f"mean {summary['mean_ms']:>7.3f} ms  "
+                    f"p99 {summary['p99_ms']:>7.3f} ms"
+                )
+
+        if options["output"]:
+            write_results(options["output"], "bench_filters", results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Results written to {options['output']}."
+            ))
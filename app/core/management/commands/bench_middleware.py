@@ -0,0 +1,118 @@
+"""
+Django command to benchmark the per-request overhead of the middleware.
+"""
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandParser
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from core.benchmarks import summarize, write_results
+
+DISPATCHER = "core.middleware.PathMiddlewareDispatcher"
+
+
+def stacks() -> dict[str, list[str]]:
+    """Return the middleware stacks to compare: none, every middleware
+    for every path as before the dispatcher, and the dispatched one."""
+    flat = []
+
+    for path in settings.MIDDLEWARE:
+        if path == DISPATCHER:
+            flat.extend(settings.PATH_MIDDLEWARE["/"])
+        else:
+            flat.append(path)
+
+    return {
+        "none": [],
+        "flat": flat,
+        "dispatched": list(settings.MIDDLEWARE),
+    }
+
+
+class Command(BaseCommand):
+    """Django command to time requests through the middleware stacks
+    in-process, without a server, so the difference between stacks is the
+    middleware overhead."""
+    help = "Benchmark the per-request overhead of the middleware stacks."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--path",
+            action="append",
+            help="Request path, repeatable. Defaults to the health check."
+        )
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--warmup", type=int, default=200)
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to the file."
+        )
+
+    def _run(self, middleware: list[str], path: str, options: dict) -> dict:
+        """Send the requests through a handler with the middleware and
+        summarize their durations."""
+        with override_settings(
+            MIDDLEWARE=middleware,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            handler = BaseHandler()
+            handler.load_middleware()
+            factory = RequestFactory()
+            durations = []
+
+            for number in range(options["warmup"] + options["requests"]):
+                request = factory.get(path)
+                start = time.perf_counter()
+                response = handler.get_response(request)
+                duration = time.perf_counter() - start
+                response.close()
+
+                if number >= options["warmup"]:
+                    durations.append(duration)
+
+        summary = summarize(durations, sum(durations))
+        summary["status"] = response.status_code
+
+        return summary
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        paths = options["path"] or [reverse("health-check")]
+        results = {"requests": options["requests"], "paths": {}}
+
+        for path in paths:
+            results["paths"][path] = {}
+            self.stdout.write(path)
+
+            for name, middleware in stacks().items():
+                summary = self._run(middleware, path, options)
+                results["paths"][path][name] = summary
+                self.stdout.write(
+                    f"  {name:10} status {summary['status']}  "
+                    f"mean {summary['mean_ms'] * 1000:>8.1f} us  "
+                    f"p50 {summary['p50_ms'] * 1000:>8.1f} us  "
+                    f"p99 {summary['p99_ms'] * 1000:>8.1f} us"
+                )
+
+            overhead = {
+                name: round((
+                    results["paths"][path][name]["mean_ms"]
+                    - results["paths"][path]["none"]["mean_ms"]
+                ) * 1000, 1)
+                for name in ("flat", "dispatched")
+            }
+            results["paths"][path]["overhead_us"] = overhead
+            self.stdout.write(
+                f"  overhead   flat {overhead['flat']} us  "
+                f"dispatched {overhead['dispatched']} us"
+            )
+
+        if options["output"]:
+            write_results(options["output"], "bench_middleware", results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Results written to {options['output']}."
+            ))
@@ -0,0 +1,157 @@
+"""
+Django command to benchmark server-side binding and prepared statements.
+"""
+import re
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import summarize, write_results
+from core.management.commands.seed_bench import bench_email
+from core.models import Recipe, User
+
+_PLANNING_TIME = re.compile(r"Planning Time: ([\d.]+) ms")
+
+
+def modes(threshold: int) -> dict[str, dict]:
+    """Return the database OPTIONS of the compared modes: parameters merged
+    into the SQL by psycopg, sent apart, and sent apart to statements
+    prepared after the threshold."""
+    return {
+        "client": {},
+        "server": {"server_side_binding": True},
+        "prepared": {
+            "server_side_binding": True, "prepare_threshold": threshold
+        },
+    }
+
+
+def planning_ms(queries: list[dict]) -> float:
+    """Return the time Postgres spends planning the queries, the time
+    prepared statements reusing a generic plan save."""
+    total = 0.0
+
+    with connection.cursor() as cursor:
+        for query in queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+
+            cursor.execute(f"EXPLAIN (SUMMARY) {query['sql']}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            total += float(_PLANNING_TIME.search(plan)[1])
+
+    return round(total, 3)
+
+
+class Command(BaseCommand):
+    """Django command to time the recipe list and detail requests of a
+    benchmark user in-process, reconnecting the database in every mode."""
+    help = "Benchmark the recipe APIs with and without prepared statements."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument(
+            "--prepare-threshold",
+            type=int,
+            default=settings.DB_PREPARE_THRESHOLD
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            default=0,
+            help="Number of the benchmark user created by seed_bench."
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to the file."
+        )
+
+    def _reconnect(self, options: dict) -> None:
+        """Connect again with the database OPTIONS."""
+        connection.close()
+        connection.settings_dict["OPTIONS"] = options
+        connection.ensure_connection()
+
+    def _run(self, client: Client, path: str, options: dict) -> dict:
+        """Request the path and summarize the durations."""
+        durations = []
+
+        for number in range(options["warmup"] + options["requests"]):
+            start = time.perf_counter()
+            response = client.get(path)
+            duration = time.perf_counter() - start
+
+            if response.status_code != 200:
+                raise CommandError(f"{path} answered {response.status_code}.")
+
+            if number >= options["warmup"]:
+                durations.append(duration)
+
+        return summarize(durations, sum(durations))
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        try:
+            user = User.objects.get(email=bench_email(options["user"]))
+        except User.DoesNotExist:
+            raise CommandError("Benchmark user not found, run seed_bench.")
+
+        recipe = Recipe.objects.filter(user=user).first()
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+        paths = {
+            "list": reverse("recipe:recipe-list"),
+            "detail": reverse("recipe:recipe-detail", args=[recipe.id]),
+        }
+        original = connection.settings_dict["OPTIONS"]
+        results = {"requests": options["requests"], "paths": {}}
+
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            THROTTLING=False
+        ):
+            for name, path in paths.items():
+                self._reconnect({})
+
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(path)
+
+                results["paths"][name] = {
+                    "planning_ms": planning_ms(queries.captured_queries)
+                }
+                self.stdout.write(
+                    f"{name}  planning "
+                    f"{results['paths'][name]['planning_ms']} ms"
+                )
+
+                try:
+                    for mode, database_options in modes(
+                            options["prepare_threshold"]).items():
+                        self._reconnect(database_options)
+                        summary = self._run(client, path, options)
+                        results["paths"][name][mode] = summary
+                        self.stdout.write(
+                            f"  {mode:8} mean {summary['mean_ms']:>7.3f} ms  "
+                            f"p50 {summary['p50_ms']:>7.3f} ms  "
+                            f"p99 {summary['p99_ms']:>7.3f} ms"
+                        )
+                finally:
+                    self._reconnect(original)
+
+        if options["output"]:
+            write_results(options["output"], "bench_prepared", results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Results written to {options['output']}."
+            ))
@@ -0,0 +1,202 @@
+"""
+Django command to compare the memory and latency of uwsgi configurations.
+"""
+import json
+import os
+import signal
+import subprocess
+import tempfile
+import time
+from io import StringIO
+from typing import Any
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+from django.urls import reverse
+
+from core.benchmarks import write_results
+
+MODES = {
+    # Application loaded in the master and shared with forked workers.
+    "preload": [],
+    # Application loaded in every worker after forking.
+    "lazy": ["--lazy-apps"],
+}
+
+
+def memory_usage(pid: int) -> dict[str, int]:
+    """Return the resident, proportional and unique set size of a process
+    in KiB."""
+    usage = {}
+
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                usage[key] = int(value.split()[0])
+
+    return {
+        "rss_kib": usage["Rss"],
+        "pss_kib": usage["Pss"],
+        "uss_kib": usage["Private_Clean"] + usage["Private_Dirty"],
+    }
+
+
+def children(pid: int) -> list[int]:
+    """Return the child process ids of a process."""
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return [int(child) for child in file.read().split()]
+
+
+class Command(BaseCommand):
+    """Django command to run the API under uwsgi in several modes and
+    report the memory of its processes and bench_api latencies."""
+    help = "Compare memory and latency of uwsgi preloading and lazy apps."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--ini",
+            default=str(settings.BASE_DIR.parent / "scripts" / "uwsgi.ini")
+        )
+        parser.add_argument("--port", type=int, default=9100)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--modes",
+            default=",".join(MODES),
+            help=f"Comma separated modes of {', '.join(MODES)}."
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to the file."
+        )
+
+    def _wait_ready(self, base_url: str, process: subprocess.Popen) -> None:
+        """Wait until the liveness probe answers."""
+        deadline = time.monotonic() + 60
+
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("uwsgi exited before becoming ready.")
+
+            try:
+                with urlopen(base_url + reverse("liveness"), timeout=1):
+                    return
+            except (URLError, OSError):
+                time.sleep(0.2)
+
+        raise CommandError("uwsgi did not become ready in 60s.")
+
+    def _run(self, mode: str, options: dict, directory: str) -> dict:
+        """Start uwsgi in the mode, benchmark it and stop it."""
+        base_url = f"http://127.0.0.1:{options['port']}"
+        workers = str(options["workers"])
+        env = {
+            **os.environ,
+            "WSGI_SOCKET": os.path.join(directory, f"{mode}.sock"),
+            # Every worker runs for the whole benchmark.
+            "WSGI_MIN_WORKERS": workers,
+            "WSGI_MAX_WORKERS": workers,
+            "WSGI_HARAKIRI": "30",
+            "WSGI_MAX_REQUESTS": "0",
+            "WSGI_RELOAD_ON_RSS": "0",
+            "WSGI_LISTEN_BACKLOG": "100",
+            "SERVER_TIMING": "1",
+            # Benchmark users send more requests than clients may, and
+            # saturate the workers on purpose.
+            "THROTTLING": "0",
+            "LOAD_SHEDDING": "0",
+            "ALLOWED_HOSTS": ",".join(
+                filter(None, [os.getenv("ALLOWED_HOSTS"), "127.0.0.1"])
+            ),
+        }
+        log = open(os.path.join(directory, f"{mode}.log"), "w")
+        start = time.monotonic()
+        process = subprocess.Popen(
+            ["uwsgi", "--ini", options["ini"],
+             "--http-socket", f"127.0.0.1:{options['port']}",
+             "--chdir", str(settings.BASE_DIR),
+             "--cheaper-algo", "spare", "--cheaper", "0",
+             "--disable-logging", *MODES[mode]],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+
+        try:
+            self._wait_ready(base_url, process)
+            ready = time.monotonic() - start
+            output = os.path.join(directory, f"{mode}.json")
+            call_command(
+                "bench_api", base_url=base_url, scenarios="list,detail",
+                requests=options["requests"],
+                concurrency=options["concurrency"], output=output,
+                stdout=StringIO()
+            )
+            pids = [process.pid] + children(process.pid)
+            memory = [memory_usage(pid) for pid in pids]
+        except CommandError:
+            with open(log.name) as file:
+                self.stderr.write(file.read()[-4000:])
+            raise
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait(30)
+            log.close()
+
+        with open(output) as file:
+            scenarios = json.load(file)["results"]["scenarios"]
+
+        return {
+            "ready_seconds": round(ready, 2),
+            "processes": len(pids),
+            "memory": {
+                key: sum(usage[key] for usage in memory)
+                for key in ("rss_kib", "pss_kib", "uss_kib")
+            },
+            "scenarios": scenarios,
+        }
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        modes = [mode.strip() for mode in options["modes"].split(",")]
+        unknown = set(modes) - set(MODES)
+
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(unknown)}.")
+
+        results = {"workers": options["workers"], "modes": {}}
+
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in modes:
+                result = self._run(mode, options, directory)
+                results["modes"][mode] = result
+                memory = result["memory"]
+                self.stdout.write(
+                    f"{mode:8} ready {result['ready_seconds']:>5.2f}s  "
+                    f"rss {memory['rss_kib'] / 1024:>7.1f} MiB  "
+                    f"pss {memory['pss_kib'] / 1024:>7.1f} MiB  "
+                    f"uss {memory['uss_kib'] / 1024:>7.1f} MiB"
+                )
+
+                for name, summary in result["scenarios"].items():
+                    self.stdout.write(
+                        f"  {name:8} p50 {summary['p50_ms']:>7.1f} ms  "
+                        f"p95 {summary['p95_ms']:>7.1f} ms  "
+                        f"p99 {summary['p99_ms']:>7.1f} ms"
+                    )
+
+        if options["output"]:
+            write_results(options["output"], "bench_uwsgi", results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Results written to {options['output']}."
+            ))
@@ -0,0 +1,48 @@
+"""
+Django command to build the OpenAPI schema of the current code version.
+"""
+import time
+from typing import Any
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to generate the OpenAPI schema once, so no process
+    introspects the API to serve it."""
+    help = "Write the OpenAPI schema of the current code version."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--keep-stale",
+            action="store_true",
+            help="Keep the schema files of other code versions."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        start = time.perf_counter()
+        schema.build()
+
+        for schema_format in schema.RENDERERS:
+            path = schema.schema_path(schema_format)
+
+            if not path.exists():
+                raise CommandError(f"{path} could not be written.")
+
+            self.stdout.write(f"Wrote {path}.")
+
+        if not options["keep_stale"]:
+            for path in schema.prune():
+                self.stdout.write(f"Deleted {path}.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema of version {schema.code_version()} built in "
+            f"{time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,195 @@
+"""
+Django command to delete recipe images no longer referenced by any recipe,
+abandoned resumable uploads and part files without an upload.
+"""
+import os
+import posixpath
+import time
+import uuid
+from datetime import timedelta
+from itertools import islice
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import timezone
+
+from core.models import ImageUpload, Recipe
+
+RECIPE_UPLOADS = posixpath.join("uploads", "recipe")
+UPLOAD_PARTS = posixpath.join("uploads", "parts")
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect orphaned recipe images."""
+    help = "Delete recipe images that no recipe references anymore."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report orphaned files, do not delete them."
+        )
+        parser.add_argument(
+            "--grace-period",
+            type=int,
+            default=60 * 60,
+            help="Seconds since the last modification before an orphaned "
+                 "file may be deleted, protects uploads in progress."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of files checked against the database per query."
+        )
+        parser.add_argument(
+            "--max-rate",
+            type=float,
+            default=0,
+            help="Maximum deletions per second, 0 for unlimited."
+        )
+
+    def _scan(self, directory: str, before: float) -> Iterator[tuple]:
+        """Yield storage names and sizes of files older than the given
+        timestamp without listing the whole directory in memory."""
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+
+                stat = entry.stat(follow_symlinks=False)
+
+                if stat.st_mtime < before:
+                    yield posixpath.join(RECIPE_UPLOADS, entry.name), \
+                        stat.st_size
+
+    def _orphans(self, files: Iterator[tuple], batch_size: int) -> Iterator:
+        """Yield files which are not referenced by any recipe."""
+        while batch := dict(islice(files, batch_size)):
+            referenced = set(
+                Recipe.objects.filter(image__in=batch.keys())
+                .values_list("image", flat=True)
+            )
+
+            for name, size in batch.items():
+                if name not in referenced:
+                    yield name, size
+
+    def _expire_uploads(self, dry_run: bool) -> None:
+        """Delete resumable upload sessions abandoned for longer than
+        RECIPE_IMAGE_UPLOAD_TTL together with their part files."""
+        expired = ImageUpload.objects.filter(
+            updated_at__lt=timezone.now() - timedelta(
+                seconds=settings.RECIPE_IMAGE_UPLOAD_TTL)
+        )
+        count = 0
+
+        for upload in expired.iterator():
+            count += 1
+
+            if not dry_run:
+                try:
+                    os.remove(upload.part_path)
+                except FileNotFoundError:
+                    pass
+
+                upload.delete()
+
+        verb = "Would expire" if dry_run else "Expired"
+        self.stdout.write(f"{verb} {count} abandoned uploads.")
+
+    def _orphan_parts(self, before: float, batch_size: int) -> Iterator:
+        """Yield paths of part files older than the given timestamp whose
+        upload session no longer exists."""
+        directory = os.path.join(settings.MEDIA_ROOT, UPLOAD_PARTS)
+
+        if not os.path.isdir(directory):
+            return
+
+        def parts() -> Iterator[tuple]:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name, extension = os.path.splitext(entry.name)
+
+                    try:
+                        upload_id = uuid.UUID(name)
+                    except ValueError:
+                        continue
+
+                    if extension == ".part" \
+                            and entry.is_file(follow_symlinks=False) \
+                            and entry.stat().st_mtime < before:
+                        yield upload_id, entry.path
+
+        files = parts()
+
+        while batch := dict(islice(files, batch_size)):
+            existing = set(
+                ImageUpload.objects.filter(id__in=batch.keys())
+                .values_list("id", flat=True)
+            )
+
+            for upload_id, path in batch.items():
+                if upload_id not in existing:
+                    yield path
+
+    def _sweep_parts(self, dry_run: bool, before: float,
+                     batch_size: int) -> None:
+        """Delete part files left by upload sessions deleted without them,
+        such as those of deleted recipes."""
+        count = 0
+
+        for path in self._orphan_parts(before, batch_size):
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+
+            count += 1
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(f"{verb} {count} orphaned upload parts.")
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        self._expire_uploads(options["dry_run"])
+        self._sweep_parts(
+            options["dry_run"], time.time() - options["grace_period"],
+            options["batch_size"]
+        )
+        directory = os.path.join(settings.MEDIA_ROOT, RECIPE_UPLOADS)
+
+        if not os.path.isdir(directory):
+            self.stdout.write(f"{directory} does not exist, nothing to do.")
+            return
+
+        dry_run: bool = options["dry_run"]
+        interval = 1 / options["max_rate"] if options["max_rate"] else 0
+        files = self._scan(directory, time.time() - options["grace_period"])
+        deleted = reclaimed = 0
+        next_delete = time.monotonic()
+
+        for name, size in self._orphans(files, options["batch_size"]):
+            if not dry_run:
+                delay = next_delete - time.monotonic()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                next_delete = max(next_delete, time.monotonic()) + interval
+
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, name))
+                except FileNotFoundError:
+                    continue
+
+            self.stdout.write(name)
+            deleted += 1
+            reclaimed += size
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} orphaned files, {reclaimed} bytes."
+        ))
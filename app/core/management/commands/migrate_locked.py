@@ -0,0 +1,45 @@
+"""
+Django command to apply migrations holding a PostgreSQL advisory lock.
+"""
+import time
+import zlib
+from typing import Any
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Advisory lock keys are application defined 64 bit integers.
+LOCK_KEY = zlib.crc32(b"recipe-api.migrate")
+
+
+class Command(BaseCommand):
+    """Django command to migrate without racing concurrent releases."""
+    help = (
+        "Apply migrations while holding an advisory lock, concurrent runs "
+        "wait and then find nothing left to apply."
+    )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        start = time.monotonic()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [LOCK_KEY])
+
+            try:
+                waited = time.monotonic() - start
+                self.stdout.write(f"Migration lock acquired in {waited:.2f}s.")
+                call_command(
+                    "migrate",
+                    interactive=False,
+                    verbosity=options["verbosity"],
+                    stdout=self.stdout,
+                    stderr=self.stderr
+                )
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [LOCK_KEY])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrations applied in {time.monotonic() - start:.2f}s."
+        ))
@@ -0,0 +1,30 @@
+"""
+Django command to delete idle throttle buckets.
+"""
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ThrottleBucket
+
+
+class Command(BaseCommand):
+    """Django command to purge idle throttle buckets."""
+    help = (
+        "Delete throttle buckets unused for THROTTLE_BUCKET_IDLE_DAYS, they "
+        "are refilled when their client comes back."
+    )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        deleted, _ = ThrottleBucket.objects.filter(
+            updated_at__lt=timezone.now() - timedelta(
+                days=settings.THROTTLE_BUCKET_IDLE_DAYS)
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} idle throttle buckets."
+        ))
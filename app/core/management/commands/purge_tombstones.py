@@ -0,0 +1,27 @@
+"""
+Django command to delete tombstones older than the sync retention.
+"""
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Django command to purge expired tombstones."""
+    help = "Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS."
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        deleted, _ = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(
+                days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired tombstones."
+        ))
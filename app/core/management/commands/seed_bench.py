@@ -0,0 +1,260 @@
+"""
+Django command to generate synthetic benchmark data.
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Iterable
+
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import (
+    ImageUpload,
+    Ingredient,
+    Recipe,
+    Tag,
+    Tombstone,
+    User,
+)
+
+EMAIL_DOMAIN = "bench.example.com"
+
+ADJECTIVES = [
+    "Spicy", "Creamy", "Crispy", "Smoky", "Roasted", "Grilled", "Zesty",
+    "Hearty", "Fresh", "Sweet", "Tangy", "Garlic", "Lemon", "Herbed",
+]
+DISHES = [
+    "Chicken", "Lentil Soup", "Pasta", "Risotto", "Tacos", "Curry", "Salad",
+    "Stew", "Pancakes", "Burger", "Noodles", "Flatbread", "Chili", "Pilaf",
+]
+TAGS = [
+    "Vegan", "Vegetarian", "Dinner", "Lunch", "Breakfast", "Dessert",
+    "Quick", "Healthy", "Comfort", "Spicy", "Gluten Free", "Budget",
+    "Party", "Summer", "Winter", "Kids", "Baking", "Grill", "Soup", "Snack",
+]
+INGREDIENTS = [
+    "Salt", "Pepper", "Olive Oil", "Butter", "Garlic", "Onion", "Tomato",
+    "Flour", "Sugar", "Egg", "Milk", "Rice", "Lemon", "Basil", "Chili",
+    "Cumin", "Paprika", "Carrot", "Potato", "Chicken", "Beef", "Lentils",
+    "Yogurt", "Parsley", "Ginger", "Honey", "Soy Sauce", "Cheese", "Mint",
+    "Spinach",
+]
+
+
+def bench_email(number: int) -> str:
+    """Return the email address of a benchmark user."""
+    return f"bench{number}@{EMAIL_DOMAIN}"
+
+
+def sample_names(rng: random.Random, names: list[str],
+                 count: int) -> list[str]:
+    """Return count distinct names in random order, numbered variants of the
+    names follow once they are all used."""
+    if count <= len(names):
+        return rng.sample(names, count)
+
+    variants = [
+        f"{names[index % len(names)]} {index // len(names) + 2}"
+        for index in range(count - len(names))
+    ]
+
+    return rng.sample(names, len(names)) + variants
+
+
+class Command(BaseCommand):
+    """Django command to bulk create benchmark users, recipes, tags and
+    ingredients with PostgreSQL COPY."""
+    help = "Generate synthetic users, recipes, tags and ingredients."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes-per-user", type=int, default=100)
+        parser.add_argument("--tags-per-user", type=int, default=20)
+        parser.add_argument("--ingredients-per-user", type=int, default=30)
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=6)
+        parser.add_argument(
+            "--password",
+            default="benchpass123",
+            help="Password of every benchmark user."
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, equal seeds generate equal data."
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete existing benchmark users and their data first."
+        )
+
+    def _copy(self, cursor, model, columns: list[str],
+              rows: Iterable[tuple]) -> None:
+        """Stream rows into the table of the model with COPY."""
+        table = model._meta.db_table
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+        with cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+    def _clear(self, cursor) -> int:
+        """Delete the benchmark users and the rows referencing them with
+        plain DELETE statements, referencing rows first, and return how many
+        rows were deleted. Unlike QuerySet.delete() no rows are loaded and no
+        signals are sent, so no change events are published."""
+        def table(model) -> str:
+            return connection.ops.quote_name(model._meta.db_table)
+
+        users = f"SELECT id FROM {table(User)} WHERE email LIKE %s"
+        recipes = f"SELECT id FROM {table(Recipe)} WHERE user_id IN ({users})"
+        deletes = [
+            (Recipe.tags.through, "recipe_id", recipes),
+            (Recipe.ingredients.through, "recipe_id", recipes),
+            (ImageUpload, "user_id", users),
+            (Recipe, "user_id", users),
+            (Tag, "user_id", users),
+            (Ingredient, "user_id", users),
+            (Tombstone, "user_id", users),
+            (Token, "user_id", users),
+            (LogEntry, "user_id", users),
+            (User.groups.through, "user_id", users),
+            (User.user_permissions.through, "user_id", users),
+            (User, "id", users),
+        ]
+        deleted = 0
+
+        for model, column, ids in deletes:
+            cursor.execute(
+                f"DELETE FROM {table(model)} WHERE {column} IN ({ids})",
+                [f"%@{EMAIL_DOMAIN}"]
+            )
+            deleted += cursor.rowcount
+
+        return deleted
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        start = time.perf_counter()
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+
+        if options["clear"]:
+            with transaction.atomic(), connection.cursor() as cursor:
+                deleted = self._clear(cursor)
+
+            self.stdout.write(f"Deleted {deleted} existing rows.")
+
+        # Hashing is deliberately slow, every user shares one hash.
+        password = make_password(options["password"])
+        users = [
+            (uuid.UUID(int=rng.getrandbits(128), version=4), number)
+            for number in range(options["users"])
+        ]
+        counts = dict.fromkeys(
+            ["users", "tags", "ingredients", "recipes", "links"], 0
+        )
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            self._copy(cursor, User, [
+                "id", "email", "password", "first_name", "last_name",
+                "is_active", "is_staff", "is_superuser", "created_at",
+                "updated_at",
+            ], (
+                (user_id, bench_email(number), password, "Bench",
+                 f"User {number}", True, False, False, now, now)
+                for user_id, number in users
+            ))
+            counts["users"] = len(users)
+
+            for user_id, _ in users:
+                self._seed_user(cursor, rng, user_id, now, options, counts)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Created {users} users, {tags} tags, {ingredients} ingredients, "
+            "{recipes} recipes and {links} tag and ingredient links in "
+            "{elapsed:.1f}s.".format(
+                elapsed=time.perf_counter() - start, **counts
+            )
+        ))
+
+    def _seed_user(self, cursor, rng: random.Random, user_id: uuid.UUID,
+                   now, options: dict, counts: dict) -> None:
+        """Create the tags, ingredients and recipes of a user."""
+        def new_id() -> uuid.UUID:
+            return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+        tags = [
+            (new_id(), name)
+            for name in sample_names(rng, TAGS, options["tags_per_user"])
+        ]
+        ingredients = [
+            (new_id(), name)
+            for name in sample_names(
+                rng, INGREDIENTS, options["ingredients_per_user"]
+            )
+        ]
+        recipes = []
+
+        for _ in range(options["recipes_per_user"]):
+            created_at = now - timedelta(seconds=rng.randrange(365 * 86400))
+            recipes.append((
+                new_id(),
+                f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}",
+                created_at,
+            ))
+
+        self._copy(cursor, Tag,
+                   ["id", "user_id", "name", "created_at", "updated_at"],
+                   ((tag_id, user_id, name, now, now)
+                    for tag_id, name in tags))
+        self._copy(cursor, Ingredient,
+                   ["id", "user_id", "name", "created_at", "updated_at"],
+                   ((ingredient_id, user_id, name, now, now)
+                    for ingredient_id, name in ingredients))
+        self._copy(cursor, Recipe, [
+            "id", "user_id", "title", "description", "time_minutes",
+            "price", "link", "created_at", "updated_at",
+            "image_placeholder", "image_color",
+        ], (
+            (recipe_id, user_id, title, f"{title} for {rng.randint(1, 8)}.",
+             rng.randint(5, 180),
+             Decimal(rng.randint(100, 99999)) / 100,
+             f"https://example.com/recipes/{recipe_id}",
+             created_at, created_at, "", "")
+            for recipe_id, title, created_at in recipes
+        ))
+
+        tag_links = [
+            (recipe_id, tag_id)
+            for recipe_id, _, _ in recipes
+            for tag_id, _ in rng.sample(
+                tags, min(options["tags_per_recipe"], len(tags))
+            )
+        ]
+        ingredient_links = [
+            (recipe_id, ingredient_id)
+            for recipe_id, _, _ in recipes
+            for ingredient_id, _ in rng.sample(
+                ingredients,
+                min(options["ingredients_per_recipe"], len(ingredients))
+            )
+        ]
+        self._copy(cursor, Recipe.tags.through,
+                   ["recipe_id", "tag_id"], tag_links)
+        self._copy(cursor, Recipe.ingredients.through,
+                   ["recipe_id", "ingredient_id"], ingredient_links)
+
+        counts["tags"] += len(tags)
+        counts["ingredients"] += len(ingredients)
+        counts["recipes"] += len(recipes)
+        counts["links"] += len(tag_links) + len(ingredient_links)
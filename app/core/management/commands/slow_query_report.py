@@ -0,0 +1,86 @@
+"""
+Django command to report the slow queries recorded by the API workers.
+"""
+import json
+from collections import Counter
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from core.slow_queries import collect
+
+
+class Command(BaseCommand):
+    """Django command to print slow queries grouped by fingerprint."""
+    help = "Report slow queries by SQL fingerprint, slowest total first."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of fingerprints to report."
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the report as JSON."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entrypoint for command."""
+        groups: dict[str, dict] = {}
+
+        for sample in collect():
+            group = groups.setdefault(sample["fingerprint"], {
+                "fingerprint": sample["fingerprint"],
+                "sql": sample["sql"],
+                "count": 0,
+                "total": 0.0,
+                "max": 0.0,
+                "views": Counter(),
+                "call_sites": Counter(),
+                "explain": None,
+            })
+            group["count"] += 1
+            group["total"] += sample["duration"]
+            group["views"][sample["view"]] += 1
+            group["call_sites"][sample["call_site"]] += 1
+
+            if sample["duration"] > group["max"]:
+                group["max"] = sample["duration"]
+
+                if sample["explain"]:
+                    group["explain"] = sample["explain"]
+
+        report = sorted(
+            groups.values(), key=lambda group: group["total"], reverse=True
+        )[:options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not report:
+            self.stdout.write("No slow queries recorded.")
+            return
+
+        for group in report:
+            self.stdout.write(self.style.WARNING(
+                f"{group['fingerprint']}  {group['count']} queries, "
+                f"total {group['total'] * 1000:.0f} ms, "
+                f"max {group['max'] * 1000:.0f} ms"
+            ))
+            self.stdout.write(f"  {group['sql']}")
+
+            for view, count in group["views"].most_common(3):
+                self.stdout.write(f"  view: {view} ({count})")
+
+            for site, count in group["call_sites"].most_common(3):
+                self.stdout.write(f"  call site: {site} ({count})")
+
+            if group["explain"]:
+                for line in group["explain"].splitlines():
+                    self.stdout.write(f"    {line}")
+
+            self.stdout.write("")
@@ -3,30 +3,137 @@ Django command to wait for the database to be available
 """
 from typing import Any
 
+import random
 import time
 
-from psycopg import OperationalError as PsycopgError
+import psycopg
 
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import DatabaseError
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser
+)
 
 
 class Command(BaseCommand):
     """Django command to wait for database"""
+    help = (
+        "Wait until the database accepts connections, and optionally until "
+        "every migration is applied, retrying with exponential backoff."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait in total, 0 waits forever."
+        )
+        parser.add_argument(
+            "--initial-delay",
+            type=float,
+            default=0.1,
+            help="Upper bound of the first retry delay in seconds."
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=5,
+            help="Upper bound of any retry delay in seconds."
+        )
+        parser.add_argument(
+            "--migrations",
+            action="store_true",
+            help="Also wait until every migration is applied."
+        )
+
+    def _retry(self, probe, description: str, options: dict,
+               start: float) -> int:
+        """Call probe until it returns None, sleeping a random time up to an
+        exponentially growing bound between attempts. Return the number of
+        attempts, raise CommandError on timeout."""
+        attempt = 0
+
+        while True:
+            attempt += 1
+            problem = probe()
+
+            if problem is None:
+                return attempt
+
+            elapsed = time.monotonic() - start
+            remaining = options["timeout"] - elapsed
+
+            if options["timeout"] and remaining <= 0:
+                raise CommandError(
+                    f"{description} after {elapsed:.2f}s and {attempt} "
+                    f"attempts: {problem}"
+                )
+
+            # Full jitter keeps restarting replicas from retrying in step.
+            delay = random.uniform(0, min(
+                options["max_delay"],
+                options["initial_delay"] * 2 ** (attempt - 1)
+            ))
+
+            if options["timeout"]:
+                delay = min(delay, remaining)
+
+            self.stderr.write(self.style.ERROR(
+                f"{description} ({problem}), retrying in {delay:.2f}s..."
+            ))
+            time.sleep(delay)
+
+    def _connect(self) -> str | None:
+        """Open and close a raw connection, return the error on failure."""
+        params = connection.get_connection_params()
+
+        try:
+            psycopg.connect(**params, connect_timeout=5).close()
+        except psycopg.Error as error:
+            return str(error).strip() or error.__class__.__name__
+
+        return None
+
+    def _pending_migrations(self, targets: set) -> str | None:
+        """Return the number of unapplied migrations as a problem."""
+        try:
+            recorder = MigrationRecorder(connection)
+            applied = (
+                set(recorder.applied_migrations())
+                if recorder.has_table() else set()
+            )
+        except DatabaseError as error:
+            connection.close()
+            return str(error).strip()
+
+        pending = len(targets - applied)
+
+        return f"{pending} unapplied migrations" if pending else None
 
     def handle(self, *args: Any, **options: Any) -> str | None:
         """Entrypoint for command."""
         self.stdout.write("Waiting for database connection...")
-        db_up = False
-
-        while db_up is False:
-            try:
-                self.check(databases=("default",))
-                db_up = True
-            except (PsycopgError, OperationalError):
-                self.stderr.write(self.style.ERROR(
-                    "Database unavailable, waiting for 1 second..."
-                ))
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS("Database available!"))
+        start = time.monotonic()
+        attempts = self._retry(
+            self._connect, "Database unavailable", options, start
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Database available after {time.monotonic() - start:.2f}s "
+            f"and {attempts} attempts!"
+        ))
+
+        if options["migrations"]:
+            # Migration files are read once, only the applied set changes.
+            targets = set(MigrationLoader(None).graph.nodes)
+            self._retry(
+                lambda: self._pending_migrations(targets),
+                "Migrations pending", options, start
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Migrations applied after {time.monotonic() - start:.2f}s."
+            ))
@@ -0,0 +1,81 @@
+"""
+Protected media delivery helpers.
+"""
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models.fields.files import FieldFile
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBase,
+    HttpResponseNotModified
+)
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+
+def file_version(file: FieldFile) -> str:
+    """Return the version token of a stored file. Uploaded file names are
+    random and never reused, so the name identifies the content."""
+    return os.path.splitext(os.path.basename(file.name))[0]
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Create and return an ETag in the same format nginx generates, so
+    validators stay stable whether Django or nginx answered the request."""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def protected_media_response(
+        request: HttpRequest,
+        name: str,
+        immutable: bool = False
+) -> HttpResponseBase:
+    """Return a response delivering the media file with the given storage
+    name whose access has already been checked. With MEDIA_ACCEL_REDIRECT
+    nginx streams the file from its internal location, otherwise Django
+    streams it."""
+    path = default_storage.path(name)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("File not found.")
+
+    etag = file_etag(stat)
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL_REDIRECT:
+        content_type = mimetypes.guess_type(name)[0]
+        response = HttpResponse(
+            content_type=content_type or "application/octet-stream"
+        )
+        response["X-Accel-Redirect"] = quote(posixpath.join(
+            settings.MEDIA_ACCEL_REDIRECT_LOCATION, name
+        ))
+        # nginx answers Range requests of the file, Django does not.
+        response["Accept-Ranges"] = "bytes"
+    else:
+        response = FileResponse(open(path, "rb"))
+
+    response["ETag"] = etag
+
+    if immutable:
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=settings.MEDIA_CACHE_MAX_AGE,
+            immutable=True
+        )
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+
+    return response
@@ -0,0 +1,301 @@
+"""
+Prometheus style metrics aggregated across worker processes.
+
+Every process counts in memory and periodically writes a snapshot of its
+counters to its own file in METRICS_DIR. The metrics endpoint sums the
+snapshots of all processes, so uwsgi workers share one view of the counters
+without locking on the request path. Workers write a last snapshot when
+they exit, and the snapshots of exited workers are merged into a single
+aggregate file when the metrics are collected, so recycled workers keep
+their counts without leaving a file each behind.
+"""
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Snapshot of the counts of every exited process.
+AGGREGATE = "aggregate.json"
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": LATENCY_BUCKETS,
+    "http_response_size_bytes": SIZE_BUCKETS,
+}
+
+HELP = {
+    "http_requests_total": "Requests by view, method and status.",
+    "http_request_duration_seconds": "Request latency by view.",
+    "http_response_size_bytes": "Response body size by view.",
+    "db_queries_total": "Database queries by view.",
+    "db_query_duration_seconds_total": "Database query time by view.",
+    "cache_requests_total": "Cache lookups by cache and result.",
+    "query_budget_exceeded_total": "Requests over the view query budget.",
+    "throttled_requests_total": "Requests throttled by scope.",
+    "shed_requests_total": "Requests shed by route class.",
+    "db_timeouts_total": "Statements cancelled by view and timeout.",
+}
+
+
+def write_snapshot(directory: str, name: str, data: dict) -> None:
+    """Atomically replace the snapshot file of a process."""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    with os.fdopen(fd, "w") as tmp_file:
+        json.dump(data, tmp_file)
+
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _load(path: str) -> dict | None:
+    """Return the snapshot of a file, None when it is gone or partial."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_snapshots(directory: str) -> list[dict]:
+    """Return the snapshots of every process written to the directory."""
+    snapshots = []
+
+    if not os.path.isdir(directory):
+        return snapshots
+
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+
+        snapshot = _load(entry.path)
+
+        if snapshot is not None:
+            snapshots.append(snapshot)
+
+    return snapshots
+
+
+def _exited(name: str) -> bool:
+    """Return whether the process of a snapshot file is gone."""
+    pid = name.partition("-")[0]
+
+    if not pid.isdigit():
+        return False
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+
+    return False
+
+
+def compact(directory: str) -> None:
+    """Merge the snapshots of exited processes into the aggregate snapshot
+    and remove their files. Callers hold the lock of the directory."""
+    exited = [
+        entry.path for entry in os.scandir(directory)
+        if entry.name.endswith(".json") and entry.name != AGGREGATE
+        and _exited(entry.name)
+    ]
+
+    if not exited:
+        return
+
+    snapshots = [
+        snapshot
+        for snapshot in map(_load, [os.path.join(directory, AGGREGATE)]
+                            + exited)
+        if snapshot is not None
+    ]
+    write_snapshot(directory, AGGREGATE, merge(snapshots))
+
+    for path in exited:
+        os.remove(path)
+
+
+def _labels(labels: dict) -> str:
+    """Format labels in the exposition format, sorted for stable keys."""
+    if not labels:
+        return ""
+
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in sorted(labels.items())
+    )
+
+    return "{" + pairs + "}"
+
+
+class Registry:
+    """Counters and histograms of the current process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Start counting from zero in a new snapshot file. Runs again in
+        forked workers, which must not report the counts of their
+        parent."""
+        self._pid = os.getpid()
+        self._name = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+        self._counters: dict[str, dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._histograms: dict[str, dict[str, list]] = defaultdict(dict)
+        self._flushed_at = 0.0
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self._check_fork()
+            self._counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a value in a histogram, its buckets are declared in
+        HISTOGRAMS."""
+        buckets = HISTOGRAMS[name]
+
+        with self._lock:
+            self._check_fork()
+            key = _labels(labels)
+            # Bucket counts, then the sum and the count of observations.
+            series = self._histograms[name].setdefault(
+                key, [0] * (len(buckets) + 2)
+            )
+
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> dict:
+        """Return the metrics of the process as JSON serializable data."""
+        with self._lock:
+            self._check_fork()
+
+            return {
+                "counters": {
+                    name: dict(series)
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {key: list(values) for key, values in series.items()}
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def flush(self, force: bool = False) -> None:
+        """Write the snapshot of the process to METRICS_DIR at most once per
+        METRICS_FLUSH_INTERVAL seconds."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+
+        if not directory or (
+                not force
+                and now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL):
+            return
+
+        self._flushed_at = now
+        write_snapshot(directory, self._name, self.snapshot())
+
+
+registry = Registry()
+# Recycled workers keep the counts of their last flush interval.
+atexit.register(registry.flush, force=True)
+
+
+def merge(snapshots: list[dict]) -> dict:
+    """Return the sum of the snapshots."""
+    merged = {"counters": defaultdict(lambda: defaultdict(float)),
+              "histograms": defaultdict(dict)}
+
+    for snapshot in snapshots:
+        for name, series in snapshot["counters"].items():
+            for key, value in series.items():
+                merged["counters"][name][key] += value
+
+        for name, series in snapshot["histograms"].items():
+            for key, values in series.items():
+                total = merged["histograms"][name].setdefault(
+                    key, [0] * len(values)
+                )
+
+                for index, value in enumerate(values):
+                    total[index] += value
+
+    return merged
+
+
+def collect() -> dict:
+    """Return the sum of the snapshots of every process."""
+    registry.flush(force=True)
+    directory = settings.METRICS_DIR
+
+    if not directory:
+        return merge([registry.snapshot()])
+
+    # Concurrent scrapes must not merge the same exited snapshot twice, or
+    # read it both alone and in the aggregate.
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        compact(directory)
+
+        return merge(read_snapshots(directory))
+
+
+def render(metrics: dict) -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    lines = []
+
+    for name, series in sorted(metrics["counters"].items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{key} {value:g}")
+
+    for name, series in sorted(metrics["histograms"].items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        bounds = [f"{bound:g}" for bound in HISTOGRAMS[name]]
+
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            # Bucket labels go after the series labels.
+            prefix = key[:-1] + "," if key else "{"
+
+            for bound, count in zip(bounds, values[:-2]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{prefix}le="{bound}"}} {cumulative:g}'
+                )
+
+            # Observations above the last bound only land in +Inf.
+            lines.append(f'{name}_bucket{prefix}le="+Inf"}} {values[-1]:g}')
+            lines.append(f"{name}_sum{key} {values[-2]:g}")
+            lines.append(f"{name}_count{key} {values[-1]:g}")
+
+    return "\n".join(lines) + "\n"
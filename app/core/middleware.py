@@ -0,0 +1,469 @@
+"""
+Core middlewares.
+"""
+import cProfile
+import logging
+import os
+import random
+import time
+import uuid
+from typing import Callable
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connection
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.template.response import SimpleTemplateResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import compression, shedding, timeouts, timing, views
+from core.metrics import registry
+from core.query_budget import QueryBudgetExceeded, budgeted, query_budget
+from core.slow_queries import is_explaining, slow_query_log
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Database execute wrapper counting queries and their duration, only
+    the queries matching the counted predicate when given. The EXPLAIN
+    queries of the slow query log are not counted."""
+
+    def __init__(self, counted: Callable[[str], bool] | None = None) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.counted = counted
+
+    def __call__(self, execute, sql, params, many, context):
+        if is_explaining():
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if self.counted is None or self.counted(sql):
+                self.count += 1
+
+            self.duration += time.perf_counter() - start
+
+
+class ProbeMiddleware:
+    """Answer liveness and readiness probes before any other middleware,
+    so probes skip sessions, CSRF, authentication and the host header
+    validation of the orchestrator's requests."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.probes: dict[str, Callable] | None = None
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.probes is None:
+            self.probes = {
+                reverse("liveness"): views.liveness,
+                reverse("readiness"): views.readiness,
+            }
+
+        probe = self.probes.get(request.path)
+
+        if probe is not None:
+            return probe(request)
+
+        return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """Record request count, latency, response size and database usage of
+    every request, labelled with the name of the resolved view."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        stats = QueryStats()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.url_name or match.view_name if match else "unresolved"
+
+        registry.inc("http_requests_total", view=view, method=request.method,
+                     status=response.status_code)
+        registry.observe("http_request_duration_seconds", duration, view=view)
+        registry.inc("db_queries_total", stats.count, view=view)
+        registry.inc("db_query_duration_seconds_total", stats.duration,
+                     view=view)
+
+        if not response.streaming:
+            registry.observe("http_response_size_bytes",
+                             len(response.content), view=view)
+
+        registry.flush()
+
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Answer requests of the route classes being shed with a 503 response
+    before any work is done, disabled when LOAD_SHEDDING is off."""
+
+    def __init__(self, get_response: Callable) -> None:
+        if not settings.LOAD_SHEDDING:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.shedder = shedding.LoadShedder()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        route_class = shedding.route_class(request)
+
+        if route_class is None:
+            return self.get_response(request)
+
+        if not self.shedder.admit(route_class):
+            registry.inc("shed_requests_total", route_class=route_class)
+            response = JsonResponse(
+                {"detail": "Server overloaded, retry later."}, status=503
+            )
+            response["Retry-After"] = str(settings.LOAD_SHEDDING_RETRY_AFTER)
+
+            return response
+
+        queue_time = shedding.queue_time(request, time.time())
+        start = time.perf_counter()
+        response = self.get_response(request)
+
+        # Streams last as long as their client listens.
+        if not response.streaming:
+            self.shedder.observe(
+                route_class, time.perf_counter() - start, queue_time
+            )
+
+        return response
+
+
+class ServerTimingMiddleware:
+    """Add a Server-Timing header with the auth, database, serialization and
+    rendering time of the request when SERVER_TIMING is enabled.
+
+    The header is only sent to authenticated clients. A
+    PROFILING_SAMPLE_RATE share of requests, and requests sending an
+    X-Profile header with the token of a staff user, are profiled with
+    cProfile and the stats are written to PROFILING_DIR."""
+
+    def __init__(self, get_response: Callable) -> None:
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings = timing.activate()
+        stats = QueryStats()
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        # Checked before the view runs, so clients without a staff token
+        # can not make the worker profile their requests.
+        staff = "X-Profile" in request.headers and self._staff_token(request)
+        profiler = self._start_profiler() if sampled or staff else None
+        start = time.perf_counter()
+
+        try:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+            timing.deactivate()
+
+        timings.add("db", stats.duration, f"{stats.count} queries")
+        timings.add("total", time.perf_counter() - start)
+        # The user is only known after the view authenticated the request.
+        user = getattr(request, "user", None)
+
+        if getattr(user, "is_authenticated", False):
+            response["Server-Timing"] = timings.header()
+
+        if profiler is not None and (sampled or staff):
+            name = self._save_profile(request, profiler)
+
+            if staff:
+                response["X-Profile"] = name
+
+        return response
+
+    def process_template_response(
+            self,
+            request: HttpRequest,
+            response: SimpleTemplateResponse
+    ) -> SimpleTemplateResponse:
+        """Time the rendering of DRF responses, which happens after the
+        template response middlewares ran."""
+        timings = timing.current()
+        start = time.perf_counter()
+
+        def rendered(response: SimpleTemplateResponse) -> None:
+            timings.add("render", time.perf_counter() - start)
+
+        if timings is not None:
+            response.add_post_render_callback(rendered)
+
+        return response
+
+    def _staff_token(self, request: HttpRequest) -> bool:
+        """Return whether the request carries the token of a staff user."""
+        auth = get_authorization_header(request).split()
+
+        if len(auth) != 2 or auth[0].lower() != b"token":
+            return False
+
+        try:
+            user, _ = TokenAuthentication().authenticate_credentials(
+                auth[1].decode()
+            )
+        except (AuthenticationFailed, UnicodeError):
+            return False
+
+        return user.is_staff
+
+    def _start_profiler(self) -> cProfile.Profile | None:
+        """Return an enabled profiler, or None when another thread is
+        already profiling."""
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+
+        return profiler
+
+    def _save_profile(self, request: HttpRequest,
+                      profiler: cProfile.Profile) -> str:
+        """Write the profile stats to PROFILING_DIR and return the file
+        name."""
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else "unresolved"
+        name = "{}-{}-{}.prof".format(
+            time.strftime("%Y%m%dT%H%M%S"), view, uuid.uuid4().hex[:8]
+        )
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, name))
+
+        return name
+
+
+class CompressionMiddleware:
+    """Compress responses of COMPRESSION_CONTENT_TYPES larger than
+    COMPRESSION_MIN_SIZE bytes with the best coding the client accepts,
+    disabled when COMPRESSION is off."""
+
+    def __init__(self, get_response: Callable) -> None:
+        if not settings.COMPRESSION:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+
+        if response.streaming \
+                or response.has_header("Content-Encoding") \
+                or response.has_header("Content-Range") \
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE \
+                or not compression.compressible(
+                    response.get("Content-Type", "")):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = compression.negotiate(
+            request.headers.get("Accept-Encoding", "")
+        )
+
+        if coding is None:
+            return response
+
+        with timing.measure("compress"):
+            content = compression.compress(response.content, coding)
+
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = coding
+
+        # The compressed body differs byte for byte, like GZipMiddleware.
+        etag = response.get("ETag")
+
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        return response
+
+
+class SlowQueryMiddleware:
+    """Record the queries of requests slower than SLOW_QUERY_THRESHOLD_MS,
+    disabled when the threshold is 0."""
+
+    def __init__(self, get_response: Callable) -> None:
+        if not settings.SLOW_QUERY_THRESHOLD_MS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with connection.execute_wrapper(slow_query_log.wrapper(request)):
+            response = self.get_response(request)
+
+        slow_query_log.flush()
+
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Enforce the query budget of views. Requests over budget raise
+    QueryBudgetExceeded when QUERY_BUDGET_RAISE is set, in DEBUG and tests,
+    and are logged and counted otherwise."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        stats = QueryStats(counted=budgeted)
+
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        budget = query_budget(request)
+
+        if budget is not None and stats.count > budget[1]:
+            view, limit = budget
+            message = (
+                f"{view} {request.method} ran {stats.count} queries, "
+                f"its budget is {limit}."
+            )
+
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+
+            logger.warning(message)
+            registry.inc("query_budget_exceeded_total", view=view)
+
+        return response
+
+
+class DefaultTimeoutsMiddleware:
+    """Restore the Postgres timeouts of a connection API views set their
+    own on, before the first query of requests whose view does not set its
+    timeouts."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with connection.execute_wrapper(timeouts.DefaultTimeouts(request)):
+            return self.get_response(request)
+
+
+class MiddlewareChain:
+    """Middlewares loaded the way Django loads MIDDLEWARE, wrapping a
+    get_response callable."""
+
+    def __init__(self, paths: list[str], get_response: Callable) -> None:
+        self.view_hooks: list[Callable] = []
+        self.template_response_hooks: list[Callable] = []
+        self.exception_hooks: list[Callable] = []
+        handler = convert_exception_to_response(get_response)
+
+        for path in reversed(paths):
+            try:
+                middleware = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(middleware, "process_view"):
+                self.view_hooks.insert(0, middleware.process_view)
+
+            if hasattr(middleware, "process_template_response"):
+                self.template_response_hooks.append(
+                    middleware.process_template_response
+                )
+
+            if hasattr(middleware, "process_exception"):
+                self.exception_hooks.append(middleware.process_exception)
+
+            handler = convert_exception_to_response(middleware)
+
+        self.handler = handler
+
+
+class PathMiddlewareDispatcher:
+    """Run the PATH_MIDDLEWARE chain of the first prefix matching the
+    request path, so API requests skip the session, CSRF, authentication,
+    messages and clickjacking middlewares only the admin needs.
+
+    Django calls the process_view, process_template_response and
+    process_exception hooks of MIDDLEWARE entries only, the dispatcher calls
+    those of the matched chain in the order Django would."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.chains = [
+            (prefix, MiddlewareChain(paths, get_response))
+            for prefix, paths in settings.PATH_MIDDLEWARE.items()
+        ]
+        self.default = MiddlewareChain([], get_response)
+
+    def chain(self, request: HttpRequest) -> MiddlewareChain:
+        """Return the chain of the request path."""
+        for prefix, chain in self.chains:
+            if request.path_info.startswith(prefix):
+                return chain
+
+        return self.default
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        return self.chain(request).handler(request)
+
+    def process_view(self, request: HttpRequest, view_func: Callable,
+                     view_args: tuple, view_kwargs: dict
+                     ) -> HttpResponse | None:
+        for hook in self.chain(request).view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+
+            if response is not None:
+                return response
+
+        return None
+
+    def process_template_response(
+            self,
+            request: HttpRequest,
+            response: SimpleTemplateResponse
+    ) -> SimpleTemplateResponse:
+        for hook in self.chain(request).template_response_hooks:
+            response = hook(request, response)
+
+        return response
+
+    def process_exception(self, request: HttpRequest,
+                          exception: Exception) -> HttpResponse | None:
+        for hook in self.chain(request).exception_hooks:
+            response = hook(request, exception)
+
+            if response is not None:
+                return response
+
+        return None
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('allowed', models.BooleanField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        # Buckets are rebuilt by clients, they are not worth the WAL writes
+        # and are emptied by a crash.
+        migrations.RunSQL(
+            "ALTER TABLE core_throttlebucket SET UNLOGGED",
+            "ALTER TABLE core_throttlebucket SET LOGGED",
+        ),
+    ]
@@ -12,6 +12,7 @@ from django.contrib.auth.models import (
 )
 
 from core.managers import UserManager
+from core.placeholders import image_placeholders
 
 
 def recipe_image_file_path(instance, filename) -> str:
@@ -59,10 +60,29 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField("Ingredient")
     image = models.ImageField(
         null=True, upload_to=recipe_image_file_path)
+    image_placeholder = models.CharField(max_length=30, blank=True)
+    image_color = models.CharField(max_length=7, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "updated_at"])]
 
     def __str__(self) -> str:
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        """Save the recipe, computing the image placeholders once when a new
+        image is assigned."""
+        if not self.image:
+            self.image_placeholder = self.image_color = ""
+        elif not self.image._committed:
+            try:
+                self.image_placeholder, self.image_color = \
+                    image_placeholders(self.image.file)
+            except OSError:
+                self.image_placeholder = self.image_color = ""
+
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     """Tag objects' model definition which to filter recipes."""
@@ -75,6 +95,9 @@ class Tag(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "updated_at"])]
+
     def __str__(self) -> str:
         return self.name
 
@@ -90,5 +113,72 @@ class Ingredient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "updated_at"])]
+
     def __str__(self) -> str:
         return self.name
+
+
+class ImageUpload(models.Model):
+    """Resumable upload session of a recipe image."""
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_path(self) -> str:
+        """Path of the partially uploaded file, next to the final images so
+        finalizing is a rename instead of a copy."""
+        return os.path.join(
+            settings.MEDIA_ROOT, "uploads", "parts", f"{self.id}.part"
+        )
+
+    def __str__(self) -> str:
+        return self.filename
+
+
+class Tombstone(models.Model):
+    """Record of a deleted object reported to syncing clients."""
+    RECIPE = "recipe"
+    TAG = "tag"
+    INGREDIENT = "ingredient"
+    MODEL_CHOICES = [
+        (RECIPE, "Recipe"),
+        (TAG, "Tag"),
+        (INGREDIENT, "Ingredient"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.model} {self.object_id}"
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a throttle scope and client, taken from and refilled
+    in a single statement by core.throttling."""
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    allowed = models.BooleanField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return self.key
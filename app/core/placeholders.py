@@ -0,0 +1,112 @@
+"""
+Image placeholders rendered by clients before the image is downloaded.
+"""
+from typing import IO
+
+import numpy as np
+from PIL import Image
+
+BASE83 = (
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    "abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+)
+SAMPLE_SIZE = 32
+
+
+def _base83(value: int, length: int) -> str:
+    """Encode an integer as a fixed length base83 string."""
+    return "".join(
+        BASE83[value // 83 ** (length - i - 1) % 83] for i in range(length)
+    )
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    """Convert sRGB channel values to linear light."""
+    values = values / 255
+    return np.where(
+        values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4
+    )
+
+
+def _linear_to_srgb(values: np.ndarray) -> np.ndarray:
+    """Convert linear light channel values to sRGB."""
+    values = np.clip(values, 0, 1)
+    values = np.where(
+        values <= 0.0031308,
+        values * 12.92,
+        1.055 * values ** (1 / 2.4) - 0.055
+    )
+    return (values * 255 + 0.5).astype(int)
+
+
+def blurhash(pixels: np.ndarray, x_components=4, y_components=3) -> str:
+    """Encode an RGB pixel array as a BlurHash string. All cosine basis
+    factors are computed in one einsum pass over the image."""
+    height, width = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels.astype(np.float64))
+    basis_x = np.cos(
+        np.pi * np.outer(np.arange(x_components), np.arange(width)) / width
+    )
+    basis_y = np.cos(
+        np.pi * np.outer(np.arange(y_components), np.arange(height)) / height
+    )
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, linear)
+    factors *= 2 / (width * height)
+    factors[0, 0] /= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if len(ac):
+        quantised_max = int(
+            max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5)))
+        )
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+
+    scaled = ac / max_value
+    quantised = np.clip(
+        np.floor(np.sign(scaled) * np.abs(scaled) ** 0.5 * 9 + 9.5), 0, 18
+    ).astype(int)
+
+    for r, g, b in quantised:
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+
+    return result
+
+
+def dominant_color(pixels: np.ndarray) -> str:
+    """Return the average color of the most common color bucket, buckets
+    keep the top 4 bits of every channel."""
+    pixels = pixels.reshape(-1, 3).astype(np.int64)
+    buckets = (
+        (pixels[:, 0] >> 4) << 8 | (pixels[:, 1] >> 4) << 4 | pixels[:, 2] >> 4
+    )
+    bucket = np.bincount(buckets).argmax()
+    r, g, b = pixels[buckets == bucket].mean(axis=0).round().astype(int)
+
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def image_placeholders(file: IO) -> tuple[str, str]:
+    """Create and return the BlurHash and the dominant color of an image
+    file from a downsampled copy of it."""
+    position = file.tell()
+
+    try:
+        with Image.open(file) as image:
+            image.draft("RGB", (SAMPLE_SIZE, SAMPLE_SIZE))
+            image = image.convert("RGB")
+            image.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+            pixels = np.asarray(image)
+    finally:
+        file.seek(position)
+
+    return blurhash(pixels), dominant_color(pixels)
@@ -0,0 +1,108 @@
+"""
+Readiness checks of the process dependencies.
+
+Check results are cached for PROBE_CACHE_TTL seconds and only one thread
+runs an expired check at a time, so probe storms never reach Postgres more
+than once per TTL and process.
+"""
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+
+def check_database() -> None:
+    """Run a trivial query on the default database. A failed connection is
+    closed so the next check reconnects."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        connection.close()
+        raise
+
+
+def check_cache() -> None:
+    """Write a value to the default cache and read it back."""
+    value = uuid.uuid4().hex
+    cache.set("probe:readiness", value, 30)
+
+    if cache.get("probe:readiness") != value:
+        raise OSError("Cache did not return the written value.")
+
+
+def check_media() -> None:
+    """Create and delete a file in the media volume."""
+    with tempfile.TemporaryFile(dir=settings.MEDIA_ROOT) as file:
+        file.write(b"probe")
+
+
+CHECKS: dict[str, Callable[[], None]] = {
+    "database": check_database,
+    "cache": check_cache,
+    "media": check_media,
+}
+
+
+class CachedCheck:
+    """Result of a check reused until it expires."""
+
+    def __init__(self, check: Callable[[], None]) -> None:
+        self.check = check
+        self.lock = threading.Lock()
+        self.expires_at = 0.0
+        self.ok = False
+        self.error = ""
+
+    def result(self) -> tuple[bool, str]:
+        """Return whether the check passed and its error, running it again
+        once the cached result expired. Threads arriving while the check
+        runs get the previous result instead of waiting, unless there is
+        none yet."""
+        if time.monotonic() < self.expires_at \
+                or not self.lock.acquire(blocking=not self.expires_at):
+            return self.ok, self.error
+
+        try:
+            # Another thread may have run the check while this one waited.
+            if time.monotonic() >= self.expires_at:
+                self._run()
+        finally:
+            self.lock.release()
+
+        return self.ok, self.error
+
+    def _run(self) -> None:
+        """Run the check and cache its result."""
+        try:
+            self.check()
+        # A failing dependency must not turn the probe into an error.
+        except Exception as error:
+            self.ok, self.error = False, str(error)
+        else:
+            self.ok, self.error = True, ""
+
+        self.expires_at = time.monotonic() + settings.PROBE_CACHE_TTL
+
+
+_checks = {name: CachedCheck(check) for name, check in CHECKS.items()}
+
+
+def readiness() -> tuple[bool, dict[str, str]]:
+    """Return whether every dependency is ready and the state of each."""
+    results = {name: check.result() for name, check in _checks.items()}
+
+    return all(ok for ok, _ in results.values()), {
+        name: "ok" if ok else error for name, (ok, error) in results.items()
+    }
+
+
+def reset() -> None:
+    """Expire the cached results."""
+    for check in _checks.values():
+        check.expires_at = 0.0
@@ -0,0 +1,44 @@
+"""
+Declarative query budgets of API views.
+
+Views declare the most queries a request may run as a `query_budget`
+attribute, either a number or a mapping of viewset actions (or HTTP methods
+of plain API views) to numbers. Budgets hold whatever the amount of data, so
+they catch N+1 query regressions. Savepoints are not counted, they only
+mark where a nested transaction starts and tests nest the transaction of
+every request in their own.
+"""
+from django.http import HttpRequest
+
+
+SAVEPOINT_PREFIXES = (
+    "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Request ran more queries than the budget of its view."""
+
+
+def query_budget(request: HttpRequest) -> tuple[str, int] | None:
+    """Return the name and the query budget of the view and action that
+    handled the request, None when the view has no budget."""
+    match = request.resolver_match
+    view_class = getattr(match.func, "cls", None) if match else None
+    budget = getattr(view_class, "query_budget", None)
+
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        # Viewsets map methods to actions, plain views are keyed by method.
+        key = getattr(match.func, "actions", {}).get(method, method)
+        budget = budget.get(key)
+
+    if budget is None:
+        return None
+
+    return match.view_name, budget
+
+
+def budgeted(sql: str) -> bool:
+    """Return whether the query counts against query budgets."""
+    return not sql.startswith(SAVEPOINT_PREFIXES)
@@ -0,0 +1,129 @@
+"""
+Prebuilt OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is built
+once per code version, by build_schema at release time or by the first
+process needing it, and served from memory.
+"""
+import functools
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import django
+import drf_spectacular
+from django.conf import settings
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer,
+    OpenApiYamlRenderer
+)
+from drf_spectacular.settings import spectacular_settings
+
+logger = logging.getLogger(__name__)
+
+RENDERERS = {"json": OpenApiJsonRenderer, "yaml": OpenApiYamlRenderer}
+
+
+class Artifact(NamedTuple):
+    """Rendered schema of a format."""
+    content: bytes
+    etag: str
+    content_type: str
+
+
+_artifacts: dict[str, Artifact] = {}
+
+
+@functools.cache
+def code_version() -> str:
+    """Return CODE_VERSION, or a digest of the Python sources and of the
+    versions of the libraries generating the schema."""
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+
+    digest = hashlib.sha256(
+        f"{django.__version__}-{drf_spectacular.__version__}".encode()
+    )
+
+    for path in sorted(Path(settings.BASE_DIR).rglob("*.py")):
+        digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()[:12]
+
+
+def schema_path(schema_format: str) -> Path:
+    """Return the file of the schema of the current code version."""
+    name = f"schema-{code_version()}.{schema_format}"
+
+    return Path(settings.SCHEMA_DIR) / name
+
+
+def build() -> dict[str, bytes]:
+    """Generate the schema, render it in every format and write the files
+    of the current code version. Processes that can not write the files
+    only keep the rendered schema."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    data = generator.get_schema(request=None, public=True)
+    rendered = {
+        schema_format: renderer().render(data, renderer_context={})
+        for schema_format, renderer in RENDERERS.items()
+    }
+
+    try:
+        os.makedirs(settings.SCHEMA_DIR, exist_ok=True)
+
+        for schema_format, content in rendered.items():
+            path = schema_path(schema_format)
+            temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            temporary.write_bytes(content)
+            # Concurrent builders never expose a partial file.
+            os.replace(temporary, path)
+    except OSError as error:
+        logger.warning("OpenAPI schema not written: %s", error)
+
+    return rendered
+
+
+def prune() -> list[Path]:
+    """Delete the schema files of other code versions."""
+    current = {schema_path(schema_format) for schema_format in RENDERERS}
+    stale = [
+        path for path in Path(settings.SCHEMA_DIR).glob("schema-*")
+        if path not in current
+    ]
+
+    for path in stale:
+        path.unlink(missing_ok=True)
+
+    return stale
+
+
+def get(schema_format: str) -> Artifact:
+    """Return the schema of the format, read from its file or built when
+    missing."""
+    artifact = _artifacts.get(schema_format)
+
+    if artifact is not None:
+        return artifact
+
+    try:
+        content = schema_path(schema_format).read_bytes()
+    except FileNotFoundError:
+        content = build()[schema_format]
+
+    artifact = _artifacts[schema_format] = Artifact(
+        content=content,
+        etag='"{}"'.format(hashlib.sha256(content).hexdigest()[:16]),
+        content_type=RENDERERS[schema_format].media_type,
+    )
+
+    return artifact
+
+
+def reset() -> None:
+    """Forget the loaded schemas and code version."""
+    _artifacts.clear()
+    code_version.cache_clear()
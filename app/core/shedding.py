@@ -0,0 +1,170 @@
+"""
+Adaptive load shedding by route class.
+
+Requests are classed as auth, read, write or upload. Every worker keeps an
+exponentially weighted average of the time requests waited in the uwsgi
+listen queue, taken from the X-Request-Start header nginx adds, and of the
+latency of every class, decaying towards zero while no requests are served
+so a single outlier does not keep a class shed. While an average is over
+its target, the share of requests admitted is halved for the first class of
+LOAD_SHEDDING_ORDER still admitted, once per interval, and raised back
+additively in reverse order when the averages recover. Reads, the health
+check and the metrics are never shed.
+"""
+import functools
+import math
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.urls import reverse
+from rest_framework.permissions import SAFE_METHODS
+
+# Weight of the latest request in the averages.
+ALPHA = 0.2
+# Seconds for an average without new samples to fall by a factor of e.
+DECAY = 10.0
+DECREASE = 0.5
+INCREASE = 0.1
+# Share of requests still admitted in a shed class, they bring the latency
+# of the class back to the averages.
+MIN_ADMITTED = 0.05
+
+
+@functools.cache
+def _paths() -> dict[str, str | None]:
+    """Return the route class of the paths classed by name."""
+    return {
+        reverse("health-check"): None,
+        reverse("metrics"): None,
+        reverse("user:token"): "auth",
+        reverse("user:create"): "auth",
+    }
+
+
+def route_class(request: HttpRequest) -> str | None:
+    """Return the route class of the request, None when it is never
+    shed."""
+    path = request.path_info
+    paths = _paths()
+
+    if path in paths:
+        return paths[path]
+
+    if "/upload" in path:
+        return "upload"
+
+    return "read" if request.method in SAFE_METHODS else "write"
+
+
+def queue_time(request: HttpRequest, now: float) -> float:
+    """Return the seconds the request waited since the proxy received it,
+    from an X-Request-Start header of "t=<epoch seconds>" or 0 without
+    one. Milliseconds and microseconds are accepted too."""
+    header = request.META.get("HTTP_X_REQUEST_START", "")
+
+    try:
+        start = float(header.removeprefix("t="))
+    except ValueError:
+        return 0.0
+
+    while start > 1e11:
+        start /= 1000
+
+    return max(0.0, now - start)
+
+
+def _decay(average: float, elapsed: float) -> float:
+    """Return the average decayed over the seconds elapsed since its last
+    sample."""
+    return average * math.exp(-elapsed / DECAY)
+
+
+class LoadShedder:
+    """Shares of requests admitted per route class of a worker process."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.admitted = {
+            name: 1.0 for name in settings.LOAD_SHEDDING_ORDER
+        }
+        self.credits = {name: 0.0 for name in settings.LOAD_SHEDDING_ORDER}
+        self.latency = {
+            name: 0.0 for name in settings.LOAD_SHEDDING_LATENCY_TARGETS_MS
+        }
+        self.queue_time = 0.0
+        self.observed_at = {name: clock() for name in self.latency}
+        self.queued_at = clock()
+        self.adjusted_at = clock()
+
+    def admit(self, name: str) -> bool:
+        """Return whether a request of the class is served. Admitted shares
+        are spread evenly over the requests of the class."""
+        with self.lock:
+            if name in self.credits:
+                self.credits[name] += self.admitted[name]
+
+                if self.credits[name] < 1:
+                    return False
+
+                self.credits[name] -= 1
+
+            return True
+
+    def observe(self, name: str, latency: float, queue_time: float) -> None:
+        """Add a served request of the class to the averages and adjust the
+        admitted shares, at most once per LOAD_SHEDDING_INTERVAL."""
+        with self.lock:
+            now = self.clock()
+            average = _decay(self.latency[name], now - self.observed_at[name])
+            self.latency[name] = average + ALPHA * (latency - average)
+            self.observed_at[name] = now
+            average = _decay(self.queue_time, now - self.queued_at)
+            self.queue_time = average + ALPHA * (queue_time - average)
+            self.queued_at = now
+
+            if now - self.adjusted_at < settings.LOAD_SHEDDING_INTERVAL:
+                return
+
+            self.adjusted_at = now
+
+            if self.overloaded(now):
+                self._decrease()
+            else:
+                self._increase()
+
+    def overloaded(self, now: float) -> bool:
+        """Return whether requests wait in the queue, or a class is slower,
+        than their target, as of now."""
+        queue_time = _decay(self.queue_time, now - self.queued_at)
+
+        if queue_time * 1000 > settings.LOAD_SHEDDING_QUEUE_TARGET_MS:
+            return True
+
+        return any(
+            _decay(self.latency[name], now - self.observed_at[name]) * 1000
+            > target
+            for name, target
+            in settings.LOAD_SHEDDING_LATENCY_TARGETS_MS.items()
+        )
+
+    def _decrease(self) -> None:
+        """Halve the share of the first class not shed to the minimum."""
+        for name in settings.LOAD_SHEDDING_ORDER:
+            if self.admitted[name] > MIN_ADMITTED:
+                self.admitted[name] = max(
+                    MIN_ADMITTED, self.admitted[name] * DECREASE
+                )
+                return
+
+    def _increase(self) -> None:
+        """Raise the share of the last class shed."""
+        for name in reversed(settings.LOAD_SHEDDING_ORDER):
+            if self.admitted[name] < 1:
+                self.admitted[name] = min(
+                    1.0, round(self.admitted[name] + INCREASE, 4)
+                )
+                return
@@ -0,0 +1,34 @@
+"""
+Signal handlers of the core models.
+"""
+from django.db.models import Model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core import events
+from core.models import Recipe, Tag, Ingredient
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def publish_saved(sender: type[Model], instance: Model, created: bool,
+                  **kwargs) -> None:
+    """Publish a change event for created and updated objects."""
+    events.publish(instance.user_id, {
+        "type": sender._meta.model_name,
+        "action": "created" if created else "updated",
+        "id": str(instance.pk),
+    })
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def publish_deleted(sender: type[Model], instance: Model, **kwargs) -> None:
+    """Publish a change event for deleted objects."""
+    events.publish(instance.user_id, {
+        "type": sender._meta.model_name,
+        "action": "deleted",
+        "id": str(instance.pk),
+    })
@@ -0,0 +1,244 @@
+"""
+Slow query log with EXPLAIN plans of the worst queries.
+
+SlowQueryMiddleware wraps the database connection of every request. Queries
+above SLOW_QUERY_THRESHOLD_MS are kept in a bounded ring buffer with their
+view and call site. For the SLOW_QUERY_EXPLAIN_TOP slowest SELECTs of every
+normalized SQL fingerprint, the plan is kept with the sample, other
+statements are not explained. Plans are only estimated with EXPLAIN, which
+plans the query without running it. With SLOW_QUERY_EXPLAIN_ANALYZE, reads
+EXPLAIN ANALYZE can safely execute again, SELECTs without locking clauses
+calling known side effect free functions, are run again under
+EXPLAIN (ANALYZE, BUFFERS) within the request, roughly doubling the time of
+the slow request, so it is meant for short investigations.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.http import HttpRequest
+from django.utils import timezone
+
+from core.metrics import read_snapshots, write_snapshot
+
+MAX_FINGERPRINTS = 1000
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_SPACES = re.compile(r"\s+")
+_CALLS = re.compile(r"(?<![\w\".])([a-z_]\w*)\s*\(", re.IGNORECASE)
+_LOCKING = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b",
+    re.IGNORECASE
+)
+EXPLAINABLE = ("SELECT",)
+# Keywords followed by a parenthesis and functions without side effects,
+# queries calling anything else are not executed again by EXPLAIN ANALYZE.
+ANALYZABLE_CALLS = frozenset({
+    "ALL", "AND", "ANY", "ARRAY", "AS", "BY", "CAST", "EXISTS", "FILTER",
+    "FROM", "IN", "JOIN", "NOT", "ON", "OR", "OVER", "ROW", "SELECT", "SOME",
+    "USING", "VALUES", "WHERE", "WITHIN",
+    "ABS", "ARRAY_AGG", "AVG", "COALESCE", "COUNT", "DATE_TRUNC", "EXTRACT",
+    "GENERATE_SERIES", "GREATEST", "JSONB_AGG", "JSONB_BUILD_OBJECT",
+    "JSON_AGG", "JSON_BUILD_OBJECT", "LEAST", "LENGTH", "LOWER", "MAX", "MIN",
+    "NULLIF", "RANK", "ROUND", "ROW_NUMBER", "STRING_AGG", "SUM", "UNNEST",
+    "UPPER",
+})
+
+# Set while the log runs the EXPLAIN of a slow query, whichever log runs it.
+_state = threading.local()
+
+
+def normalize(sql: str) -> str:
+    """Return the SQL with literals and parameter lists collapsed, so
+    queries differing only in their values share a fingerprint."""
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    """Return the fingerprint of the normalized SQL."""
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def analyzable(sql: str) -> bool:
+    """Return whether EXPLAIN ANALYZE may execute the query again, a SELECT
+    without locking clauses calling only functions without side effects."""
+    sql = _STRINGS.sub("?", sql)
+
+    if not sql.lstrip().upper().startswith("SELECT") \
+            or _LOCKING.search(sql):
+        return False
+
+    return all(
+        name.upper() in ANALYZABLE_CALLS for name in _CALLS.findall(sql)
+    )
+
+
+def is_explaining() -> bool:
+    """Return whether the current thread is running the EXPLAIN of a slow
+    query, so other execute wrappers can leave it out of their counts."""
+    return getattr(_state, "explaining", False)
+
+
+def call_site() -> str:
+    """Return the innermost frame of the project's own code, skipping this
+    module."""
+    base_dir = str(settings.BASE_DIR)
+
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if frame.filename.startswith(base_dir) \
+                and frame.filename != __file__:
+            path = os.path.relpath(frame.filename, base_dir)
+            return f"{path}:{frame.lineno} in {frame.name}"
+
+    return "unknown"
+
+
+class SlowQueryLog:
+    """Slow queries of the current process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Start an empty log in a new snapshot file, also in forked
+        workers."""
+        self._pid = os.getpid()
+        self._name = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+        self.samples: deque = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+        # Durations of the explained samples per fingerprint.
+        self._explained: dict[str, list[float]] = {}
+        self._dirty = False
+        self._flushed_at = 0.0
+
+    def wrapper(self, request: HttpRequest):
+        """Return an execute wrapper recording the slow queries of the
+        request."""
+        def execute_wrapper(execute, sql, params, many, context):
+            if is_explaining():
+                return execute(sql, params, many, context)
+
+            start = time.perf_counter()
+            result = execute(sql, params, many, context)
+            duration = time.perf_counter() - start
+
+            if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self.record(request, sql, params, many, context, duration)
+
+            return result
+
+        return execute_wrapper
+
+    def record(self, request: HttpRequest, sql: str, params, many: bool,
+               context: dict, duration: float) -> None:
+        """Keep a slow query, explaining it when it is among the slowest of
+        its fingerprint."""
+        key = fingerprint(sql)
+        match = request.resolver_match
+        explain = None
+
+        if self._should_explain(key, duration, sql, many):
+            explain = self._explain(context["connection"], sql, params)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+
+            self.samples.append({
+                "fingerprint": key,
+                "sql": normalize(sql),
+                "duration": duration,
+                "view": match.view_name if match else request.path,
+                "call_site": call_site(),
+                "at": timezone.now().isoformat(),
+                "explain": explain,
+            })
+            self._dirty = True
+
+    def _should_explain(self, key: str, duration: float, sql: str,
+                        many: bool) -> bool:
+        """Reserve an explain slot when the query is among the slowest of
+        its fingerprint. Only single SELECT statements are explained."""
+        if not settings.SLOW_QUERY_EXPLAIN_TOP or many \
+                or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return False
+
+        with self._lock:
+            if len(self._explained) >= MAX_FINGERPRINTS:
+                self._explained.clear()
+
+            durations = self._explained.setdefault(key, [])
+
+            if len(durations) < settings.SLOW_QUERY_EXPLAIN_TOP:
+                durations.append(duration)
+                return True
+
+            fastest = min(durations)
+
+            if duration > fastest:
+                durations[durations.index(fastest)] = duration
+                return True
+
+        return False
+
+    def _explain(self, connection, sql: str, params) -> str | None:
+        """Return the EXPLAIN (ANALYZE, BUFFERS) plan of the query when
+        SLOW_QUERY_EXPLAIN_ANALYZE is set and it is analyzable, its EXPLAIN
+        plan otherwise."""
+        options = "ANALYZE, BUFFERS" \
+            if settings.SLOW_QUERY_EXPLAIN_ANALYZE and analyzable(sql) \
+            else "COSTS"
+        _state.explaining = True
+
+        try:
+            # A failing EXPLAIN must not abort the transaction of the view.
+            with transaction.atomic(using=connection.alias), \
+                    connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+                return "\n".join(row[0] for row in cursor.fetchall())
+        except DatabaseError as error:
+            return f"EXPLAIN failed: {error}"
+        finally:
+            _state.explaining = False
+
+    def flush(self, force: bool = False) -> None:
+        """Write the samples of the process to SLOW_QUERY_LOG_DIR when they
+        changed, at most once per METRICS_FLUSH_INTERVAL seconds."""
+        now = time.monotonic()
+
+        if not self._dirty or (
+                not force
+                and now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL):
+            return
+
+        with self._lock:
+            self._dirty = False
+            self._flushed_at = now
+            samples = list(self.samples)
+
+        write_snapshot(settings.SLOW_QUERY_LOG_DIR, self._name,
+                       {"samples": samples})
+
+
+slow_query_log = SlowQueryLog()
+
+
+def collect() -> list[dict]:
+    """Return the slow query samples of every process."""
+    return [
+        sample
+        for snapshot in read_snapshots(settings.SLOW_QUERY_LOG_DIR)
+        for sample in snapshot["samples"]
+    ]
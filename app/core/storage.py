@@ -0,0 +1,67 @@
+"""
+Static files storage.
+"""
+import mimetypes
+import os
+from typing import Iterator
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from core import compression
+
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage writing compressed copies next to the original and
+    hashed names of collected files, so nginx serves them with gzip_static
+    instead of compressing static files on every request."""
+
+    def post_process(self, paths: dict, dry_run: bool = False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+
+        if dry_run:
+            return
+
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name: str) -> Iterator[str]:
+        """Write the compressed copies of a file worth compressing and
+        return their names. Copies newer than the file are kept."""
+        path = self.path(name)
+        content_type, _ = mimetypes.guess_type(name)
+
+        if not compression.compressible(content_type or "") \
+                or not os.path.exists(path) \
+                or os.path.getsize(path) < settings.COMPRESSION_MIN_SIZE:
+            return
+
+        modified_at = os.path.getmtime(path)
+        content = None
+
+        for coding in compression.encodings():
+            target = path + SUFFIXES[coding]
+
+            if os.path.exists(target) \
+                    and os.path.getmtime(target) >= modified_at:
+                continue
+
+            if content is None:
+                with open(path, "rb") as file:
+                    content = file.read()
+
+            compressed = compression.compress(content, coding, best=True)
+
+            if len(compressed) >= len(content):
+                continue
+
+            # Renamed into place, nginx never serves a partial file.
+            with open(target + ".tmp", "wb") as file:
+                file.write(compressed)
+
+            os.replace(target + ".tmp", target)
+
+            yield name + SUFFIXES[coding]
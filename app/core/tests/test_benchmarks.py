@@ -0,0 +1,195 @@
+"""
+Tests for the benchmark data generator and API benchmark.
+"""
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import (
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+
+from core import benchmarks
+from core.management.commands import bench_uwsgi
+from core.models import Recipe, Tag, Tombstone
+
+
+class BenchmarkHelpersTests(SimpleTestCase):
+    """Test the benchmark result helpers."""
+
+    def test_percentile(self) -> None:
+        """Test nearest-rank percentiles."""
+        values = [i / 1000 for i in range(1, 101)]
+        summary = benchmarks.summarize(values, elapsed=2)
+
+        self.assertEqual(summary["p50_ms"], 50)
+        self.assertEqual(summary["p99_ms"], 99)
+        self.assertEqual(summary["throughput_rps"], 50)
+
+    def test_server_timing_queries(self) -> None:
+        """Test the query count is parsed from Server-Timing headers."""
+        header = 'auth;dur=1.0, db;dur=2.5;desc="4 queries", total;dur=9.0'
+
+        self.assertEqual(benchmarks.server_timing_queries(header), 4)
+        self.assertIsNone(benchmarks.server_timing_queries(None))
+
+    def test_memory_usage(self) -> None:
+        """Test the memory of a process is read from /proc."""
+        usage = bench_uwsgi.memory_usage(os.getpid())
+
+        self.assertGreater(usage["rss_kib"], 0)
+        self.assertLessEqual(usage["pss_kib"], usage["rss_kib"])
+        self.assertLessEqual(usage["uss_kib"], usage["pss_kib"])
+
+
+class SeedBenchCommandTests(TestCase):
+    """Test generating benchmark data."""
+
+    def test_seed_bench(self) -> None:
+        """Test users, recipes and their tag links are created and can log
+        in with the shared password."""
+        call_command(
+            "seed_bench", users=2, recipes_per_user=5, tags_per_user=4,
+            tags_per_recipe=2, stdout=StringIO()
+        )
+        user = get_user_model().objects.get(email="bench1@bench.example.com")
+
+        self.assertTrue(user.check_password("benchpass123"))
+        self.assertEqual(Recipe.objects.filter(user=user).count(), 5)
+        self.assertEqual(Tag.objects.filter(user=user).count(), 4)
+        self.assertEqual(
+            Recipe.tags.through.objects.filter(recipe__user=user).count(), 10
+        )
+
+    def test_seed_bench_clear(self) -> None:
+        """Test seeding again with --clear replaces the benchmark data and
+        their tombstones without publishing change events."""
+        call_command("seed_bench", users=1, recipes_per_user=3,
+                     stdout=StringIO())
+        user = get_user_model().objects.get(email="bench0@bench.example.com")
+        Tombstone.objects.create(
+            user=user, model=Tombstone.RECIPE, object_id=uuid.uuid4()
+        )
+
+        with mock.patch("core.events.publish") as publish:
+            call_command("seed_bench", users=1, recipes_per_user=3,
+                         clear=True, stdout=StringIO())
+
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertFalse(Tombstone.objects.exists())
+        publish.assert_not_called()
+
+    def test_seed_bench_more_names(self) -> None:
+        """Test users get as many distinct tags as requested, beyond the
+        list of names."""
+        call_command("seed_bench", users=1, recipes_per_user=1,
+                     tags_per_user=45, stdout=StringIO())
+
+        self.assertEqual(
+            Tag.objects.values("name").distinct().count(), 45
+        )
+
+
+class BenchFiltersCommandTests(TestCase):
+    """Test benchmarking the recipe ID list filters."""
+
+    def test_bench_filters(self) -> None:
+        """Test both lookups are measured, ANY with a single parameter."""
+        call_command("seed_bench", users=1, recipes_per_user=3,
+                     stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, "filters.json")
+
+        call_command("bench_filters", ids=[50], queries=2, warmup=0,
+                     output=output, stdout=StringIO())
+
+        with open(output) as file:
+            results = json.load(file)["results"]["ids"]["50"]
+
+        self.assertEqual(results["in"]["params"], 51)
+        self.assertEqual(results["any"]["params"], 2)
+
+
+class BenchPreparedCommandTests(TransactionTestCase):
+    """Test benchmarking prepared statements."""
+
+    def test_bench_prepared(self) -> None:
+        """Test every mode is measured and the connection options are
+        restored."""
+        call_command("seed_bench", users=1, recipes_per_user=3,
+                     stdout=StringIO())
+        options = connection.settings_dict["OPTIONS"]
+        out = StringIO()
+
+        call_command("bench_prepared", requests=3, warmup=1, stdout=out)
+
+        self.assertIn("detail  planning", out.getvalue())
+        self.assertEqual(out.getvalue().count("prepared mean"), 2)
+        self.assertEqual(connection.settings_dict["OPTIONS"], options)
+
+
+class BenchMiddlewareCommandTests(SimpleTestCase):
+    """Test benchmarking the middleware stacks."""
+
+    def test_bench_middleware(self) -> None:
+        """Test every stack is measured and the API path is served."""
+        out = StringIO()
+
+        call_command("bench_middleware", requests=5, warmup=1, stdout=out)
+
+        self.assertIn("dispatched status 200", out.getvalue())
+        self.assertIn("overhead", out.getvalue())
+
+
+@override_settings(SERVER_TIMING=True)
+class BenchApiCommandTests(LiveServerTestCase):
+    """Test benchmarking the API of a live server."""
+
+    def setUp(self) -> None:
+        """Seed benchmark data and redirect media files."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        call_command("seed_bench", users=1, recipes_per_user=3,
+                     stdout=StringIO())
+
+    def test_bench_api(self) -> None:
+        """Test every scenario is measured and written as JSON."""
+        output = os.path.join(self.directory, "results.json")
+
+        with override_settings(MEDIA_ROOT=self.directory):
+            call_command(
+                "bench_api", base_url=self.live_server_url, users=1,
+                requests=4, concurrency=2, output=output, stdout=StringIO()
+            )
+
+        with open(output) as file:
+            scenarios = json.load(file)["results"]["scenarios"]
+
+        self.assertEqual(
+            {name: summary["errors"] for name, summary in scenarios.items()},
+            dict.fromkeys(scenarios, 0)
+        )
+        self.assertEqual(len(scenarios), 7)
+        self.assertIsNotNone(scenarios["list"]["queries_per_request"])
+
+    @override_settings(THROTTLING=True, THROTTLE_RATES={"login": "1/min"})
+    def test_bench_api_throttled(self) -> None:
+        """Test a throttled scenario fails instead of measuring the
+        throttle."""
+        with self.assertRaisesMessage(CommandError, "THROTTLING=0"):
+            call_command(
+                "bench_api", base_url=self.live_server_url, users=1,
+                requests=2, scenarios="token", stdout=StringIO()
+            )
@@ -1,31 +1,231 @@
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch, MagicMock
 
 from psycopg import OperationalError as PsycopgError
 
-from django.core.management import call_command
-from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
+from core.management.commands import migrate_locked
+from core.models import ImageUpload, Recipe, ThrottleBucket, Tombstone
+from utils import helpers
 
-@patch("core.management.commands.wait_for_db.Command.check")
+
+@patch("time.sleep")
+@patch("core.management.commands.wait_for_db.psycopg.connect")
 class CommandsTests(SimpleTestCase):
     """Test commands"""
 
-    def test_wait_for_db_ready(self, patched_check: MagicMock) -> None:
+    def test_wait_for_db_ready(self, patched_connect: MagicMock,
+                               patched_sleep: MagicMock) -> None:
         """Test waiting for database if database ready.
-        patched_check: is patched version of Command's check object."""
-        patched_check.return_value = True
-        call_command("wait_for_db")
-        patched_check.assert_called_once_with(databases=("default",))
+        patched_connect: is patched version of psycopg connect."""
+        call_command("wait_for_db", stdout=StringIO())
+
+        patched_connect.assert_called_once()
+        patched_connect.return_value.close.assert_called_once()
+        patched_sleep.assert_not_called()
 
-    @patch("time.sleep")
     def test_wait_for_db_delay(self,
-                               patched_sleep: MagicMock,
-                               patched_check: MagicMock) -> None:
-        """Test waiting for database when getting OperationalError."""
-        patched_check.side_effect = \
-            [PsycopgError] * 2 + [OperationalError] * 3 + [True]
-        call_command("wait_for_db")
-
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=("default",))
+                               patched_connect: MagicMock,
+                               patched_sleep: MagicMock) -> None:
+        """Test waiting for database when connecting fails, with growing
+        random delays."""
+        patched_connect.side_effect = \
+            [PsycopgError("refused")] * 5 + [MagicMock()]
+
+        with patch("random.uniform", side_effect=lambda low, high: high):
+            call_command("wait_for_db", stdout=StringIO(), stderr=StringIO(),
+                         initial_delay=0.1, max_delay=1)
+
+        self.assertEqual(patched_connect.call_count, 6)
+        self.assertEqual(
+            [call.args[0] for call in patched_sleep.call_args_list],
+            [0.1, 0.2, 0.4, 0.8, 1]
+        )
+
+    def test_wait_for_db_timeout(self, patched_connect: MagicMock,
+                                 patched_sleep: MagicMock) -> None:
+        """Test giving up with the last error once the timeout passed."""
+        patched_connect.side_effect = PsycopgError("connection refused")
+
+        with patch("time.monotonic", side_effect=[0, 1, 2, 3, 4]), \
+                self.assertRaisesMessage(CommandError, "connection refused"):
+            call_command("wait_for_db", stdout=StringIO(), stderr=StringIO(),
+                         timeout=3)
+
+        self.assertEqual(patched_connect.call_count, 3)
+
+
+class WaitForMigrationsTests(TestCase):
+    """Test waiting for migrations to be applied."""
+
+    @patch("time.sleep")
+    def test_wait_for_migrations(self, patched_sleep: MagicMock) -> None:
+        """Test waiting until the last migration is recorded."""
+        applied = MigrationRecorder(connection).applied_migrations()
+        pending = dict(applied)
+        pending.popitem()
+
+        with patch.object(MigrationRecorder, "applied_migrations",
+                          side_effect=[pending, applied]):
+            call_command("wait_for_db", migrations=True, stdout=StringIO(),
+                         stderr=StringIO())
+
+        self.assertEqual(patched_sleep.call_count, 1)
+
+
+class GcMediaCommandTests(TestCase):
+    """Test the orphaned media garbage collector command."""
+
+    def setUp(self) -> None:
+        """Create a temporary media root with referenced and orphaned
+        recipe images."""
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        self.settings_override.enable()
+        self.uploads = os.path.join(self.media_root.name, "uploads", "recipe")
+        os.makedirs(self.uploads)
+        recipe = helpers.create_recipe(user=helpers.create_user())
+        recipe.image = "uploads/recipe/referenced.jpg"
+        recipe.save()
+        old = time.time() - 2 * 60 * 60
+
+        for name, age in (("referenced.jpg", old), ("orphan.jpg", old),
+                          ("recent.jpg", time.time())):
+            path = os.path.join(self.uploads, name)
+
+            with open(path, "wb") as file:
+                file.write(b"x" * 10)
+
+            os.utime(path, (age, age))
+
+    def tearDown(self) -> None:
+        """Remove the temporary media root."""
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def test_gc_media_deletes_old_orphans(self) -> None:
+        """Test only orphans older than the grace period are deleted."""
+        out = StringIO()
+        call_command("gc_media", batch_size=1, stdout=out)
+
+        self.assertEqual(
+            sorted(os.listdir(self.uploads)), ["recent.jpg", "referenced.jpg"]
+        )
+        self.assertIn("Deleted 1 orphaned files, 10 bytes.", out.getvalue())
+
+    def test_gc_media_deletes_orphaned_parts(self) -> None:
+        """Test part files without an upload session are deleted once older
+        than the grace period."""
+        recipe = Recipe.objects.get()
+        upload = ImageUpload.objects.create(
+            user=recipe.user, recipe=recipe, filename="photo.png", size=10
+        )
+        parts = os.path.dirname(upload.part_path)
+        os.makedirs(parts)
+        orphan = os.path.join(parts, f"{uuid.uuid4()}.part")
+        recent = os.path.join(parts, f"{uuid.uuid4()}.part")
+        old = time.time() - 2 * 60 * 60
+
+        for path, age in ((upload.part_path, old), (orphan, old),
+                          (recent, time.time())):
+            with open(path, "wb") as file:
+                file.write(b"x")
+
+            os.utime(path, (age, age))
+
+        out = StringIO()
+        call_command("gc_media", stdout=out)
+
+        self.assertEqual(
+            sorted(os.listdir(parts)),
+            sorted([os.path.basename(upload.part_path),
+                    os.path.basename(recent)])
+        )
+        self.assertIn("Deleted 1 orphaned upload parts.", out.getvalue())
+
+    def test_gc_media_dry_run(self) -> None:
+        """Test dry run reports orphans without deleting them."""
+        out = StringIO()
+        call_command("gc_media", dry_run=True, stdout=out)
+
+        self.assertEqual(len(os.listdir(self.uploads)), 3)
+        self.assertIn("uploads/recipe/orphan.jpg", out.getvalue())
+        self.assertIn("Would delete 1 orphaned files, 10 bytes.",
+                      out.getvalue())
+
+
+class PurgeTombstonesCommandTests(TestCase):
+    """Test the expired tombstones purge command."""
+
+    def test_purge_tombstones(self) -> None:
+        """Test only tombstones older than the retention are deleted."""
+        user = helpers.create_user()
+        expired = Tombstone.objects.create(
+            user=user, model=Tombstone.RECIPE, object_id=uuid.uuid4()
+        )
+        Tombstone.objects.filter(id=expired.id).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        recent = Tombstone.objects.create(
+            user=user, model=Tombstone.TAG, object_id=uuid.uuid4()
+        )
+        call_command("purge_tombstones", stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.all()), [recent])
+
+
+class PurgeThrottleBucketsCommandTests(TestCase):
+    """Test the idle throttle buckets purge command."""
+
+    def test_purge_throttle_buckets(self) -> None:
+        """Test only buckets idle for longer than a day are deleted."""
+        now = timezone.now()
+        ThrottleBucket.objects.create(
+            key="read:ip:10.0.0.1", tokens=10, allowed=True,
+            updated_at=now - timedelta(days=2)
+        )
+        recent = ThrottleBucket.objects.create(
+            key="read:ip:10.0.0.2", tokens=10, allowed=True, updated_at=now
+        )
+        call_command("purge_throttle_buckets", stdout=StringIO())
+
+        self.assertEqual(list(ThrottleBucket.objects.all()), [recent])
+
+
+class MigrateLockedCommandTests(TestCase):
+    """Test migrating under the advisory lock."""
+
+    def _lock_held(self) -> bool:
+        """Return whether the migration advisory lock is held."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks "
+                "WHERE locktype = 'advisory' AND objid = %s",
+                [migrate_locked.LOCK_KEY]
+            )
+            return cursor.fetchone()[0] > 0
+
+    def test_migrate_holds_lock(self) -> None:
+        """Test migrate runs while the lock is held and releases it."""
+        held = []
+
+        with patch.object(migrate_locked, "call_command",
+                          side_effect=lambda *args, **kwargs:
+                          held.append(self._lock_held())) as patched:
+            call_command("migrate_locked", stdout=StringIO())
+
+        self.assertEqual(patched.call_args.args, ("migrate",))
+        self.assertEqual(held, [True])
+        self.assertFalse(self._lock_held())
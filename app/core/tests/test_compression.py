@@ -0,0 +1,156 @@
+"""
+Tests for response and static file compression.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock, skipIf
+
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.storage import CompressedManifestStaticFilesStorage
+
+LARGE = {"recipes": [{"title": "Pancakes", "price": "4.50"}] * 200}
+
+
+class NegotiateTests(SimpleTestCase):
+    """Test choosing the coding of an Accept-Encoding header."""
+
+    @mock.patch("core.compression.brotli", object())
+    def test_negotiate(self) -> None:
+        """Test brotli is preferred and weights are honoured."""
+        self.assertEqual(compression.negotiate("gzip, deflate, br"), "br")
+        self.assertEqual(compression.negotiate("gzip, br;q=0.5"), "gzip")
+        self.assertEqual(compression.negotiate("br;q=0, *"), "gzip")
+        self.assertIsNone(compression.negotiate("identity"))
+        self.assertIsNone(compression.negotiate("gzip;q=0"))
+        self.assertIsNone(compression.negotiate(""))
+
+    @mock.patch("core.compression.brotli", None)
+    def test_negotiate_without_brotli(self) -> None:
+        """Test gzip is used when brotli is not installed."""
+        self.assertEqual(compression.negotiate("br, gzip"), "gzip")
+        self.assertIsNone(compression.negotiate("br"))
+
+    def test_compressible(self) -> None:
+        """Test content types are matched exactly or by prefix."""
+        self.assertTrue(compression.compressible("application/json"))
+        self.assertTrue(compression.compressible("text/html; charset=utf-8"))
+        self.assertFalse(compression.compressible("image/jpeg"))
+        self.assertFalse(compression.compressible(""))
+
+
+@override_settings(COMPRESSION=True)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test compressing responses."""
+
+    def _get(self, response: HttpResponse,
+             accept_encoding: str = "gzip") -> HttpResponse:
+        """Pass the response through the middleware."""
+        request = RequestFactory().get(
+            "/", HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @mock.patch("core.compression.brotli", None)
+    def test_large_json_compressed(self) -> None:
+        """Test large JSON responses are gzipped with a weak ETag."""
+        original = JsonResponse(LARGE)
+        content = original.content
+        original["ETag"] = '"abc"'
+
+        response = self._get(original)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), content)
+        self.assertEqual(
+            response["Content-Length"], str(len(response.content))
+        )
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_small_response_not_compressed(self) -> None:
+        """Test responses under the size threshold are left alone."""
+        response = self._get(JsonResponse({"healthy": True}))
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_content_type_not_compressed(self) -> None:
+        """Test responses of other content types are left alone."""
+        response = self._get(
+            HttpResponse(b"x" * 4096, content_type="image/jpeg")
+        )
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_not_accepted(self) -> None:
+        """Test clients not accepting a coding get the original body, which
+        caches keep apart."""
+        response = self._get(JsonResponse(LARGE), accept_encoding="")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli(self) -> None:
+        """Test brotli is used when the client accepts it."""
+        response = self._get(JsonResponse(LARGE), accept_encoding="gzip, br")
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(
+            compression.brotli.decompress(response.content),
+            JsonResponse(LARGE).content
+        )
+
+
+class CompressedStaticFilesStorageTests(SimpleTestCase):
+    """Test compressed copies are written at collectstatic time."""
+
+    def setUp(self) -> None:
+        """Create a static root with a stylesheet and an image."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=self.directory
+        )
+
+        for name, content in (("app.css", b"body { color: red; }\n" * 100),
+                              ("tiny.css", b"a {}"),
+                              ("logo.png", b"\x89PNG" * 1000)):
+            with open(os.path.join(self.directory, name), "wb") as file:
+                file.write(content)
+
+        self.paths = {
+            name: (self.storage, name)
+            for name in ("app.css", "tiny.css", "logo.png")
+        }
+
+    @mock.patch("core.compression.brotli", None)
+    def test_post_process(self) -> None:
+        """Test original and hashed names of large compressible files get
+        compressed copies, and existing copies are kept."""
+        processed = list(self.storage.post_process(self.paths))
+        hashed = self.storage.stored_name("app.css")
+        files = set(os.listdir(self.directory))
+
+        self.assertIn("app.css.gz", files)
+        self.assertIn(hashed + ".gz", files)
+        self.assertNotIn("tiny.css.gz", files)
+        self.assertNotIn("logo.png.gz", files)
+        self.assertIn(("app.css", "app.css.gz", True), processed)
+
+        with open(os.path.join(self.directory, hashed + ".gz"), "rb") as file:
+            self.assertEqual(
+                gzip.decompress(file.read()),
+                b"body { color: red; }\n" * 100
+            )
+
+        processed = list(self.storage.post_process(self.paths))
+
+        self.assertNotIn(("app.css", "app.css.gz", True), processed)
@@ -0,0 +1,187 @@
+"""
+Tests for the change events fan-out and SSE endpoint.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core import events
+from utils import helpers
+
+EVENTS_URL = reverse("recipe:events")
+
+
+class BrokerTests(SimpleTestCase):
+    """Test the in-process event broker."""
+
+    def setUp(self) -> None:
+        """Create an isolated broker."""
+        self.broker = events.Broker()
+
+    async def test_event_delivered_to_user_subscriptions(self) -> None:
+        """Test events only reach the subscriptions of their user."""
+        mine = self.broker.subscribe("user-1")
+        other = self.broker.subscribe("user-2")
+        self.broker.deliver("user-1", {"type": "recipe", "id": "1"})
+        await asyncio.sleep(0)
+
+        self.assertEqual(mine.queue.get_nowait()["id"], "1")
+        self.assertTrue(other.queue.empty())
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscriber_gets_resync(self) -> None:
+        """Test a full queue is dropped and replaced by a resync event."""
+        subscription = self.broker.subscribe("user-1")
+
+        for index in range(3):
+            subscription.put({"type": "recipe", "id": str(index)})
+
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertIs(subscription.queue.get_nowait(), events.RESYNC)
+
+    @override_settings(EVENTS_MAX_SUBSCRIBERS=1)
+    async def test_subscribers_limited(self) -> None:
+        """Test subscribing over the process limit fails until a
+        subscription is released."""
+        subscription = self.broker.subscribe("user-1")
+
+        with self.assertRaises(events.TooManySubscribers):
+            self.broker.subscribe("user-2")
+
+        self.broker.unsubscribe(subscription)
+        self.broker.subscribe("user-2")
+
+    @override_settings(EVENTS_KEEPALIVE=0.01, EVENTS_MAX_CONNECTION_AGE=1)
+    async def test_stream_formats_events_and_keepalive(self) -> None:
+        """Test the stream yields SSE messages and stops after resync."""
+        with patch("core.events.broker", self.broker):
+            subscription = self.broker.subscribe("user-1")
+            stream = events.stream(subscription)
+
+            self.assertEqual(await anext(stream), "retry: 5000\n\n")
+            self.assertEqual(await anext(stream), ": keepalive\n\n")
+
+            subscription.put({"type": "tag", "action": "deleted"})
+
+            self.assertEqual(
+                await anext(stream),
+                'event: tag\ndata: {"type": "tag", "action": "deleted"}\n\n'
+            )
+
+            subscription.put(events.RESYNC)
+
+            self.assertIn("event: resync", await anext(stream))
+
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+
+        self.assertEqual(self.broker._count, 0)
+
+    async def test_listener_skips_malformed_notifications(self) -> None:
+        """Test malformed NOTIFY payloads are logged and the listener keeps
+        delivering the following events."""
+        async def notifies():
+            for payload in ("not json", '{"user": "user-1"}', "[]",
+                            '{"user": "user-1", "event": {"id": "1"}}'):
+                yield MagicMock(payload=payload)
+
+        conn = MagicMock()
+        conn.__aenter__.return_value = conn
+        conn.execute = AsyncMock()
+        conn.notifies = notifies
+        # The second connection attempt stops the listener.
+        connect = AsyncMock(side_effect=[conn, asyncio.CancelledError()])
+
+        with patch("core.events.psycopg.AsyncConnection.connect", connect), \
+                patch.object(self.broker, "deliver") as deliver, \
+                self.assertLogs("core.events", "ERROR") as logs:
+            with self.assertRaises(asyncio.CancelledError):
+                await self.broker._listen()
+
+        deliver.assert_called_once_with("user-1", {"id": "1"})
+        self.assertEqual(len(logs.records), 3)
+
+
+class SignalEventsTests(TestCase):
+    """Test model changes publish events."""
+
+    @patch("core.events.broker")
+    def test_recipe_changes_published_on_commit(
+            self, patched_broker: MagicMock) -> None:
+        """Test saving and deleting a recipe publishes events after
+        commit."""
+        user = helpers.create_user()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = helpers.create_recipe(user=user)
+            recipe_id = recipe.id
+            recipe.delete()
+
+        actions = [
+            call.args[1]["action"]
+            for call in patched_broker.deliver.call_args_list
+        ]
+
+        self.assertEqual(actions, ["created", "deleted"])
+        patched_broker.deliver.assert_called_with(user.id, {
+            "type": "recipe", "action": "deleted", "id": str(recipe_id)
+        })
+
+    @override_settings(EVENTS_BACKEND="postgres")
+    @patch("core.events.broker")
+    def test_postgres_backend_notifies(
+            self, patched_broker: MagicMock) -> None:
+        """Test the postgres backend sends events with NOTIFY."""
+        with self.captureOnCommitCallbacks(execute=True):
+            helpers.create_tag(user=helpers.create_user(), name="Vegan")
+
+        patched_broker.deliver.assert_not_called()
+
+
+class EventsApiTests(TransactionTestCase):
+    """Test the SSE endpoint. Async ORM queries of the view run in another
+    thread, so test data must be committed."""
+
+    def setUp(self) -> None:
+        """Create a user with an auth token."""
+        self.user = helpers.create_user()
+        self.token = Token.objects.create(user=self.user)
+
+    def test_events_need_asgi(self) -> None:
+        """Test WSGI requests are refused."""
+        response = self.client.get(EVENTS_URL)
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_events_auth_required(self) -> None:
+        """Test a valid token is required."""
+        response = await self.async_client.get(
+            EVENTS_URL, headers={"Authorization": "Token invalid"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(EVENTS_MAX_CONNECTION_AGE=0)
+    async def test_events_stream(self) -> None:
+        """Test the endpoint streams events."""
+        response = await self.async_client.get(
+            EVENTS_URL, headers={"Authorization": f"Token {self.token.key}"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(
+            [chunk async for chunk in response.streaming_content],
+            [b"retry: 5000\n\n"]
+        )
@@ -0,0 +1,184 @@
+"""
+Tests for the metrics registry and endpoint.
+"""
+import json
+import os
+import subprocess
+import tempfile
+import shutil
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from utils import helpers
+
+METRICS_URL = reverse("metrics")
+
+
+class RegistryTests(SimpleTestCase):
+    """Test counting and rendering of metrics."""
+
+    def setUp(self) -> None:
+        """Create an isolated registry and snapshot directory."""
+        self.registry = metrics.Registry()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_histogram_rendered_cumulative(self) -> None:
+        """Test histogram buckets are rendered cumulative with sum and
+        count."""
+        self.registry.observe("http_request_duration_seconds", 0.003,
+                              view="recipe-list")
+        self.registry.observe("http_request_duration_seconds", 0.02,
+                              view="recipe-list")
+        self.registry.observe("http_request_duration_seconds", 60,
+                              view="recipe-list")
+        text = metrics.render(self.registry.snapshot())
+
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe-list",'
+            'le="0.005"} 1', text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe-list",'
+            'le="0.025"} 2', text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe-list",'
+            'le="+Inf"} 3', text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="recipe-list"} 3', text
+        )
+
+    def test_label_values_escaped(self) -> None:
+        """Test quotes in label values are escaped."""
+        self.registry.inc("http_requests_total", view='a"b')
+
+        self.assertIn('http_requests_total{view="a\\"b"} 1',
+                      metrics.render(self.registry.snapshot()))
+
+    def test_snapshots_of_processes_summed(self) -> None:
+        """Test collect sums the snapshot files of all processes."""
+        other = {
+            "counters": {"http_requests_total": {'{view="recipe-list"}': 2}},
+            "histograms": {},
+        }
+
+        with open(os.path.join(self.directory, "1-other.json"), "w") as file:
+            json.dump(other, file)
+
+        with override_settings(METRICS_DIR=self.directory):
+            metrics.registry.inc("http_requests_total", 3, view="recipe-list")
+            merged = metrics.collect()
+
+        self.assertGreaterEqual(
+            merged["counters"]["http_requests_total"]['{view="recipe-list"}'],
+            5
+        )
+
+    def test_exited_snapshots_compacted(self) -> None:
+        """Test snapshots of exited processes are merged into the aggregate
+        snapshot once, and their files removed."""
+        process = subprocess.Popen(["true"])
+        process.wait()
+        exited = {
+            "counters": {"http_requests_total": {"": 2}},
+            "histograms": {},
+        }
+
+        for name in (f"{process.pid}-exited.json", metrics.AGGREGATE):
+            with open(os.path.join(self.directory, name), "w") as file:
+                json.dump(exited, file)
+
+        with override_settings(METRICS_DIR=self.directory):
+            for _ in range(2):
+                merged = metrics.collect()
+
+                self.assertEqual(
+                    merged["counters"]["http_requests_total"][""], 4
+                )
+
+        self.assertNotIn(f"{process.pid}-exited.json",
+                         os.listdir(self.directory))
+
+    def test_flush_throttled(self) -> None:
+        """Test snapshots are only written once per flush interval unless
+        forced."""
+        with override_settings(METRICS_DIR=self.directory,
+                               METRICS_FLUSH_INTERVAL=60):
+            self.registry.inc("http_requests_total")
+            self.registry.flush()
+            self.registry.inc("http_requests_total")
+            self.registry.flush()
+            path = os.path.join(self.directory, os.listdir(self.directory)[0])
+
+            with open(path) as file:
+                self.assertEqual(
+                    json.load(file)["counters"]["http_requests_total"][""], 1
+                )
+
+            self.registry.flush(force=True)
+
+            with open(path) as file:
+                self.assertEqual(
+                    json.load(file)["counters"]["http_requests_total"][""], 2
+                )
+
+
+@override_settings(METRICS_DIR="", DEBUG=True)
+class MetricsApiTests(TestCase):
+    """Test the metrics middleware and endpoint."""
+
+    def setUp(self) -> None:
+        """Create an authenticated client."""
+        self.user = helpers.create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_counted_by_view(self) -> None:
+        """Test requests are labelled with the resolved view name and count
+        their database queries."""
+        self.client.get(reverse("recipe:recipe-list"))
+        response = self.client.get(METRICS_URL)
+        text = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="recipe-list"}', text
+        )
+        self.assertIn('db_queries_total{view="recipe-list"}', text)
+        self.assertIn('http_response_size_bytes_count{view="recipe-list"}',
+                      text)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_configured(self) -> None:
+        """Test the endpoint requires the configured bearer token."""
+        denied = self.client.get(METRICS_URL)
+        allowed = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        self.assertEqual(denied.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_non_ascii_token_refused(self) -> None:
+        """Test tokens with non-ASCII characters are refused."""
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer sécret"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN="")
+    def test_token_required_outside_debug(self) -> None:
+        """Test the endpoint is refused without a token outside DEBUG."""
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -113,3 +113,14 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, "example.jpg")
 
         self.assertEqual(file_path, f"uploads/recipe/{uuid}.jpg")
+
+    def test_recipe_placeholders_cleared_without_image(self) -> None:
+        """Test removing the image clears the recipe placeholders."""
+        recipe: models.Recipe = helpers.create_recipe(
+            user=helpers.create_user(),
+            image_placeholder="L00000fQfQfQfQfQfQfQfQfQfQfQ",
+            image_color="#000000"
+        )
+
+        self.assertEqual(recipe.image_placeholder, "")
+        self.assertEqual(recipe.image_color, "")
@@ -0,0 +1,89 @@
+"""
+Tests for the path scoped middleware dispatcher.
+"""
+from django.contrib.auth import get_user_model
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import PathMiddlewareDispatcher
+
+
+class RecordingMiddleware:
+    """Middleware marking the requests and responses it hooks into."""
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        request.hooks = []
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.hooks.append("view")
+
+    def process_template_response(self, request, response):
+        response["X-Hooks"] = ",".join(request.hooks + ["template"])
+        return response
+
+    def process_exception(self, request, exception):
+        return HttpResponse(str(exception), status=418)
+
+
+RECORDING = {"/api/": ["core.tests.test_path_middleware.RecordingMiddleware"]}
+
+
+class PathMiddlewareDispatcherTests(TestCase):
+    """Test middlewares are run by request path."""
+
+    def test_api_skips_admin_middleware(self) -> None:
+        """Test API responses skip the session and clickjacking
+        middlewares the admin runs."""
+        api = self.client.get(reverse("health-check"))
+        admin = self.client.get(reverse("admin:login"))
+
+        self.assertNotIn("X-Frame-Options", api)
+        self.assertNotIn("Cookie", api.get("Vary", ""))
+        self.assertEqual(admin["X-Frame-Options"], "DENY")
+        self.assertIn("csrftoken", admin.cookies)
+
+    def test_admin_login(self) -> None:
+        """Test the admin still logs in with sessions and CSRF."""
+        get_user_model().objects.create_superuser(
+            email="admin@example.com", password="testpass123"
+        )
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.get(reverse("admin:login"))
+
+        response = self.client.post(reverse("admin:login"), {
+            "username": "admin@example.com",
+            "password": "testpass123",
+            "csrfmiddlewaretoken": self.client.cookies["csrftoken"].value,
+            "next": reverse("admin:index"),
+        })
+
+        self.assertRedirects(response, reverse("admin:index"))
+
+    @override_settings(PATH_MIDDLEWARE=RECORDING)
+    def test_hooks_delegated(self) -> None:
+        """Test the view and template response hooks of the matched chain
+        run."""
+        response = self.client.get(reverse("recipe:recipe-list"))
+
+        self.assertEqual(response["X-Hooks"], "view,template")
+
+    @override_settings(PATH_MIDDLEWARE=RECORDING)
+    def test_exception_hook_delegated(self) -> None:
+        """Test the exception hooks of the matched chain run, and no chain
+        runs for other paths."""
+        dispatcher = PathMiddlewareDispatcher(lambda request: None)
+        factory = RequestFactory()
+
+        response = dispatcher.process_exception(
+            factory.get("/api/recipe/recipes/"), ValueError("failed")
+        )
+
+        self.assertEqual(response.status_code, 418)
+        self.assertIsNone(dispatcher.process_exception(
+            factory.get("/admin/"), ValueError("failed")
+        ))
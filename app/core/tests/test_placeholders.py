@@ -0,0 +1,51 @@
+"""
+Tests for the image placeholders.
+"""
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from django.test import SimpleTestCase
+
+from core import placeholders
+
+
+class PlaceholderTests(SimpleTestCase):
+    """Test BlurHash and dominant color computation."""
+
+    def test_blurhash_known_value(self) -> None:
+        """Test BlurHash of a black image matches the reference encoder."""
+        pixels = np.zeros((10, 10, 3), dtype=np.uint8)
+
+        self.assertEqual(
+            placeholders.blurhash(pixels), "L00000fQfQfQfQfQfQfQfQfQfQfQ"
+        )
+
+    def test_blurhash_components(self) -> None:
+        """Test BlurHash length follows the number of components."""
+        pixels = np.random.default_rng(0).integers(
+            0, 256, (8, 12, 3), dtype=np.uint8
+        )
+
+        self.assertEqual(len(placeholders.blurhash(pixels, 4, 3)), 28)
+        self.assertEqual(len(placeholders.blurhash(pixels, 1, 1)), 6)
+
+    def test_dominant_color(self) -> None:
+        """Test the most common color wins over the average color."""
+        pixels = np.zeros((10, 10, 3), dtype=np.uint8)
+        pixels[:6] = (200, 100, 0)
+        pixels[6:] = (0, 0, 255)
+
+        self.assertEqual(placeholders.dominant_color(pixels), "#c86400")
+
+    def test_image_placeholders_keeps_file_position(self) -> None:
+        """Test computing placeholders leaves the file ready to be saved."""
+        file = BytesIO()
+        Image.new("RGB", (300, 200), "#336699").save(file, "PNG")
+        file.seek(0)
+        blurhash, color = placeholders.image_placeholders(file)
+
+        self.assertEqual(file.tell(), 0)
+        self.assertEqual(len(blurhash), 28)
+        self.assertEqual(color, "#336699")
@@ -0,0 +1,83 @@
+"""
+Tests for the liveness and readiness probes.
+"""
+import tempfile
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from core import probes
+
+LIVENESS_URL = reverse("liveness")
+READINESS_URL = reverse("readiness")
+
+
+class ProbeTests(TestCase):
+    """Test the liveness and readiness probes."""
+
+    def setUp(self) -> None:
+        """Expire cached check results and use a writable media root."""
+        probes.reset()
+        self.addCleanup(probes.reset)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_liveness(self) -> None:
+        """Test the liveness probe answers without checking
+        dependencies."""
+        with self.assertNumQueries(0):
+            response = self.client.get(LIVENESS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_readiness(self) -> None:
+        """Test the readiness probe reports every check."""
+        response = self.client.get(READINESS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["checks"],
+                         {"database": "ok", "cache": "ok", "media": "ok"})
+
+    def test_readiness_database_unavailable(self) -> None:
+        """Test the readiness probe fails when the database fails."""
+        with patch("django.db.backends.utils.CursorWrapper.execute",
+                   side_effect=OperationalError("connection refused")), \
+                patch("django.db.connection.close"):
+            response = self.client.get(READINESS_URL)
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()["checks"]["database"],
+                         "connection refused")
+
+    def test_readiness_media_not_writable(self) -> None:
+        """Test the readiness probe fails when media can not be written."""
+        with override_settings(MEDIA_ROOT="/nonexistent/media"):
+            response = self.client.get(READINESS_URL)
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_readiness_results_cached(self) -> None:
+        """Test repeated probes reuse the database check result."""
+        self.client.get(READINESS_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(READINESS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_probes_bypass_middleware(self) -> None:
+        """Test probes answer requests of hosts outside ALLOWED_HOSTS and
+        set no cookies."""
+        response = self.client.get(READINESS_URL, HTTP_HOST="10.0.0.7")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Vary", response)
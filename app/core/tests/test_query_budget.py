@@ -0,0 +1,104 @@
+"""
+Tests for the query budget of views.
+"""
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import registry
+from core.query_budget import QueryBudgetExceeded
+from core.slow_queries import slow_query_log
+from recipe.views import RecipeViewSet
+from utils import helpers
+from utils.mixins import QueryBudgetTestMixin
+
+RECIPE_URL = reverse("recipe:recipe-list")
+
+
+@patch.object(RecipeViewSet, "query_budget", {"list": 1})
+class QueryBudgetMiddlewareTests(TestCase):
+    """Test enforcing query budgets."""
+
+    def setUp(self) -> None:
+        """Setup for authenticated user with a recipe."""
+        self.user = helpers.create_user()
+        helpers.create_recipe(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_over_budget_raises(self) -> None:
+        """Test requests over budget raise in tests and DEBUG."""
+        with self.assertRaisesMessage(QueryBudgetExceeded,
+                                      "its budget is 1."):
+            self.client.get(RECIPE_URL)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_over_budget_logged_and_counted(self) -> None:
+        """Test requests over budget are logged and counted in
+        production."""
+        key = '{view="recipe:recipe-list"}'
+        counters = registry.snapshot()["counters"]
+        before = counters.get("query_budget_exceeded_total", {}).get(key, 0)
+
+        with self.assertLogs("core.middleware", "WARNING"):
+            response = self.client.get(RECIPE_URL)
+
+        counters = registry.snapshot()["counters"]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            counters["query_budget_exceeded_total"][key], before + 1
+        )
+
+    def test_actions_without_budget_unchecked(self) -> None:
+        """Test actions missing from the budget are not limited."""
+        response = self.client.post(RECIPE_URL, {
+            "title": "Soup", "time_minutes": 5, "price": "1.00"
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class QueryBudgetWithSlowQueryLogTests(QueryBudgetTestMixin, TestCase):
+    """Test the EXPLAIN queries of the slow query log are not counted."""
+
+    def setUp(self) -> None:
+        """Setup for authenticated user with a recipe and a slow query log
+        explaining every query."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_EXPLAIN_TOP=100,
+            SLOW_QUERY_LOG_DIR=directory
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = helpers.create_user()
+        helpers.create_recipe(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_explains_not_counted(self) -> None:
+        """Test requests within budget pass while their queries are
+        explained."""
+        before = len(slow_query_log.samples)
+        response = self.client.get(RECIPE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any(
+            sample["explain"]
+            for sample in list(slow_query_log.samples)[before:]
+        ))
+
+    def test_explains_not_counted_by_test_mixin(self) -> None:
+        """Test the budget assertion of tests counts queries like the
+        middleware."""
+        self.assertQueryBudget(RECIPE_URL, grow=lambda: [
+            helpers.create_recipe(user=self.user) for _ in range(3)
+        ])
@@ -0,0 +1,138 @@
+"""
+Tests for the prebuilt OpenAPI schema.
+"""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse("api-schema")
+
+
+class SchemaTestMixin:
+    """Build schemas into a temporary directory."""
+
+    def setUp(self) -> None:
+        """Redirect the schema files and forget loaded schemas."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(SCHEMA_DIR=directory, CODE_VERSION="")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema.reset()
+        self.addCleanup(schema.reset)
+        self.directory = directory
+
+
+class SchemaTests(SchemaTestMixin, SimpleTestCase):
+    """Test building and loading the schema."""
+
+    def test_build_writes_every_format(self) -> None:
+        """Test the schema is written once per format and read back
+        without generating it again."""
+        schema.build()
+        version = schema.code_version()
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            [f"schema-{version}.json", f"schema-{version}.yaml"]
+        )
+
+        with mock.patch("core.schema.build") as build:
+            artifact = schema.get("json")
+
+        build.assert_not_called()
+        self.assertIn(reverse("recipe:recipe-list"),
+                      json.loads(artifact.content)["paths"])
+
+    def test_sync_response_documented(self) -> None:
+        """Test the sync response shape is part of the schema."""
+        document = json.loads(schema.get("json").content)
+        response = document["paths"][reverse("recipe:sync")]["get"][
+            "responses"]["200"]["content"]["application/json"]["schema"]
+
+        self.assertEqual(response, {"$ref": "#/components/schemas/Sync"})
+        self.assertEqual(
+            sorted(document["components"]["schemas"]["Sync"]["properties"]),
+            ["cursor", "deleted", "full", "ingredients", "recipes", "tags"]
+        )
+
+    def test_get_builds_missing_schema(self) -> None:
+        """Test a missing schema is built on first use."""
+        artifact = schema.get("yaml")
+
+        self.assertTrue(artifact.content.startswith(b"openapi:"))
+        self.assertTrue(schema.schema_path("yaml").exists())
+
+    @override_settings(CODE_VERSION="abc123")
+    def test_code_version(self) -> None:
+        """Test CODE_VERSION names the schema files when set."""
+        schema.reset()
+
+        self.assertEqual(schema.code_version(), "abc123")
+        self.assertEqual(schema.schema_path("json").name,
+                         "schema-abc123.json")
+
+    def test_build_schema_command_prunes(self) -> None:
+        """Test the command builds the schema and deletes the files of
+        other code versions."""
+        stale = os.path.join(self.directory, "schema-old.json")
+        open(stale, "w").close()
+
+        call_command("build_schema", stdout=StringIO())
+
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(schema.schema_path("json").exists())
+
+
+class SchemaViewTests(SchemaTestMixin, TestCase):
+    """Test serving the prebuilt schema."""
+
+    def test_yaml_by_default(self) -> None:
+        """Test YAML is served by default and JSON on request."""
+        response = self.client.get(SCHEMA_URL)
+        json_response = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(response["Content-Type"],
+                         "application/vnd.oai.openapi")
+        self.assertEqual(json_response["Content-Type"],
+                         "application/vnd.oai.openapi+json")
+        self.assertIn("paths", json.loads(json_response.content))
+
+    def test_etag_revalidation(self) -> None:
+        """Test unversioned URLs are revalidated with the ETag."""
+        response = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        response = self.client.get(
+            SCHEMA_URL, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_versioned_url_immutable(self) -> None:
+        """Test URLs of the current code version are cached for good."""
+        response = self.client.get(
+            SCHEMA_URL, {"v": schema.code_version()}
+        )
+
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_swagger_references_prebuilt_schema(self) -> None:
+        """Test Swagger UI loads the JSON schema of the code version."""
+        response = self.client.get(reverse("api-docs"))
+
+        self.assertEqual(
+            response.data["schema_url"],
+            f"{SCHEMA_URL}?format=json&v={schema.code_version()}"
+        )
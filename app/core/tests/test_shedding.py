@@ -0,0 +1,197 @@
+"""
+Tests for adaptive load shedding.
+"""
+import time
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import shedding
+from core.middleware import LoadSheddingMiddleware
+
+
+class Clock:
+    """Clock advanced by the tests."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward, by exact microseconds."""
+        self.now = round(self.now + seconds, 6)
+
+
+class RouteClassTests(SimpleTestCase):
+    """Test classing requests."""
+
+    def test_route_class(self) -> None:
+        """Test requests are classed by path and method."""
+        factory = RequestFactory()
+        recipes = reverse("recipe:recipe-list")
+
+        self.assertEqual(
+            shedding.route_class(factory.post(reverse("user:token"))), "auth"
+        )
+        self.assertEqual(
+            shedding.route_class(factory.put(f"{recipes}/1/upload-image/")),
+            "upload"
+        )
+        self.assertEqual(shedding.route_class(factory.get(recipes)), "read")
+        self.assertEqual(shedding.route_class(factory.post(recipes)), "write")
+        self.assertIsNone(
+            shedding.route_class(factory.get(reverse("health-check")))
+        )
+
+    def test_queue_time(self) -> None:
+        """Test the X-Request-Start header is read in seconds or
+        milliseconds, and ignored when missing or invalid."""
+        factory = RequestFactory()
+
+        for header in ("t=1700000000.25", "1700000000250"):
+            request = factory.get("/", HTTP_X_REQUEST_START=header)
+
+            self.assertEqual(
+                shedding.queue_time(request, 1700000000.5), 0.25
+            )
+
+        self.assertEqual(shedding.queue_time(factory.get("/"), 1000), 0)
+        self.assertEqual(
+            shedding.queue_time(
+                factory.get("/", HTTP_X_REQUEST_START="t=abc"), 1000
+            ),
+            0
+        )
+
+
+class LoadShedderTests(SimpleTestCase):
+    """Test the admitted shares following the averages."""
+
+    def setUp(self) -> None:
+        self.clock = Clock()
+        self.shedder = shedding.LoadShedder(self.clock)
+
+    def _serve(self, name: str, latency: float, queue_time: float = 0,
+               requests: int = 20) -> int:
+        """Serve a second of requests of the class, return how many were
+        admitted."""
+        admitted = 0
+
+        for _ in range(requests):
+            self.clock.advance(1 / requests)
+
+            if self.shedder.admit(name):
+                admitted += 1
+                self.shedder.observe(name, latency, queue_time)
+
+        return admitted
+
+    def test_queue_sheds_in_order(self) -> None:
+        """Test requests waiting in the queue shed uploads, then writes,
+        halving their share every interval, and never reads."""
+        shares = []
+
+        for _ in range(6):
+            self._serve("read", 0.01, queue_time=0.5)
+            shares.append(
+                (self.shedder.admitted["upload"],
+                 self.shedder.admitted["write"])
+            )
+
+        self.assertEqual(shares, [
+            (0.5, 1.0), (0.25, 1.0), (0.125, 1.0), (0.0625, 1.0),
+            (0.05, 1.0), (0.05, 0.5),
+        ])
+        self.assertEqual(self._serve("read", 0.01, queue_time=0.5), 20)
+        self.assertEqual(self._serve("write", 0.01, queue_time=0.5), 5)
+        self.assertEqual(self._serve("upload", 0.01, queue_time=0.5), 1)
+
+    def test_recovers_in_reverse_order(self) -> None:
+        """Test shares are raised additively once the averages are under
+        their targets, the last class shed first."""
+        self.shedder.admitted.update(upload=0.05, write=0.5)
+
+        for _ in range(5):
+            self._serve("read", 0.01)
+
+        self.assertEqual(self.shedder.admitted["write"], 1.0)
+        self.assertAlmostEqual(self.shedder.admitted["upload"], 0.05)
+
+        self._serve("read", 0.01)
+
+        self.assertAlmostEqual(self.shedder.admitted["upload"], 0.15)
+
+    def test_slow_class_sheds(self) -> None:
+        """Test a class slower than its target sheds without queueing."""
+        self._serve("write", 2)
+
+        self.assertEqual(self.shedder.admitted["upload"], 0.5)
+
+        self._serve("write", 0.1)
+        self._serve("write", 0.1)
+
+        self.assertEqual(self.shedder.admitted["upload"], 0.7)
+
+    def test_recovers_after_outlier(self) -> None:
+        """Test the average of a class without new requests decays, so a
+        single slow request does not keep the shares down."""
+        self._serve("write", 10, requests=1)
+
+        for _ in range(5):
+            self._serve("read", 0.01)
+
+        self.assertEqual(self.shedder.admitted["upload"], 0.05)
+
+        for _ in range(25):
+            self._serve("read", 0.01)
+
+        self.assertEqual(self.shedder.admitted,
+                         {"upload": 1.0, "write": 1.0, "auth": 1.0})
+
+
+@override_settings(LOAD_SHEDDING=True)
+class LoadSheddingMiddlewareTests(SimpleTestCase):
+    """Test shedding requests in the middleware."""
+
+    def setUp(self) -> None:
+        self.get_response = mock.Mock(return_value=HttpResponse())
+        self.middleware = LoadSheddingMiddleware(self.get_response)
+        self.factory = RequestFactory()
+
+    @mock.patch("core.middleware.registry")
+    def test_shed_request(self, registry: mock.MagicMock) -> None:
+        """Test requests of a shed class get a 503 with Retry-After without
+        reaching the view, and are counted by class."""
+        self.middleware.shedder.admitted["write"] = 0.5
+
+        response = self.middleware(
+            self.factory.post(reverse("recipe:recipe-list"))
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.get_response.assert_not_called()
+        registry.inc.assert_called_once_with(
+            "shed_requests_total", route_class="write"
+        )
+
+    def test_observes_queue_time(self) -> None:
+        """Test served requests add their queue time to the averages."""
+        request = self.factory.get(
+            reverse("recipe:recipe-list"),
+            HTTP_X_REQUEST_START=f"t={time.time() - 1:.3f}"
+        )
+
+        self.assertEqual(self.middleware(request).status_code, 200)
+        self.assertGreater(self.middleware.shedder.queue_time, 0.19)
+
+    @override_settings(LOAD_SHEDDING=False)
+    def test_disabled(self) -> None:
+        """Test the middleware is not used when shedding is off."""
+        with self.assertRaises(MiddlewareNotUsed):
+            LoadSheddingMiddleware(self.get_response)
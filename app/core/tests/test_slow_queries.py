@@ -0,0 +1,129 @@
+"""
+Tests for the slow query log.
+"""
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import MagicMock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import slow_queries
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test normalizing SQL into fingerprints."""
+
+    def test_literals_normalized(self) -> None:
+        """Test queries differing in values share a fingerprint."""
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE a = 'x' AND b IN (1, 2) LIMIT 21"
+            ),
+            slow_queries.fingerprint(
+                "SELECT *  FROM t WHERE a = 'it''s' AND b IN (7, 8, 9)"
+                " LIMIT 5"
+            )
+        )
+
+    def test_parameter_lists_collapsed(self) -> None:
+        """Test placeholder lists of any length are collapsed."""
+        self.assertEqual(
+            slow_queries.normalize("SELECT 1 WHERE id IN (%s, %s, %s)"),
+            "SELECT ? WHERE id IN (...)"
+        )
+
+    def test_analyzable(self) -> None:
+        """Test only reads without locking clauses or functions with side
+        effects are analyzable."""
+        self.assertTrue(slow_queries.analyzable(
+            'SELECT COUNT(*) FROM "core_recipe" WHERE "core_recipe"."id" '
+            "= ANY(%s) AND title = 'pg_notify(x)'"
+        ))
+        self.assertFalse(slow_queries.analyzable("SELECT pg_notify('a', 'b')"))
+        self.assertFalse(slow_queries.analyzable("SELECT nextval('seq')"))
+        self.assertFalse(slow_queries.analyzable(
+            'SELECT * FROM "core_upload" WHERE id = %s FOR NO KEY UPDATE'
+        ))
+        self.assertFalse(slow_queries.analyzable("DELETE FROM t"))
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=10, SLOW_QUERY_EXPLAIN_TOP=1)
+class SlowQueryLogTests(TestCase):
+    """Test recording slow queries and reporting them."""
+
+    def setUp(self) -> None:
+        """Create an isolated log and a request resolved to a view."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.log = slow_queries.SlowQueryLog()
+        self.request = MagicMock(path="/api/recipe/recipes/")
+        self.request.resolver_match.view_name = "recipe:recipe-list"
+
+    def _run(self, sql: str) -> None:
+        """Run a query through the log's execute wrapper."""
+        with connection.execute_wrapper(self.log.wrapper(self.request)), \
+                connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def test_slow_query_recorded_with_plan(self) -> None:
+        """Test slow queries keep their view, call site and estimated plan,
+        without running them again."""
+        self._run("SELECT COUNT(*) FROM generate_series(1, 500000)")
+        self._run("SELECT 1")
+        sample, = self.log.samples
+
+        self.assertEqual(sample["view"], "recipe:recipe-list")
+        self.assertIn("test_slow_queries.py", sample["call_site"])
+        self.assertIn("cost=", sample["explain"])
+        self.assertNotIn("actual time", sample["explain"])
+
+    @override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True)
+    def test_slow_query_analyzed(self) -> None:
+        """Test slow reads are run again under EXPLAIN ANALYZE when it is
+        enabled."""
+        self._run("SELECT COUNT(*) FROM generate_series(1, 500000)")
+
+        self.assertIn("actual time", self.log.samples[0]["explain"])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_writes_not_explained(self) -> None:
+        """Test slow statements other than SELECTs are kept without a
+        plan."""
+        self._run("UPDATE core_throttlebucket SET tokens = 0 WHERE false")
+
+        self.assertIsNone(self.log.samples[0]["explain"])
+
+    @override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True)
+    def test_side_effects_not_analyzed(self) -> None:
+        """Test queries calling functions which may have side effects are
+        only planned, not executed again."""
+        self._run("SELECT pg_sleep(0.02)")
+
+        self.assertIn("Result", self.log.samples[0]["explain"])
+        self.assertNotIn("actual time", self.log.samples[0]["explain"])
+
+    def test_only_slowest_of_fingerprint_explained(self) -> None:
+        """Test faster repetitions of an explained query are not explained
+        again."""
+        self._run("SELECT pg_sleep(0.05)")
+        self._run("SELECT pg_sleep(0.02)")
+
+        self.assertIsNotNone(self.log.samples[0]["explain"])
+        self.assertIsNone(self.log.samples[1]["explain"])
+
+    def test_report(self) -> None:
+        """Test the report command groups samples of all processes."""
+        self._run("SELECT pg_sleep(0.02)")
+        self._run("SELECT pg_sleep(0.03)")
+        out = StringIO()
+
+        with override_settings(SLOW_QUERY_LOG_DIR=self.directory):
+            self.log.flush(force=True)
+            call_command("slow_query_report", stdout=out)
+
+        self.assertIn("2 queries", out.getvalue())
+        self.assertIn("SELECT pg_sleep(?)", out.getvalue())
+        self.assertIn("view: recipe:recipe-list (2)", out.getvalue())
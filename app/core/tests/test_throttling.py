@@ -0,0 +1,182 @@
+"""
+Tests for token bucket throttling.
+"""
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.models import ThrottleBucket
+from utils import helpers
+
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class ParseRateTests(SimpleTestCase):
+    """Test parsing throttle rates."""
+
+    def test_parse_rate(self) -> None:
+        """Test rates give the capacity and the refill per second."""
+        self.assertEqual(throttling.parse_rate("10/min"), (10, 10 / 60))
+        self.assertEqual(throttling.parse_rate("2/s"), (2, 2))
+        self.assertEqual(throttling.parse_rate("48/day"), (48, 48 / 86400))
+
+
+class TakeTests(TestCase):
+    """Test taking tokens from buckets."""
+
+    def test_bucket_empties(self) -> None:
+        """Test a new bucket is full and a token is taken per call until it
+        is empty."""
+        results = [throttling.take("key", 3, 0.001) for _ in range(4)]
+
+        self.assertEqual([allowed for allowed, _ in results],
+                         [True, True, True, False])
+        self.assertLess(results[-1][1], 1)
+
+    def test_bucket_refills(self) -> None:
+        """Test tokens are refilled over time up to the capacity."""
+        throttling.take("key", 2, 1)
+        ThrottleBucket.objects.filter(key="key").update(
+            tokens=0, updated_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        allowed, tokens = throttling.take("key", 2, 1)
+
+        self.assertTrue(allowed)
+        self.assertAlmostEqual(tokens, 0, places=1)
+
+        ThrottleBucket.objects.filter(key="key").update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertAlmostEqual(throttling.take("key", 2, 1)[1], 1, places=1)
+
+
+class SharedBucketTests(TransactionTestCase):
+    """Test buckets are shared by workers with their own connections."""
+
+    def test_rate_holds_across_connections(self) -> None:
+        """Test concurrent takes from separate connections, like those of
+        separate worker processes, never take more than the capacity."""
+        results = []
+        start = threading.Barrier(8)
+
+        def worker() -> None:
+            try:
+                start.wait()
+
+                for _ in range(3):
+                    results.append(throttling.take("key", 10, 0.001)[0])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 24)
+        self.assertEqual(results.count(True), 10)
+
+
+@override_settings(THROTTLING=True)
+class ThrottleApiTests(TestCase):
+    """Test throttling API requests."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = helpers.create_user()
+
+    @override_settings(THROTTLE_RATES={"login": "2/min"})
+    @mock.patch("core.throttling.registry")
+    def test_login_throttled_by_address(
+        self, registry: mock.MagicMock
+    ) -> None:
+        """Test token requests over the login rate get a 429 response with
+        a Retry-After header, counted by scope."""
+        payload = {"email": "test@example.com", "password": "wrong"}
+
+        for _ in range(2):
+            response = self.client.post(TOKEN_URL, payload)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertTrue(
+            ThrottleBucket.objects.filter(key="login:ip:127.0.0.1").exists()
+        )
+        registry.inc.assert_called_once_with(
+            "throttled_requests_total", scope="login"
+        )
+
+    @override_settings(THROTTLE_RATES={"read": "1/min", "write": "1/min"})
+    def test_scopes_throttled_by_user(self) -> None:
+        """Test reads and writes of a user are throttled apart, and apart
+        from other users."""
+        other = helpers.create_user(email="other@example.com")
+        self.client.force_authenticate(self.user)
+
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            self.client.post(RECIPES_URL, {}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(
+            set(ThrottleBucket.objects.values_list("key", flat=True)),
+            {f"read:user:{self.user.pk}", f"write:user:{self.user.pk}",
+             f"read:user:{other.pk}"}
+        )
+
+    @override_settings(THROTTLE_RATES={"read": "1/min", "write": "1/min"})
+    def test_upload_scope(self) -> None:
+        """Test upload actions use the upload scope, unthrottled when it has
+        no rate."""
+        recipe = helpers.create_recipe(self.user)
+        self.client.force_authenticate(self.user)
+
+        for _ in range(2):
+            response = self.client.post(
+                helpers.image_upload_url(recipe.id), {}, format="multipart"
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(THROTTLING=False, THROTTLE_RATES={"read": "1/min"})
+    def test_disabled(self) -> None:
+        """Test nothing is throttled when throttling is disabled."""
+        self.client.force_authenticate(self.user)
+
+        for _ in range(2):
+            self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                             status.HTTP_200_OK)
+
+        self.assertFalse(ThrottleBucket.objects.exists())
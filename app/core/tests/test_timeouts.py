@@ -0,0 +1,141 @@
+"""
+Tests for the database timeouts of API views.
+"""
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from psycopg import errors
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from core import timeouts
+from core.timeouts import DefaultTimeouts, StatementTimeoutMixin
+from user.views import CreateTokenView
+from utils import helpers
+
+
+def show(setting: str) -> str:
+    """Return the current value of a Postgres setting."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SHOW {setting}")
+        return cursor.fetchone()[0]
+
+
+class TimeoutView(StatementTimeoutMixin, APIView):
+    """View running the query of the request."""
+    authentication_classes = ()
+    permission_classes = ()
+    throttle_classes = ()
+    statement_timeout = {"post": 50}
+
+    def get(self, request) -> Response:
+        """Return the timeouts of the transaction."""
+        return Response({
+            "statement_timeout": show("statement_timeout"),
+            "lock_timeout": show("lock_timeout"),
+        })
+
+    def post(self, request) -> Response:
+        """Run a query slower than the timeout."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_sleep(1)")
+
+        return Response()
+
+    def put(self, request) -> Response:
+        """Fail waiting for a locked row."""
+        raise OperationalError("locked") from errors.LockNotAvailable()
+
+
+@override_settings(STATEMENT_TIMEOUT_MS=3000, LOCK_TIMEOUT_MS=1000)
+class StatementTimeoutMixinTests(TestCase):
+    """Test running view handlers with timeouts."""
+
+    def setUp(self) -> None:
+        self.view = TimeoutView.as_view()
+        self.factory = APIRequestFactory()
+
+    def test_default_timeouts(self) -> None:
+        """Test handlers run with the timeouts of the settings."""
+        response = self.view(self.factory.get("/"))
+
+        self.assertEqual(response.data, {
+            "statement_timeout": "3s", "lock_timeout": "1s"
+        })
+
+    def test_defaults_restored(self) -> None:
+        """Test requests outside the API restore the timeouts of the
+        connection before their first query."""
+        before = show("statement_timeout"), show("lock_timeout")
+
+        self.view(self.factory.get("/"))
+
+        with connection.execute_wrapper(DefaultTimeouts()):
+            after = show("statement_timeout"), show("lock_timeout")
+
+        self.assertEqual(after, before)
+
+    def test_applied_timeouts_not_set_again(self) -> None:
+        """Test requests reusing a connection which runs with their
+        timeouts do not set them again."""
+        connection.ensure_connection()
+        connection.api_timeouts = (connection.connection, (3000, 1000))
+        self.addCleanup(timeouts._mark, None)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.view(self.factory.get("/"))
+
+        self.assertFalse(any(
+            "set_config" in query["sql"] for query in queries
+        ))
+
+    @mock.patch("core.timeouts.registry")
+    def test_statement_timeout(self, registry: mock.MagicMock) -> None:
+        """Test statements over the timeout of the action are cancelled
+        with a 504 response and counted."""
+        response = self.view(self.factory.post("/"))
+
+        self.assertEqual(response.status_code, 504)
+        registry.inc.assert_called_once_with(
+            "db_timeouts_total", view="unresolved", timeout="statement"
+        )
+
+    def test_lock_timeout(self) -> None:
+        """Test lock timeouts get a 503 response with Retry-After."""
+        response = self.view(self.factory.put("/"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+@override_settings(STATEMENT_TIMEOUT_MS=3000, LOCK_TIMEOUT_MS=1000)
+class ApiTimeoutsTests(TestCase):
+    """Test the timeouts of API requests sharing a connection."""
+
+    def test_view_without_timeouts_after_view_with_timeouts(self) -> None:
+        """Test views without timeouts of their own run with the timeouts
+        of the connection after a view set its own on it."""
+        before = show("statement_timeout")
+        user = helpers.create_user()
+        client = APIClient()
+        seen = []
+        post = CreateTokenView.post
+
+        def record(view, request, *args, **kwargs) -> Response:
+            seen.append(show("statement_timeout"))
+            return post(view, request, *args, **kwargs)
+
+        client.force_authenticate(user)
+        client.get(reverse("recipe:recipe-list"))
+        client.force_authenticate(None)
+
+        with mock.patch.object(CreateTokenView, "post", record):
+            client.post(reverse("user:token"), {
+                "email": user.email, "password": "wrong"
+            })
+
+        self.assertEqual(seen, [before])
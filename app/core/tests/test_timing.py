@@ -0,0 +1,121 @@
+"""
+Tests for the Server-Timing middleware and request profiling.
+"""
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import timing
+from recipe.serializers import TagSerializer
+from utils import helpers
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class TimingsTests(TestCase):
+    """Test collecting the timings of a request."""
+
+    def tearDown(self) -> None:
+        """Stop collecting timings."""
+        timing.deactivate()
+
+    def test_header_format(self) -> None:
+        """Test durations are reported in milliseconds with
+        descriptions."""
+        timings = timing.Timings()
+        timings.add("db", 0.0123, "2 queries")
+        timings.add("auth", 0.001)
+
+        self.assertEqual(timings.header(),
+                         'db;dur=12.3;desc="2 queries", auth;dur=1.0')
+
+    def test_nested_serialization_counted_once(self) -> None:
+        """Test serializing many instances is accounted to serialize only
+        while timings are collected."""
+        user = helpers.create_user()
+        tag = helpers.create_tag(user=user, name="Vegan")
+        TagSerializer(tag).data
+        timings = timing.activate()
+        TagSerializer([tag, tag], many=True).data
+
+        self.assertIn("serialize", timings.durations)
+        self.assertFalse(timings.serializing)
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingMiddlewareTests(TestCase):
+    """Test the Server-Timing header and profiling of requests."""
+
+    def setUp(self) -> None:
+        """Create a token authenticated client and a profile directory."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.user = helpers.create_user()
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_server_timing_header(self) -> None:
+        """Test DRF responses break down auth, db, serialization and
+        rendering time."""
+        helpers.create_recipe(user=self.user)
+        response = self.client.get(RECIPES_URL)
+        metrics = [
+            metric.split(";")[0]
+            for metric in response["Server-Timing"].split(", ")
+        ]
+
+        self.assertEqual(
+            sorted(metrics),
+            ["auth", "db", "render", "serialize", "total"]
+        )
+
+    def test_server_timing_not_sent_to_anonymous_clients(self) -> None:
+        """Test unauthenticated clients get no Server-Timing header."""
+        self.client.credentials()
+        response = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", response)
+
+    def test_profile_requested_by_staff(self) -> None:
+        """Test staff users get their request profiled on demand."""
+        self.user.is_staff = True
+        self.user.save()
+
+        with override_settings(PROFILING_DIR=self.directory):
+            response = self.client.get(RECIPES_URL, HTTP_X_PROFILE="1")
+
+        self.assertEqual(os.listdir(self.directory), [response["X-Profile"]])
+
+    def test_profile_not_requestable_by_users(self) -> None:
+        """Test other users can not request a profile."""
+        with override_settings(PROFILING_DIR=self.directory):
+            response = self.client.get(RECIPES_URL, HTTP_X_PROFILE="1")
+
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @mock.patch("core.middleware.cProfile.Profile")
+    def test_profiler_not_started_for_anonymous_clients(
+        self, profile: mock.MagicMock
+    ) -> None:
+        """Test requests without a staff token are never profiled."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        self.client.get(RECIPES_URL, HTTP_X_PROFILE="1")
+
+        profile.assert_not_called()
+
+    def test_sampled_requests_profiled(self) -> None:
+        """Test sampled requests are profiled without a header."""
+        with override_settings(PROFILING_DIR=self.directory,
+                               PROFILING_SAMPLE_RATE=1):
+            self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(os.listdir(self.directory)), 1)
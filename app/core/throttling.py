@@ -0,0 +1,117 @@
+"""
+Token bucket throttling of API requests.
+
+Every scope and client has a bucket of THROTTLE_RATES tokens, refilled at
+the rate over its period. Buckets live in an unlogged table shared by every
+worker process, a single upsert refills the bucket from the database clock
+and takes a token, so a request costs one statement whatever the traffic.
+Reads pay it too: every throttled request writes its bucket row on the
+primary and waits on the row lock of concurrent requests of its client.
+The table is unlogged, so the writes skip the WAL, and a bucket shared by
+every worker holds the rate however requests spread over them.
+
+Views pick the scope of their actions with a `throttle_scopes` mapping of
+viewset actions (or HTTP methods of plain API views) to scopes, or a single
+`throttle_scope`. Other requests are "read" when safe and "write" otherwise.
+"""
+from django.conf import settings
+from django.db import connection
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from core.metrics import registry
+from core.models import ThrottleBucket
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+REFILLED = (
+    "LEAST(%(capacity)s, {table}.tokens + %(refill)s * GREATEST(0, "
+    "EXTRACT(EPOCH FROM statement_timestamp() - {table}.updated_at)))"
+)
+
+TAKE_SQL = """
+INSERT INTO {table} (key, tokens, allowed, updated_at)
+VALUES (%(key)s, %(capacity)s - 1, true, statement_timestamp())
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE WHEN {refilled} >= 1 THEN {refilled} - 1
+        ELSE {refilled} END,
+    allowed = {refilled} >= 1,
+    updated_at = statement_timestamp()
+RETURNING tokens, allowed
+"""
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """Return the capacity and the tokens refilled per second of a rate
+    such as "10/min"."""
+    num, period = rate.split("/")
+    capacity = int(num)
+
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take(key: str, capacity: int, refill: float) -> tuple[bool, float]:
+    """Refill the bucket of the key, take a token when one is left and
+    return whether it was taken and the tokens left."""
+    table = connection.ops.quote_name(ThrottleBucket._meta.db_table)
+    sql = TAKE_SQL.format(
+        table=table, refilled=REFILLED.format(table=table)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, {"key": key, "capacity": capacity, "refill": refill}
+        )
+        tokens, allowed = cursor.fetchone()
+
+    return allowed, tokens
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle requests of a user, or of an IP address for anonymous
+    requests, per scope."""
+
+    def get_scope(self, request, view) -> str:
+        """Return the throttle scope of the view action."""
+        scopes = getattr(view, "throttle_scopes", {})
+        method = request.method.lower()
+        scope = scopes.get(getattr(view, "action", None) or method)
+
+        if scope is None:
+            scope = getattr(view, "throttle_scope", None)
+
+        if scope is None:
+            scope = "read" if request.method in SAFE_METHODS else "write"
+
+        return scope
+
+    def get_cache_key(self, request, scope: str) -> str:
+        """Return the bucket key of the client in the scope."""
+        if request.user and request.user.is_authenticated:
+            return f"{scope}:user:{request.user.pk}"
+
+        return f"{scope}:ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view) -> bool:
+        if not settings.THROTTLING:
+            return True
+
+        scope = self.get_scope(request, view)
+        rate = settings.THROTTLE_RATES.get(scope)
+
+        if rate is None:
+            return True
+
+        capacity, self.refill = parse_rate(rate)
+        allowed, self.tokens = take(
+            self.get_cache_key(request, scope), capacity, self.refill
+        )
+
+        if not allowed:
+            registry.inc("throttled_requests_total", scope=scope)
+
+        return allowed
+
+    def wait(self) -> float:
+        """Return the seconds until the bucket holds a token."""
+        return (1 - self.tokens) / self.refill
@@ -0,0 +1,162 @@
+"""
+Postgres statement and lock timeouts of API views.
+
+Views with StatementTimeoutMixin set statement_timeout and lock_timeout on
+the connection before the first query of the request, STATEMENT_TIMEOUT_MS
+and LOCK_TIMEOUT_MS by default. No transaction is opened for them, so none
+is held while a view resizes images or writes files, and requests without
+queries pay nothing. The timeouts set are remembered with the connection,
+so API requests reusing it with the same timeouts skip the round trip, and
+DefaultTimeouts restores the connection's own before the first query of
+requests whose view does not set its timeouts, in the API or not. Like
+query budgets, a view overrides them with a `statement_timeout` or
+`lock_timeout` attribute, either a number of milliseconds or a mapping of
+viewset actions (or HTTP methods of plain API views) to milliseconds.
+"""
+from typing import Callable
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.http import HttpRequest
+from psycopg import errors
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core.metrics import registry
+
+# Error responses of the cancelled statements, by error class.
+TIMEOUT_RESPONSES = {
+    errors.QueryCanceled: (
+        "statement", status.HTTP_504_GATEWAY_TIMEOUT,
+        "Database query timed out.",
+    ),
+    errors.LockNotAvailable: (
+        "lock", status.HTTP_503_SERVICE_UNAVAILABLE,
+        "Database rows are locked, retry later.",
+    ),
+}
+LOCK_RETRY_AFTER = 1
+SET_TIMEOUTS = (
+    "SELECT set_config('statement_timeout', %s, false), "
+    "set_config('lock_timeout', %s, false)"
+)
+RESET_TIMEOUTS = (
+    "SELECT set_config(name, reset_val, false) FROM pg_settings "
+    "WHERE name IN ('statement_timeout', 'lock_timeout')"
+)
+# Timeouts set in a transaction, which a rollback may have undone.
+UNKNOWN = ()
+
+
+def _applied() -> tuple[int, int] | tuple[()] | None:
+    """Return the timeouts API views set on the open connection, None when
+    it runs with its own."""
+    raw, timeouts = getattr(connection, "api_timeouts", (None, None))
+
+    return timeouts if raw is connection.connection else None
+
+
+def _mark(timeouts: tuple[int, int] | tuple[()] | None) -> None:
+    """Remember the timeouts set on the open connection. Settings changed
+    in a transaction are unknown, its rollback restores the previous
+    ones."""
+    if timeouts and connection.in_atomic_block:
+        timeouts = UNKNOWN
+
+    connection.api_timeouts = (connection.connection, timeouts)
+
+
+class DefaultTimeouts:
+    """Database execute wrapper restoring the timeouts of a connection an
+    API view set its own on, before the first query of a request whose view
+    has no timeouts of its own."""
+
+    def __init__(self, request: HttpRequest | None = None) -> None:
+        self.request = request
+        self.checked = False
+
+    def _view_sets_timeouts(self) -> bool:
+        """Return whether the view of the request sets its timeouts."""
+        match = getattr(self.request, "resolver_match", None)
+        view_class = getattr(match.func, "cls", None) if match else None
+
+        return view_class is not None \
+            and issubclass(view_class, StatementTimeoutMixin)
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.checked:
+            self.checked = True
+
+            if _applied() is not None and not self._view_sets_timeouts():
+                context["cursor"].execute(RESET_TIMEOUTS)
+                _mark(UNKNOWN if connection.in_atomic_block else None)
+
+        return execute(sql, params, many, context)
+
+
+class StatementTimeoutMixin:
+    """DRF view mixin limiting the database time of the request."""
+
+    def _timeout(self, request: Request, attribute: str,
+                 default: int) -> int:
+        """Return the timeout of the view action in milliseconds."""
+        timeout = getattr(self, attribute, None)
+
+        if isinstance(timeout, dict):
+            method = request.method.lower()
+            timeout = timeout.get(getattr(self, "action", None) or method)
+
+        return default if timeout is None else timeout
+
+    def dispatch(self, request: HttpRequest, *args, **kwargs) -> Response:
+        self._timeouts_checked = False
+
+        with connection.execute_wrapper(self._set_timeouts):
+            return super().dispatch(request, *args, **kwargs)
+
+    def _set_timeouts(self, execute: Callable, sql: str, params, many: bool,
+                      context: dict):
+        """Set the timeouts of the action before the first query, unless
+        the connection already runs with them."""
+        if not self._timeouts_checked:
+            self._timeouts_checked = True
+            timeouts = (
+                self._timeout(
+                    self.request, "statement_timeout",
+                    settings.STATEMENT_TIMEOUT_MS
+                ),
+                self._timeout(
+                    self.request, "lock_timeout", settings.LOCK_TIMEOUT_MS
+                ),
+            )
+
+            if _applied() != timeouts:
+                context["cursor"].execute(
+                    SET_TIMEOUTS, [str(timeout) for timeout in timeouts]
+                )
+                _mark(timeouts)
+
+        return execute(sql, params, many, context)
+
+    def handle_exception(self, exc: Exception) -> Response:
+        if isinstance(exc, OperationalError):
+            for error, (kind, status_code, detail) \
+                    in TIMEOUT_RESPONSES.items():
+                if isinstance(exc.__cause__, error):
+                    return self._timeout_response(kind, status_code, detail)
+
+        return super().handle_exception(exc)
+
+    def _timeout_response(self, kind: str, status_code: int,
+                          detail: str) -> Response:
+        """Return the response of a cancelled statement and count it."""
+        match = self.request.resolver_match
+        view = match.url_name if match and match.url_name else "unresolved"
+        registry.inc("db_timeouts_total", view=view, timeout=kind)
+        response = Response({"detail": detail}, status=status_code)
+
+        if status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response["Retry-After"] = str(LOCK_RETRY_AFTER)
+
+        return response
@@ -0,0 +1,106 @@
+"""
+Server-Timing breakdown of the request being handled.
+
+ServerTimingMiddleware activates a Timings object for the request, the DRF
+view and serializer mixins of this module add the time of their phase to it.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+
+class Timings:
+    """Durations of the phases of a request in seconds."""
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+        self.descriptions: dict[str, str] = {}
+        self.serializing = False
+
+    def add(self, name: str, seconds: float, description: str = "") -> None:
+        """Add time spent in a phase."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+        if description:
+            self.descriptions[name] = description
+
+    def header(self) -> str:
+        """Return the Server-Timing header value, durations in
+        milliseconds."""
+        metrics = []
+
+        for name, seconds in self.durations.items():
+            metric = f"{name};dur={seconds * 1000:.1f}"
+
+            if name in self.descriptions:
+                metric += f';desc="{self.descriptions[name]}"'
+
+            metrics.append(metric)
+
+        return ", ".join(metrics)
+
+
+_timings: ContextVar[Timings | None] = ContextVar("timings", default=None)
+
+
+def activate() -> Timings:
+    """Start collecting timings of the current request."""
+    timings = Timings()
+    _timings.set(timings)
+    return timings
+
+
+def deactivate() -> None:
+    """Stop collecting timings."""
+    _timings.set(None)
+
+
+def current() -> Timings | None:
+    """Return the timings of the current request, if collected."""
+    return _timings.get()
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """Add the duration of the block to the current request's timings."""
+    timings = _timings.get()
+
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class TimedAuthenticationMixin:
+    """DRF view mixin timing the authentication of the request."""
+
+    def perform_authentication(self, request) -> None:
+        with measure("auth"):
+            super().perform_authentication(request)
+
+
+class TimedSerializerMixin:
+    """DRF serializer mixin timing the serialization of instances. Nested
+    serializers are accounted to the outermost one. Lazy loaded relations
+    are also accounted to the database."""
+
+    def to_representation(self, instance) -> dict:
+        timings = _timings.get()
+
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+
+        timings.serializing = True
+
+        try:
+            with measure("serialize"):
+                return super().to_representation(instance)
+        finally:
+            timings.serializing = False
@@ -1,12 +1,106 @@
 """
 Core views for API.
 """
-from django.http import JsonResponse
-from rest_framework.decorators import api_view
+import hmac
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_GET
+from drf_spectacular.plumbing import set_query_parameters
+from drf_spectacular.views import SpectacularSwaggerView
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.request import Request
 
+from core import metrics as core_metrics
+from core import probes, schema
+
 
 @api_view(["GET"])
+@throttle_classes([])
 def health_check(request: Request) -> JsonResponse:
     """Returns successful response."""
     return JsonResponse({"healthy": True})
+
+
+def liveness(request: HttpRequest) -> JsonResponse:
+    """Returns successful response while the process serves requests."""
+    return JsonResponse({"status": "ok"})
+
+
+def readiness(request: HttpRequest) -> JsonResponse:
+    """Returns the state of the database, cache and media volume, with a
+    503 status when any of them is unavailable."""
+    ready, checks = probes.readiness()
+
+    return JsonResponse(
+        {"status": "ok" if ready else "unavailable", "checks": checks},
+        status=200 if ready else 503
+    )
+
+
+@require_GET
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Returns the metrics of all workers in the Prometheus text format.
+    Requires the METRICS_TOKEN bearer token, and is only public without one
+    in DEBUG."""
+    if not settings.METRICS_TOKEN and not settings.DEBUG:
+        return HttpResponse(status=403)
+
+    # Compared as bytes, compare_digest refuses non-ASCII strings.
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(),
+            f"Bearer {settings.METRICS_TOKEN}".encode()):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        core_metrics.render(core_metrics.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def _schema_format(request: HttpRequest) -> str:
+    """Return the schema format of a format parameter or Accept header,
+    YAML by default."""
+    schema_format = request.GET.get("format")
+
+    if schema_format in schema.RENDERERS:
+        return schema_format
+
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+@require_GET
+@condition(etag_func=lambda request: schema.get(_schema_format(request)).etag)
+def openapi_schema(request: HttpRequest) -> HttpResponse:
+    """Returns the prebuilt OpenAPI schema. URLs carrying the current code
+    version never change and are cached for good, others are
+    revalidated with the ETag."""
+    artifact = schema.get(_schema_format(request))
+    response = HttpResponse(
+        artifact.content, content_type=artifact.content_type
+    )
+
+    if request.GET.get("v") == schema.code_version():
+        patch_cache_control(
+            response, public=True, max_age=365 * 24 * 60 * 60, immutable=True
+        )
+    else:
+        patch_cache_control(response, no_cache=True)
+
+    if "format" not in request.GET:
+        patch_vary_headers(response, ("Accept",))
+
+    return response
+
+
+class SwaggerView(SpectacularSwaggerView):
+    """Swagger UI loading the prebuilt JSON schema of the current code
+    version."""
+
+    def _get_schema_url(self, request: HttpRequest) -> str:
+        return set_query_parameters(
+            super()._get_schema_url(request),
+            format="json",
+            v=schema.code_version()
+        )
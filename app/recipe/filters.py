@@ -0,0 +1,32 @@
+"""
+Parsing of the ID list filters of the recipe APIs.
+"""
+import uuid
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+
+def parse_uuid_list(name: str, value: str) -> list[uuid.UUID]:
+    """Return the distinct UUIDs of a comma separated query parameter in
+    their order. Malformed UUIDs and more than FILTER_MAX_IDS distinct IDs
+    raise a ValidationError of the parameter."""
+    ids: dict[uuid.UUID, None] = {}
+
+    for item in value.split(","):
+        item = item.strip()
+
+        if not item:
+            continue
+
+        try:
+            ids.setdefault(uuid.UUID(item), None)
+        except ValueError:
+            raise ValidationError({name: f"{item[:36]!r} is not a UUID."})
+
+        if len(ids) > settings.FILTER_MAX_IDS:
+            raise ValidationError({
+                name: f"At most {settings.FILTER_MAX_IDS} IDs are allowed."
+            })
+
+    return list(ids)
@@ -0,0 +1,221 @@
+"""
+Recipe image variants resized on demand and kept in a bounded disk cache.
+"""
+import fcntl
+import hashlib
+import os
+import posixpath
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+from core.metrics import registry
+
+CACHE_DIR = posixpath.join("cache", "recipe")
+LOCK_STRIPES = 64
+# Seconds between touches of a variant served from the cache. Variants
+# touched within twice this time are never evicted, they may be about to be
+# served.
+TOUCH_INTERVAL = 60
+# Share of the cache bound written by a process between two evictions.
+EVICT_EVERY = 0.05
+
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+}
+
+_thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_written_lock = threading.Lock()
+_written = 0
+
+
+def _cache_root() -> str:
+    """Return the absolute path of the variants cache."""
+    return os.path.join(settings.MEDIA_ROOT, CACHE_DIR)
+
+
+def variant_name(
+        image: FieldFile,
+        width: int | None,
+        height: int | None,
+        fmt: str
+) -> str:
+    """Create and return the storage name of an image variant. The key
+    hashes the source identity, so a replaced image never hits stale
+    variants."""
+    stat = os.stat(image.path)
+    key = hashlib.sha256(
+        f"{image.name}:{stat.st_size}:{stat.st_mtime_ns}:"
+        f"{width}:{height}:{fmt}".encode()
+    ).hexdigest()
+
+    return posixpath.join(CACHE_DIR, key[:2], key + FORMATS[fmt][1])
+
+
+@contextmanager
+def _single_flight(key: str) -> Iterator[None]:
+    """Serialize work on the same key across threads and processes. Locks
+    are striped over a fixed set of files so they never need cleanup."""
+    stripe = zlib.crc32(key.encode()) % LOCK_STRIPES
+    lock_dir = os.path.join(_cache_root(), ".locks")
+    os.makedirs(lock_dir, exist_ok=True)
+
+    with _thread_locks[stripe]:
+        fd = os.open(
+            os.path.join(lock_dir, str(stripe)), os.O_CREAT | os.O_RDWR
+        )
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def _resize(source: str, target: str, width: int | None,
+            height: int | None, fmt: str) -> None:
+    """Resize the source image to fit in the given box and atomically write
+    it to the target path."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width or image.width, height or image.height))
+
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                image.save(tmp_file, format=FORMATS[fmt][0])
+
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _evict(max_bytes: int) -> None:
+    """Delete the least recently used variants until the cache is below its
+    size bound, leaving some headroom to avoid evicting on every miss.
+    Recently used variants are kept."""
+    recent = time.time() - 2 * TOUCH_INTERVAL
+    files = []
+    total = 0
+
+    with os.scandir(_cache_root()) as shards:
+        for shard in shards:
+            if shard.name.startswith(".") or not shard.is_dir():
+                continue
+
+            with os.scandir(shard.path) as entries:
+                for entry in entries:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # Evicted by another worker or replaced by a resize
+                        # since the directory was listed.
+                        continue
+
+                    total += stat.st_size
+
+                    if stat.st_atime < recent:
+                        files.append(
+                            (stat.st_atime, stat.st_size, entry.path)
+                        )
+
+    if total <= max_bytes:
+        return
+
+    files.sort()
+
+    for _, size, path in files:
+        if total <= max_bytes * 0.9:
+            break
+
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            # Already evicted by another worker, its size is still freed.
+            pass
+
+        total -= size
+
+
+def _written_since_eviction(size: int, max_bytes: int) -> bool:
+    """Count the bytes of a new variant and return whether the process wrote
+    enough since its last eviction to walk the cache again."""
+    global _written
+
+    with _written_lock:
+        _written += size
+
+        if _written < max_bytes * EVICT_EVERY:
+            return False
+
+        _written = 0
+        return True
+
+
+def source_format(image: FieldFile) -> str:
+    """Return the variant format matching the source image."""
+    extension = os.path.splitext(image.name)[1].lower()
+
+    for fmt, (_, fmt_extension) in FORMATS.items():
+        if extension in (fmt_extension, f".{fmt}"):
+            return fmt
+
+    return "jpeg"
+
+
+def get_variant(
+        image: FieldFile,
+        width: int | None = None,
+        height: int | None = None,
+        fmt: str | None = None
+) -> str:
+    """Return the storage name of the resized image variant, creating it on
+    first request. Concurrent requests for a missing variant wait for a
+    single resize instead of each running their own."""
+    fmt = fmt or source_format(image)
+    name = variant_name(image, width, height, fmt)
+    path = os.path.join(settings.MEDIA_ROOT, name)
+
+    try:
+        stat = os.stat(path)
+
+        # Access time orders the LRU, touch it at most once per
+        # TOUCH_INTERVAL to avoid a metadata write on every hit. The
+        # modification time is kept, ETag and Last-Modified derive from it.
+        if time.time() - stat.st_atime > TOUCH_INTERVAL:
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except FileNotFoundError:
+        # Missing, or evicted since the stat, it is resized again.
+        pass
+    else:
+        registry.inc("cache_requests_total", cache="recipe_image",
+                     result="hit")
+        return name
+
+    registry.inc("cache_requests_total", cache="recipe_image", result="miss")
+    max_bytes = settings.RECIPE_IMAGE_CACHE_MAX_BYTES
+
+    with _single_flight(name):
+        if not os.path.exists(path):
+            _resize(image.path, path, width, height, fmt)
+
+            if _written_since_eviction(os.path.getsize(path), max_bytes):
+                _evict(max_bytes)
+
+    return name
@@ -1,12 +1,41 @@
 """
 Serializers for Recipe APIs.
 """
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.validators import get_available_image_extensions
+from django.urls import reverse
+from django.db.models.fields.files import FieldFile
+
 from rest_framework import serializers
 
-from core.models import Recipe, Tag, User, Ingredient
+from core.media import file_version
+from core.models import Recipe, Tag, User, Ingredient, ImageUpload
+from core.timing import TimedSerializerMixin
+from recipe.images import FORMATS
+
+
+class ProtectedImageField(serializers.ImageField):
+    """Image field represented by the owner only image endpoint URL."""
+
+    def to_representation(self, value: FieldFile) -> str | None:
+        """Return the versioned image endpoint URL of the recipe."""
+        if not value:
+            return None
+
+        url = reverse("recipe:recipe-image", args=(value.instance.pk,))
+        url = f"{url}?{urlencode({'v': file_version(value)})}"
+        request = self.context.get("request", None)
 
+        if request is not None:
+            return request.build_absolute_uri(url)
 
-class TagSerializer(serializers.ModelSerializer):
+        return url
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the tags"""
     class Meta:
         model = Tag
@@ -14,7 +43,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the ingredients."""
     class Meta:
         model = Ingredient
@@ -22,18 +51,21 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    image = ProtectedImageField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = [
             "id", "title", "time_minutes", "price", "link", "tags",
-            "ingredients", "image"
+            "ingredients", "image", "image_placeholder", "image_color"
+        ]
+        read_only_fields = [
+            "id", "image", "image_placeholder", "image_color"
         ]
-        read_only_fields = ["id", "image"]
 
     def create(self, validated_data: dict) -> Recipe:
         """Create a recipe with creation and adding tags."""
@@ -124,12 +156,77 @@ class RecipeDetailSerializer(RecipeSerializer):
             ["created_at", "updated_at"]
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
+    image = ProtectedImageField(required=True)
+
     class Meta:
         model = Recipe
-        fields = ["id", "image"]
-        read_only_fields = ["id"]
-        extra_kwargs = {
-            "image": {"required": True}
-        }
+        fields = ["id", "image", "image_placeholder", "image_color"]
+        read_only_fields = ["id", "image_placeholder", "image_color"]
+
+
+class RecipeImageVariantSerializer(serializers.Serializer):
+    """Serializer for the resized recipe image query parameters."""
+    w = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RECIPE_IMAGE_MAX_DIMENSION,
+        required=False
+    )
+    h = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RECIPE_IMAGE_MAX_DIMENSION,
+        required=False
+    )
+    fmt = serializers.ChoiceField(choices=list(FORMATS), required=False)
+    v = serializers.CharField(required=False)
+
+
+class ImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for resumable recipe image upload sessions."""
+    class Meta:
+        model = ImageUpload
+        fields = ["id", "filename", "size", "offset", "created_at"]
+        read_only_fields = ["id", "offset", "created_at"]
+
+    def validate_filename(self, value: str) -> str:
+        """Validate the file name has an image extension."""
+        extension = os.path.splitext(value)[1][1:].lower()
+
+        if extension not in get_available_image_extensions():
+            raise serializers.ValidationError(
+                "File extension is not an image extension."
+            )
+
+        return value
+
+    def validate_size(self, value: int) -> int:
+        """Validate the upload size is within the allowed image size."""
+        if not 0 < value <= settings.RECIPE_IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                "Ensure size is between 1 and "
+                f"{settings.RECIPE_IMAGE_UPLOAD_MAX_SIZE} bytes."
+            )
+
+        return value
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    """Serializer for the IDs of the objects deleted since a sync cursor."""
+    recipe = serializers.ListField(child=serializers.UUIDField())
+    tag = serializers.ListField(child=serializers.UUIDField())
+    ingredient = serializers.ListField(child=serializers.UUIDField())
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer documenting the sync response."""
+    cursor = serializers.CharField(
+        help_text="Cursor to send as since in the next sync."
+    )
+    full = serializers.BooleanField(
+        help_text="Whether every object is returned, not only the changed."
+    )
+    recipes = RecipeDetailSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = SyncDeletedSerializer()
@@ -0,0 +1,269 @@
+"""
+Tests for resumable recipe image upload APIs.
+"""
+import fcntl
+import os
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.response import Response
+
+from core import models
+from recipe import uploads
+from utils import helpers
+
+
+def uploads_url(recipe_id) -> str:
+    """Create and return the upload sessions URL of a recipe."""
+    return reverse("recipe:recipe-create-upload", args=(recipe_id,))
+
+
+def upload_url(recipe_id, upload_id) -> str:
+    """Create and return an upload session URL."""
+    return reverse("recipe:recipe-upload-chunk", args=(recipe_id, upload_id))
+
+
+def finalize_url(recipe_id, upload_id) -> str:
+    """Create and return an upload finalize URL."""
+    return reverse(
+        "recipe:recipe-finalize-upload", args=(recipe_id, upload_id)
+    )
+
+
+class ImageUploadApiTests(TestCase):
+    """Test resumable image uploads."""
+
+    def setUp(self) -> None:
+        """Setup for authenticated client, recipe and temporary media."""
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = helpers.create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = helpers.create_recipe(user=self.user)
+        image = BytesIO()
+        Image.new("RGB", (40, 30), "#00ff00").save(image, "PNG")
+        self.content = image.getvalue()
+
+    def tearDown(self) -> None:
+        """Remove the temporary media root."""
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def _start(self, size=None) -> dict:
+        """Start an upload session and return its data."""
+        response: Response = self.client.post(
+            uploads_url(self.recipe.id),
+            {"filename": "photo.png", "size": size or len(self.content)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return response.data
+
+    def _put(self, upload_id, start, data) -> Response:
+        """Send a chunk starting at the given offset."""
+        return self.client.generic(
+            "PUT",
+            upload_url(self.recipe.id, upload_id),
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/"
+                               f"{len(self.content)}"
+        )
+
+    def test_resumable_upload(self) -> None:
+        """Test uploading an image in chunks and finalizing it."""
+        upload = self._start()
+        middle = len(self.content) // 2
+
+        self.assertEqual(upload["offset"], 0)
+
+        response = self._put(upload["id"], 0, self.content[:middle])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["offset"], middle)
+
+        response = self.client.get(upload_url(self.recipe.id, upload["id"]))
+
+        self.assertEqual(response.data["offset"], middle)
+
+        self._put(upload["id"], middle, self.content[middle:])
+        response = self.client.post(
+            finalize_url(self.recipe.id, upload["id"])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.recipe.refresh_from_db()
+
+        with open(self.recipe.image.path, "rb") as image:
+            self.assertEqual(image.read(), self.content)
+
+        self.assertEqual(self.recipe.image_color, "#00ff00")
+        self.assertFalse(models.ImageUpload.objects.exists())
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root.name, "uploads", "parts")),
+            []
+        )
+
+    def test_chunk_wrong_offset_conflict(self) -> None:
+        """Test a chunk not continuing the upload is rejected."""
+        upload = self._start()
+        response = self._put(upload["id"], 5, self.content[5:10])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 0)
+
+    def test_racing_chunk_conflict(self) -> None:
+        """Test a chunk whose offset another chunk claimed first is rejected
+        without writing into the part file."""
+        upload = self._start()
+        write_chunk = uploads.write_chunk
+
+        def race(upload, stream, start, length) -> int | None:
+            models.ImageUpload.objects.filter(id=upload.id).update(
+                offset=10
+            )
+            return write_chunk(upload, stream, start, length)
+
+        with mock.patch("recipe.uploads.write_chunk", side_effect=race):
+            response = self._put(upload["id"], 0, self.content[:20])
+
+        part = models.ImageUpload.objects.get(id=upload["id"]).part_path
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 10)
+        self.assertEqual(os.path.getsize(part), 0)
+
+    def test_chunk_being_written_conflict(self) -> None:
+        """Test a chunk sent while another chunk of the upload is written
+        is rejected."""
+        upload = self._start()
+        part = models.ImageUpload.objects.get(id=upload["id"]).part_path
+        os.makedirs(os.path.dirname(part))
+
+        with open(part, "wb") as locked:
+            fcntl.flock(locked, fcntl.LOCK_EX)
+            response = self._put(upload["id"], 0, self.content[:20])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 0)
+
+    def test_interrupted_chunk_kept(self) -> None:
+        """Test the bytes of a chunk received before its stream ended are
+        kept and the upload resumes after them."""
+        upload = self._start()
+        stream = BytesIO(self.content[:10])
+        instance = models.ImageUpload.objects.get(id=upload["id"])
+
+        self.assertEqual(
+            uploads.write_chunk(instance, stream, 0, len(self.content)), 10
+        )
+
+        instance.refresh_from_db()
+
+        self.assertEqual(instance.offset, 10)
+
+        with open(instance.part_path, "rb") as part:
+            self.assertEqual(part.read(), self.content[:10])
+
+    def test_racing_finalize_not_found(self) -> None:
+        """Test only one of racing finalize requests attaches the upload,
+        the other gets a 404 response."""
+        upload = self._start()
+        self._put(upload["id"], 0, self.content)
+        finalize = uploads.finalize
+
+        def race(upload):
+            finalize(upload)
+            return finalize(upload)
+
+        with mock.patch("recipe.uploads.finalize", side_effect=race):
+            response = self.client.post(
+                finalize_url(self.recipe.id, upload["id"])
+            )
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(self.recipe.image)
+
+    def test_finalize_touches_image(self) -> None:
+        """Test finalized images are modified now, however long the upload
+        took, so gc_media keeps them in its grace period."""
+        upload = self._start()
+        self._put(upload["id"], 0, self.content)
+        part = models.ImageUpload.objects.get(id=upload["id"]).part_path
+        os.utime(part, (0, 0))
+        self.client.post(finalize_url(self.recipe.id, upload["id"]))
+        self.recipe.refresh_from_db()
+
+        self.assertGreater(
+            os.path.getmtime(self.recipe.image.path), time.time() - 60
+        )
+
+    def test_chunk_requires_content_range(self) -> None:
+        """Test a chunk without Content-Range is rejected."""
+        upload = self._start()
+        response = self.client.generic(
+            "PUT",
+            upload_url(self.recipe.id, upload["id"]),
+            self.content,
+            content_type="application/octet-stream"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_incomplete_upload(self) -> None:
+        """Test finalizing before all bytes arrived is rejected."""
+        upload = self._start()
+        self._put(upload["id"], 0, self.content[:10])
+        response = self.client.post(
+            finalize_url(self.recipe.id, upload["id"])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_finalize_invalid_image(self) -> None:
+        """Test finalizing a file which is not an image is rejected."""
+        upload = self._start(size=10)
+        self._put(upload["id"], 0, b"0123456789")
+        response = self.client.post(
+            finalize_url(self.recipe.id, upload["id"])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.ImageUpload.objects.exists())
+
+    def test_upload_size_limited(self) -> None:
+        """Test uploads larger than the image size limit are rejected."""
+        with self.settings(RECIPE_IMAGE_UPLOAD_MAX_SIZE=10):
+            response = self.client.post(
+                uploads_url(self.recipe.id),
+                {"filename": "photo.png", "size": 11}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_limited_to_owner_user(self) -> None:
+        """Test other users can not write to an upload session."""
+        upload = self._start()
+        self.client.force_authenticate(
+            helpers.create_user(email="other@example.com")
+        )
+        response = self._put(upload["id"], 0, self.content)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
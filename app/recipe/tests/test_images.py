@@ -0,0 +1,153 @@
+"""
+Tests for the on demand recipe image variants.
+"""
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from recipe import images
+from utils import helpers
+
+
+class ImageVariantTests(TestCase):
+    """Test resizing and caching image variants."""
+
+    def setUp(self) -> None:
+        """Create a recipe with an image in a temporary media root."""
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        self.settings_override.enable()
+        self.recipe = helpers.create_recipe(user=helpers.create_user())
+        self.recipe.image.save("image.png", ContentFile(b""), save=False)
+        Image.new("RGB", (100, 50)).save(self.recipe.image.path)
+
+    def tearDown(self) -> None:
+        """Remove the temporary media root."""
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def _variant_size(self, name: str) -> tuple[int, int]:
+        """Return the size of the stored variant image."""
+        with Image.open(os.path.join(self.media_root.name, name)) as image:
+            return image.size
+
+    def test_variant_fits_box_and_keeps_ratio(self) -> None:
+        """Test variants fit in the requested box without upscaling."""
+        name = images.get_variant(self.recipe.image, width=50)
+
+        self.assertTrue(name.startswith("cache/recipe/"))
+        self.assertTrue(name.endswith(".png"))
+        self.assertEqual(self._variant_size(name), (50, 25))
+
+        name = images.get_variant(self.recipe.image, width=500, fmt="jpeg")
+
+        self.assertTrue(name.endswith(".jpg"))
+        self.assertEqual(self._variant_size(name), (100, 50))
+
+    def test_variant_cached(self) -> None:
+        """Test a variant is resized only once."""
+        with patch("recipe.images._resize", wraps=images._resize) as resize:
+            first = images.get_variant(self.recipe.image, height=10)
+            second = images.get_variant(self.recipe.image, height=10)
+
+        self.assertEqual(first, second)
+        self.assertEqual(resize.call_count, 1)
+
+    def test_concurrent_requests_coalesced(self) -> None:
+        """Test concurrent requests for a missing variant run one resize."""
+        def slow_resize(*args) -> None:
+            time.sleep(0.05)
+            resize(*args)
+
+        resize = images._resize
+        names = []
+
+        with patch("recipe.images._resize", side_effect=slow_resize) as mock:
+            threads = [
+                threading.Thread(target=lambda: names.append(
+                    images.get_variant(self.recipe.image, width=20)
+                ))
+                for _ in range(4)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(len(set(names)), 1)
+
+    def test_least_recently_used_variants_evicted(self) -> None:
+        """Test the cache evicts the oldest variants above its bound."""
+        old = images.get_variant(self.recipe.image, width=10)
+        old_path = os.path.join(self.media_root.name, old)
+        os.utime(old_path, (0, 0))
+        size = os.path.getsize(old_path)
+
+        with self.settings(RECIPE_IMAGE_CACHE_MAX_BYTES=size * 3 // 2):
+            new = images.get_variant(self.recipe.image, width=11)
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.media_root.name, new))
+        )
+
+    def test_recent_variants_not_evicted(self) -> None:
+        """Test variants used recently are kept above the bound, and the
+        cache is only walked once enough bytes were written."""
+        first = images.get_variant(self.recipe.image, width=10)
+        size = os.path.getsize(os.path.join(self.media_root.name, first))
+
+        with self.settings(RECIPE_IMAGE_CACHE_MAX_BYTES=size), \
+                patch("recipe.images._evict", wraps=images._evict) as evict:
+            images.get_variant(self.recipe.image, width=11)
+            images.get_variant(self.recipe.image, width=10)
+
+        evict.assert_called_once_with(size)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.media_root.name, first))
+        )
+
+    def test_hit_touch_keeps_modification_time(self) -> None:
+        """Test hits refresh the access time ordering the LRU but keep the
+        modification time validators derive from."""
+        name = images.get_variant(self.recipe.image, width=10)
+        path = os.path.join(self.media_root.name, name)
+        os.utime(path, (0, 1000))
+
+        images.get_variant(self.recipe.image, width=10)
+        stat = os.stat(path)
+
+        self.assertEqual(stat.st_mtime, 1000)
+        self.assertGreater(stat.st_atime, time.time() - 60)
+
+    def test_evicted_hit_resized_again(self) -> None:
+        """Test a variant evicted between the lookup and the touch of a hit
+        is resized again."""
+        name = images.get_variant(self.recipe.image, width=10)
+        path = os.path.join(self.media_root.name, name)
+        os.utime(path, (0, 0))
+
+        def evicted(path: str, **kwargs) -> None:
+            os.remove(path)
+            raise FileNotFoundError(path)
+
+        with patch("recipe.images.os.utime", side_effect=evicted), \
+                patch("recipe.images._resize",
+                      wraps=images._resize) as resize:
+            self.assertEqual(
+                images.get_variant(self.recipe.image, width=10), name
+            )
+
+        resize.assert_called_once()
@@ -3,12 +3,14 @@ Tests for Recipe APIs.
 """
 import os
 import tempfile
+import uuid
 
 from PIL import Image
 
 from decimal import Decimal
 
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
@@ -17,7 +19,9 @@ from rest_framework.response import Response
 
 
 from core import models
+from core.media import file_version
 from utils import helpers
+from utils.mixins import QueryBudgetTestMixin
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
@@ -38,7 +42,7 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTests(TestCase):
+class PrivateRecipeApiTests(QueryBudgetTestMixin, TestCase):
     """Test authenticated API requests."""
 
     def setUp(self) -> None:
@@ -49,6 +53,23 @@ class PrivateRecipeApiTests(TestCase):
 
         self.client.force_authenticate(self.user)
 
+    def _create_recipe_with_relations(self) -> None:
+        """Create a recipe with a tag and an ingredient."""
+        recipe = helpers.create_recipe(user=self.user)
+        recipe.tags.add(helpers.create_tag(user=self.user, name="Vegan"))
+        recipe.ingredients.add(
+            helpers.create_ingredient(user=self.user, name="Salt")
+        )
+
+    def test_list_query_budget(self) -> None:
+        """Test listing recipes runs the same queries whatever the number
+        of recipes, tags and ingredients."""
+        self._create_recipe_with_relations()
+
+        self.assertQueryBudget(RECIPE_URL, grow=lambda: [
+            self._create_recipe_with_relations() for _ in range(3)
+        ])
+
     def test_retrieve_recipes(self) -> None:
         """Test retrieving a list of recipes"""
         helpers.create_recipe(user=self.user)
@@ -587,6 +608,61 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(serializer_two.data, response.data)
         self.assertNotIn(serializer_three.data, response.data)
 
+    def test_filter_invalid_ids(self) -> None:
+        """Test malformed IDs are rejected before querying."""
+        response: Response = self.client.get(
+            RECIPE_URL, {"tags": "1,2"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tags", response.data)
+
+    @override_settings(FILTER_MAX_IDS=2)
+    def test_filter_max_ids(self) -> None:
+        """Test repeated IDs count once and more IDs than the maximum are
+        rejected."""
+        tag = helpers.create_tag(user=self.user, name="Dessert")
+        recipe = helpers.create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        response: Response = self.client.get(
+            RECIPE_URL, {"tags": f"{tag.id},{tag.id}, {tag.id.hex}"}
+        )
+
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.get(
+            RECIPE_URL,
+            {"ingredients": ",".join(str(uuid.uuid4()) for _ in range(3))}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ingredients", response.data)
+
+    @override_settings(API_MICROCACHE_SECONDS=1)
+    def test_microcache_headers(self) -> None:
+        """Test list and detail reads may be cached per token for the
+        micro-cache seconds, writes may not."""
+        recipe = helpers.create_recipe(user=self.user)
+
+        for url in (RECIPE_URL, helpers.recipe_detail_url(recipe.id)):
+            response: Response = self.client.get(url)
+
+            self.assertEqual(response["Cache-Control"], "max-age=1")
+            self.assertIn("Authorization", response["Vary"])
+
+        response = self.client.patch(
+            helpers.recipe_detail_url(recipe.id), {"title": "New"}
+        )
+
+        self.assertFalse(response.has_header("Cache-Control"))
+
+    def test_microcache_disabled(self) -> None:
+        """Test reads are not cacheable by default."""
+        response: Response = self.client.get(RECIPE_URL)
+
+        self.assertFalse(response.has_header("Cache-Control"))
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -627,6 +703,34 @@ class ImageUploadTests(TestCase):
         self.assertIn("image", response.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_computes_placeholders(self) -> None:
+        """Test uploading an image stores its placeholders."""
+        image_upload_url = helpers.image_upload_url(self.recipe.id)
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            Image.new("RGB", (64, 48), "#ff0000").save(image_file, "PNG")
+            image_file.seek(0)
+            response: Response = self.client.post(
+                image_upload_url,
+                data={"image": image_file},
+                format="multipart"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_color, "#ff0000")
+        self.assertEqual(len(self.recipe.image_placeholder), 28)
+        self.assertEqual(response.data["image_color"], "#ff0000")
+
+        list_response: Response = self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            list_response.data[0]["image_placeholder"],
+            self.recipe.image_placeholder
+        )
+
     def test_upload_image_bad_request(self) -> None:
         """Test uploading invalid image."""
         image_upload_url = helpers.image_upload_url(self.recipe.id)
@@ -640,3 +744,117 @@ class ImageUploadTests(TestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeImageTests(TestCase):
+    """Tests for the protected recipe image API."""
+
+    def setUp(self) -> None:
+        """Setup for test user, client and recipe with an image."""
+        self.client = APIClient()
+        self.user = helpers.create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = helpers.create_recipe(user=self.user)
+        self.recipe.image = SimpleUploadedFile(
+            "image.jpg", b"not really a jpeg", content_type="image/jpeg"
+        )
+        self.recipe.save()
+        self.image_url = helpers.image_url(self.recipe.id)
+
+    def tearDown(self) -> None:
+        """Logic runs after tests."""
+        self.recipe.image.delete()
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_image_accel_redirect(self) -> None:
+        """Test image is delegated to nginx with X-Accel-Redirect."""
+        response = self.client.get(
+            self.image_url,
+            {"v": file_version(self.recipe.image)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            f"/protected/media/{self.recipe.image.name}"
+        )
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", response)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=False)
+    def test_image_streamed_without_accel_redirect(self) -> None:
+        """Test image is streamed by Django when nginx is not in front."""
+        response = self.client.get(self.image_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertNotIn("Accept-Ranges", response)
+        self.assertEqual(b"".join(response.streaming_content),
+                         b"not really a jpeg")
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_image_not_modified(self) -> None:
+        """Test a matching If-None-Match returns 304."""
+        etag = self.client.get(self.image_url)["ETag"]
+        response = self.client.get(self.image_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_image_url_in_recipe_detail(self) -> None:
+        """Test recipe detail links to the versioned image endpoint."""
+        response: Response = self.client.get(
+            helpers.recipe_detail_url(self.recipe.id)
+        )
+
+        self.assertEqual(
+            response.data["image"],
+            "http://testserver" + self.image_url
+            + f"?v={file_version(self.recipe.image)}"
+        )
+
+    def test_image_limited_to_owner_user(self) -> None:
+        """Test other users can not get the recipe image."""
+        other_user = helpers.create_user(email="other@example.com")
+        self.client.force_authenticate(other_user)
+        response = self.client.get(self.image_url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_image_resized_variant(self) -> None:
+        """Test requesting a resized image returns a cached variant."""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+
+        with override_settings(MEDIA_ROOT=media_root.name):
+            os.makedirs(os.path.dirname(self.recipe.image.path))
+            image = Image.new("RGB", (40, 40))
+            image.save(self.recipe.image.path, format="JPEG")
+            response = self.client.get(
+                self.image_url, {"w": 20, "fmt": "webp"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["X-Accel-Redirect"].startswith(
+            "/protected/media/cache/recipe/"
+        ))
+        self.assertEqual(response["Content-Type"], "image/webp")
+
+    def test_image_invalid_variant_params(self) -> None:
+        """Test invalid resize parameters return 400."""
+        for params in ({"w": 0}, {"h": 100000}, {"fmt": "gif"}):
+            response = self.client.get(self.image_url, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_recipe_without_image(self) -> None:
+        """Test getting the image of a recipe without image returns 404."""
+        recipe = helpers.create_recipe(user=self.user)
+        response = self.client.get(helpers.image_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
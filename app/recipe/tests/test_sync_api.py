@@ -0,0 +1,132 @@
+"""
+Tests for the delta sync API.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.response import Response
+
+from core import models
+from utils import helpers
+from utils.mixins import QueryBudgetTestMixin
+
+SYNC_URL = reverse("recipe:sync")
+
+
+class SyncApiTests(QueryBudgetTestMixin, TestCase):
+    """Test syncing changes since a cursor."""
+
+    def setUp(self) -> None:
+        """Setup for authenticated user and test client."""
+        self.client = APIClient()
+        self.user = helpers.create_user()
+        self.client.force_authenticate(self.user)
+
+    def _sync_later(self, cursor: str, seconds=60) -> Response:
+        """Sync with a cursor while the clock is moved forward."""
+        later = timezone.now() + timedelta(seconds=seconds)
+
+        with patch("django.utils.timezone.now", return_value=later):
+            return self.client.get(SYNC_URL, {"since": cursor})
+
+    def test_sync_query_budget(self) -> None:
+        """Test syncing runs the same queries whatever the number of
+        changes."""
+        def grow() -> None:
+            for i in range(3):
+                recipe = helpers.create_recipe(user=self.user)
+                recipe.tags.add(
+                    helpers.create_tag(user=self.user, name=f"tag{i}")
+                )
+
+        grow()
+
+        self.assertQueryBudget(SYNC_URL, grow=grow)
+
+    def test_full_sync_without_cursor(self) -> None:
+        """Test syncing without cursor returns every object."""
+        recipe = helpers.create_recipe(user=self.user)
+        tag = helpers.create_tag(user=self.user, name="Vegan")
+        helpers.create_recipe(
+            user=helpers.create_user(email="other@example.com")
+        )
+        response: Response = self.client.get(SYNC_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["full"])
+        self.assertEqual(
+            [item["id"] for item in response.data["recipes"]], [str(recipe.id)]
+        )
+        self.assertEqual(response.data["tags"][0]["id"], str(tag.id))
+        self.assertIn("cursor", response.data)
+
+    def test_delta_sync_returns_only_changes(self) -> None:
+        """Test syncing with a cursor skips unchanged objects."""
+        old_recipe = helpers.create_recipe(user=self.user)
+        cursor = self.client.get(SYNC_URL).data["cursor"]
+        models.Recipe.objects.filter(id=old_recipe.id).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+        later = timezone.now() + timedelta(minutes=1)
+
+        with patch("django.utils.timezone.now", return_value=later):
+            new_recipe = helpers.create_recipe(user=self.user)
+
+        response = self._sync_later(cursor, seconds=120)
+
+        self.assertFalse(response.data["full"])
+        self.assertEqual(
+            [item["id"] for item in response.data["recipes"]],
+            [str(new_recipe.id)]
+        )
+
+    def test_deleted_recipe_reported(self) -> None:
+        """Test recipes deleted through the API are reported."""
+        recipe = helpers.create_recipe(user=self.user)
+        cursor = self.client.get(SYNC_URL).data["cursor"]
+        self.client.delete(helpers.recipe_detail_url(recipe.id))
+        response = self._sync_later(cursor)
+
+        self.assertEqual(response.data["deleted"]["recipe"], [recipe.id])
+        self.assertEqual(response.data["recipes"], [])
+
+    def test_deleted_tag_reported_and_recipe_changed(self) -> None:
+        """Test deleting a tag reports it and the recipes it was on."""
+        tag = helpers.create_tag(user=self.user, name="Dessert")
+        recipe = helpers.create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        models.Recipe.objects.filter(id=recipe.id).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+        cursor = self.client.get(SYNC_URL).data["cursor"]
+
+        with patch("django.utils.timezone.now",
+                   return_value=timezone.now() + timedelta(seconds=30)):
+            self.client.delete(helpers.tag_detail_url(tag.id))
+
+        response = self._sync_later(cursor)
+
+        self.assertEqual(response.data["deleted"]["tag"], [tag.id])
+        self.assertEqual(response.data["recipes"][0]["tags"], [])
+
+    def test_invalid_cursor(self) -> None:
+        """Test a tampered cursor returns 400."""
+        response = self.client.get(SYNC_URL, {"since": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_cursor_full_sync(self) -> None:
+        """Test cursors older than the tombstone retention get a full
+        sync."""
+        helpers.create_recipe(user=self.user)
+        cursor = self.client.get(SYNC_URL).data["cursor"]
+        response = self._sync_later(cursor, seconds=60 * 60 * 24 * 31)
+
+        self.assertTrue(response.data["full"])
+        self.assertEqual(len(response.data["recipes"]), 1)
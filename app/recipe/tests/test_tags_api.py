@@ -13,6 +13,7 @@ from rest_framework.response import Response
 from core import models
 from recipe.serializers import TagSerializer
 from utils import helpers
+from utils.mixins import QueryBudgetTestMixin
 
 TAGS_URL = reverse("recipe:tag-list")
 
@@ -31,7 +32,7 @@ class PublicTagsApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTests(TestCase):
+class PrivateTagsApiTests(QueryBudgetTestMixin, TestCase):
     """Test authenticated API requests"""
 
     def setUp(self) -> None:
@@ -40,6 +41,16 @@ class PrivateTagsApiTests(TestCase):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
+    def test_list_query_budget(self) -> None:
+        """Test listing tags runs the same queries whatever the number of
+        tags."""
+        helpers.create_tag(user=self.user, name="tag1")
+
+        self.assertQueryBudget(TAGS_URL, grow=lambda: [
+            helpers.create_tag(user=self.user, name=f"tag{i}")
+            for i in range(2, 5)
+        ])
+
     def test_retrieve_tags(self) -> None:
         """Test retrieving a list of tags."""
         helpers.create_tag(user=self.user, name="tag1")
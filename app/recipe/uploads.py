@@ -0,0 +1,149 @@
+"""
+Resumable chunked uploads of recipe images.
+"""
+import fcntl
+import os
+import re
+from typing import IO
+
+from PIL import Image
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from core.models import ImageUpload, Recipe, recipe_image_file_path
+from core.placeholders import image_placeholders
+
+CHUNK_READ_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadError(Exception):
+    """Upload can not proceed, message is safe to show to the client."""
+
+
+def parse_content_range(header: str | None) -> tuple[int, int]:
+    """Return the first byte position and the length of a chunk from its
+    Content-Range header."""
+    match = CONTENT_RANGE.match(header or "")
+
+    if match is None:
+        raise UploadError(
+            "Content-Range header must be 'bytes start-end/size'."
+        )
+
+    start, end = int(match[1]), int(match[2])
+
+    if end < start:
+        raise UploadError("Content-Range end is before its start.")
+
+    return start, end - start + 1
+
+
+def _receive(stream: IO | None, fd: int, position: int, length: int) -> int:
+    """Stream up to length bytes into the file at the position and return
+    how many were received before the stream ended or the read was
+    interrupted."""
+    received = 0
+
+    while stream is not None and received < length:
+        try:
+            data = stream.read(min(CHUNK_READ_SIZE, length - received))
+        except OSError:
+            break
+
+        if not data:
+            break
+
+        view = memoryview(data)
+
+        while view:
+            written = os.pwrite(fd, view, position + received)
+            received += written
+            view = view[written:]
+
+    return received
+
+
+def write_chunk(upload: ImageUpload, stream: IO | None, start: int,
+                length: int) -> int | None:
+    """Write the chunk from the request stream into the part file at its
+    offset and return the new upload offset, or None when another chunk
+    is being written or claimed the offset first. Bytes received before an
+    interrupted read are kept, so the client resumes from where the transfer
+    stopped.
+
+    Writers of an upload are serialized by a lock on its part file, no
+    transaction or row lock is held while the chunk is read from the
+    client. The offset is advanced with a conditional UPDATE once the bytes
+    are in the part file, so it never runs ahead of them and a killed
+    request leaves the last committed offset to resume from."""
+    os.makedirs(os.path.dirname(upload.part_path), exist_ok=True)
+    fd = os.open(upload.part_path, os.O_WRONLY | os.O_CREAT, 0o640)
+
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        if not ImageUpload.objects.filter(
+                id=upload.id, offset=start).exists():
+            return None
+
+        received = _receive(stream, fd, start, length)
+        advanced = ImageUpload.objects.filter(
+            id=upload.id, offset=start
+        ).update(offset=start + received, updated_at=timezone.now())
+    finally:
+        os.close(fd)
+
+    return start + received if advanced else None
+
+
+def finalize(upload: ImageUpload) -> Recipe | None:
+    """Verify the completed upload and attach it to the recipe by renaming
+    the part file into the recipe images directory. Returns None when a
+    concurrent request finalized the upload first.
+
+    The upload is claimed by deleting its row, so only one request moves
+    its part file."""
+    claimed, _ = ImageUpload.objects.filter(
+        id=upload.id, offset=upload.size
+    ).delete()
+
+    if not claimed:
+        return None
+
+    try:
+        with Image.open(upload.part_path) as image:
+            image.verify()
+    except (OSError, SyntaxError):
+        try:
+            os.remove(upload.part_path)
+        except FileNotFoundError:
+            pass
+
+        raise UploadError("Upload a valid image.")
+
+    recipe = upload.recipe
+    name = recipe_image_file_path(recipe, upload.filename)
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(upload.part_path, path)
+    # Renaming keeps the time of the first chunk, gc_media must not take
+    # the new image for an old orphan.
+    os.utime(path)
+
+    if recipe.image:
+        recipe.image.delete(save=False)
+
+    recipe.image.name = name
+
+    with open(path, "rb") as file:
+        recipe.image_placeholder, recipe.image_color = \
+            image_placeholders(file)
+
+    recipe.save()
+
+    return recipe
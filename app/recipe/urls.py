@@ -15,5 +15,7 @@ router.register("/tags", viewset=views.TagViewSet)
 router.register("/ingredients", viewset=views.IngredientViewSet)
 
 urlpatterns = [
+    path("/sync", views.SyncView.as_view(), name="sync"),
+    path("/events", views.recipe_events, name="events"),
     path("", include(router.urls)),
 ]
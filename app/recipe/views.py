@@ -8,29 +8,125 @@ from drf_spectacular.utils import (
 )
 from drf_spectacular.types import OpenApiTypes
 
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
 from rest_framework import viewsets, mixins, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.request import Request
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.parsers import FileUploadParser
+from rest_framework.views import APIView
 
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
     TagSerializer,
     IngredientSerializer,
-    RecipeImageSerializer)
+    RecipeImageSerializer,
+    RecipeImageVariantSerializer,
+    ImageUploadSerializer,
+    SyncSerializer)
+from recipe.filters import parse_uuid_list
+from recipe.images import get_variant
+from recipe import uploads
 
-from core.models import Recipe, Tag, Ingredient
+from core import events
+from core.media import file_version, protected_media_response
+from core.timeouts import StatementTimeoutMixin
+from core.timing import TimedAuthenticationMixin
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+    ImageUpload,
+    Tombstone,
+    User
+)
 
 
-class AuthenticationPermissionMixin:
-    """Token auth and authentication requirement"""
+class AuthenticationPermissionMixin(
+    StatementTimeoutMixin, TimedAuthenticationMixin
+):
+    """Token auth and authentication requirement, with database
+    timeouts"""
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
 
+class MicrocacheMixin:
+    """Let the nginx micro-cache reuse successful reads of the same token
+    for API_MICROCACHE_SECONDS. Shared caches never store them, responses
+    to requests with an Authorization header need public to be stored."""
+    microcache_actions = ("list", "retrieve")
+
+    def finalize_response(self, request: Request, response: Response,
+                          *args, **kwargs) -> Response:
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+
+        if settings.API_MICROCACHE_SECONDS \
+                and request.method == "GET" \
+                and self.action in self.microcache_actions \
+                and response.status_code == status.HTTP_200_OK \
+                and not response.has_header("Cache-Control"):
+            patch_cache_control(
+                response, max_age=settings.API_MICROCACHE_SECONDS
+            )
+            patch_vary_headers(response, ("Authorization",))
+
+        return response
+
+
+class TombstoneMixin:
+    """Record deleted objects so syncing clients learn about deletions."""
+
+    def perform_destroy(self, instance: Model) -> None:
+        """Delete the object and leave a tombstone in its place."""
+        with transaction.atomic():
+            Tombstone.objects.create(
+                user=instance.user,
+                model=instance._meta.model_name,
+                object_id=instance.pk
+            )
+            instance.delete()
+
+
+class MediaContentNegotiation(BaseContentNegotiation):
+    """Skip Accept header matching for file responses, image clients rarely
+    ask for JSON."""
+
+    def select_parser(self, request: Request, parsers: list):
+        return parsers[0]
+
+    def select_renderer(
+            self, request: Request, renderers: list, format_suffix=None
+    ) -> tuple:
+        return renderers[0], renderers[0].media_type
+
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -43,13 +139,16 @@ class AuthenticationPermissionMixin:
     )
 )
 class BaseRecipeActionsViewSet(
+    MicrocacheMixin,
     AuthenticationPermissionMixin,
+    TombstoneMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
 ):
     """Base viewset with action and auth/permission classes."""
+    query_budget = {"list": 4}
 
     def get_queryset(self):
         """Filter and retrieve ingredients/tags by assigned recipes for
@@ -65,6 +164,18 @@ class BaseRecipeActionsViewSet(
         return queryset.filter(user=self.request.user)\
             .order_by("name").distinct()
 
+    def perform_update(self, serializer) -> None:
+        """Update the object and mark recipes embedding it as changed."""
+        super().perform_update(serializer)
+        serializer.instance.recipe_set.update(updated_at=timezone.now())
+
+    def perform_destroy(self, instance: Tag | Ingredient) -> None:
+        """Delete the object and mark the recipes it was removed from as
+        changed."""
+        with transaction.atomic():
+            instance.recipe_set.update(updated_at=timezone.now())
+            super().perform_destroy(instance)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -72,24 +183,44 @@ class BaseRecipeActionsViewSet(
             OpenApiParameter(
                 "tags",
                 OpenApiTypes.STR,
-                description="Comma separated list of tags IDs to filter"
+                description="Comma separated list of tags IDs to filter, at "
+                f"most {settings.FILTER_MAX_IDS}"
             ),
             OpenApiParameter(
                 "ingredients",
                 OpenApiTypes.STR,
-                description="Comma separated list of ingredients IDs to filter"
+                description="Comma separated list of ingredients IDs to "
+                f"filter, at most {settings.FILTER_MAX_IDS}"
             )
         ]
+    ),
+    image=extend_schema(
+        parameters=[RecipeImageVariantSerializer],
+        responses={(200, "image/*"): OpenApiTypes.BINARY}
     )
 )
-class RecipeViewSet(AuthenticationPermissionMixin, viewsets.ModelViewSet):
+class RecipeViewSet(
+    MicrocacheMixin,
+    AuthenticationPermissionMixin,
+    TombstoneMixin,
+    viewsets.ModelViewSet
+):
     """View for manage Recipe APIs."""
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
+    query_budget = {"list": 6, "retrieve": 6, "image": 4}
+    # Filters of many tags or ingredients must not hold a connection.
+    statement_timeout = {"list": 2000}
+    throttle_scopes = {
+        "upload_image": "upload",
+        "create_upload": "upload",
+        "upload_chunk": "upload",
+        "finalize_upload": "upload",
+    }
 
-    def _params_to_list(self, queryset: str) -> list[str]:
-        """Create and return a list of id strings"""
-        return [idx.strip() for idx in queryset.split(",")]
+    def _params_to_list(self, name: str, value: str) -> list[UUID]:
+        """Return the validated and deduplicated IDs of a filter."""
+        return parse_uuid_list(name, value)
 
     def get_queryset(self):
         """Filter and retrieve recipes by tags/ingredients for
@@ -99,12 +230,16 @@ class RecipeViewSet(AuthenticationPermissionMixin, viewsets.ModelViewSet):
         queryset = self.queryset
 
         if tags:
-            tags_ids = self._params_to_list(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
+            tags_ids = self._params_to_list("tags", tags)
+            queryset = queryset.filter(tags__id__any=tags_ids)
 
         if ingredients:
-            ingredients_ids = self._params_to_list(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            ingredients_ids = self._params_to_list("ingredients", ingredients)
+            queryset = queryset.filter(ingredients__id__any=ingredients_ids)
+
+        if self.action in ("list", "retrieve", "update", "partial_update"):
+            # Serializers of these actions embed the tags and ingredients.
+            queryset = queryset.prefetch_related("tags", "ingredients")
 
         return queryset.filter(user=self.request.user)\
             .order_by("-created_at").distinct()
@@ -115,6 +250,8 @@ class RecipeViewSet(AuthenticationPermissionMixin, viewsets.ModelViewSet):
             return RecipeSerializer
         elif self.action == "upload_image":
             return RecipeImageSerializer
+        elif self.action in ("create_upload", "upload_chunk"):
+            return ImageUploadSerializer
 
         return self.serializer_class
 
@@ -135,6 +272,133 @@ class RecipeViewSet(AuthenticationPermissionMixin, viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _get_upload(self, upload_id: str) -> ImageUpload:
+        """Retrieve the upload session of the requested recipe."""
+        return get_object_or_404(
+            ImageUpload, id=upload_id, recipe=self.get_object()
+        )
+
+    @action(methods=["POST"], detail=True, url_path="uploads")
+    def create_upload(self, request: Request, pk=None) -> Response:
+        """Start a resumable image upload of the recipe."""
+        recipe: Recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user, recipe=recipe)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        methods=["GET", "PUT"],
+        detail=True,
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)",
+        parser_classes=(FileUploadParser,)
+    )
+    def upload_chunk(self, request: Request, pk=None,
+                     upload_id=None) -> Response:
+        """Return the upload offset, or write the chunk starting at the
+        upload offset with a Content-Range header."""
+        upload = self._get_upload(upload_id)
+
+        if request.method == "PUT":
+            try:
+                start, length = uploads.parse_content_range(
+                    request.headers.get("Content-Range")
+                )
+            except uploads.UploadError as error:
+                return Response({"detail": str(error)},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            if start != upload.offset or start + length > upload.size:
+                return Response(
+                    {"detail": "Chunk does not continue the upload.",
+                     "offset": upload.offset},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            offset = uploads.write_chunk(
+                upload, request.stream, start, length
+            )
+
+            if offset is None:
+                upload.refresh_from_db()
+
+                return Response(
+                    {"detail": "Chunk does not continue the upload.",
+                     "offset": upload.offset},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            upload.offset = offset
+
+        return Response(self.get_serializer(upload).data)
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/finalize",
+        serializer_class=RecipeImageSerializer
+    )
+    def finalize_upload(self, request: Request, pk=None,
+                        upload_id=None) -> Response:
+        """Attach the completed upload to the recipe as its image."""
+        upload = self._get_upload(upload_id)
+
+        if upload.offset != upload.size:
+            return Response(
+                {"detail": "Upload is not complete.",
+                 "offset": upload.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            recipe = uploads.finalize(upload)
+        except uploads.UploadError as error:
+            return Response({"detail": str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if recipe is None:
+            raise Http404("Upload was already finalized.")
+
+        return Response(self.get_serializer(recipe).data)
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        content_negotiation_class=MediaContentNegotiation
+    )
+    def image(self, request: Request, pk=None):
+        """Serve the recipe image to its owner, resized to fit in the
+        requested width and height and converted to the requested format.
+        Responses are cached permanently when the current image version is
+        requested."""
+        recipe: Recipe = self.get_object()
+
+        if not recipe.image:
+            raise Http404("Recipe has no image.")
+
+        params = RecipeImageVariantSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        version = params.validated_data.pop("v", None)
+        name = recipe.image.name
+
+        if params.validated_data:
+            try:
+                name = get_variant(
+                    recipe.image,
+                    width=params.validated_data.get("w"),
+                    height=params.validated_data.get("h"),
+                    fmt=params.validated_data.get("fmt")
+                )
+            except FileNotFoundError:
+                raise Http404("File not found.")
+
+        return protected_media_response(
+            request,
+            name,
+            immutable=version == file_version(recipe.image)
+        )
+
 
 class TagViewSet(BaseRecipeActionsViewSet):
     """View for manage Tag APIs."""
@@ -146,3 +410,127 @@ class IngredientViewSet(BaseRecipeActionsViewSet):
     """View for manage Ingredient APIs"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "since",
+            OpenApiTypes.STR,
+            description="Cursor of the previous sync, full sync without it."
+        )
+    ],
+    responses=SyncSerializer
+)
+class SyncView(AuthenticationPermissionMixin, APIView):
+    """View for syncing recipes, tags and ingredients changed since a
+    cursor."""
+    cursor_salt = "recipe.sync"
+    query_budget = {"get": 9}
+
+    def _parse_cursor(self, cursor: str | None) -> datetime | None:
+        """Return the time the cursor was issued at."""
+        if not cursor:
+            return None
+
+        try:
+            issued_at = signing.loads(cursor, salt=self.cursor_salt)
+        except signing.BadSignature:
+            raise ValidationError({"since": "Invalid sync cursor."})
+
+        return datetime.fromisoformat(issued_at)
+
+    def get(self, request: Request) -> Response:
+        """Return objects changed and deleted since the cursor. The cursor
+        overlaps the previous sync by SYNC_CURSOR_OVERLAP seconds, so rows
+        committed late by concurrent transactions are not missed. Cursors
+        older than the tombstone retention get a full sync."""
+        now = timezone.now()
+        since = self._parse_cursor(request.query_params.get("since"))
+
+        if since is not None and since < now - timedelta(
+                days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            since = None
+        recipes = Recipe.objects.filter(user=request.user)\
+            .prefetch_related("tags", "ingredients")
+        tags = Tag.objects.filter(user=request.user)
+        ingredients = Ingredient.objects.filter(user=request.user)
+        tombstones = Tombstone.objects.none()
+
+        if since is not None:
+            since -= timedelta(seconds=settings.SYNC_CURSOR_OVERLAP)
+            recipes = recipes.filter(updated_at__gt=since)
+            tags = tags.filter(updated_at__gt=since)
+            ingredients = ingredients.filter(updated_at__gt=since)
+            tombstones = Tombstone.objects.filter(
+                user=request.user, deleted_at__gt=since
+            )
+
+        deleted = {model: [] for model, _ in Tombstone.MODEL_CHOICES}
+
+        for model, object_id in tombstones.values_list("model", "object_id"):
+            deleted[model].append(object_id)
+
+        context = {"request": request}
+
+        return Response({
+            "cursor": signing.dumps(now.isoformat(), salt=self.cursor_salt),
+            "full": since is None,
+            "recipes": RecipeDetailSerializer(
+                recipes, many=True, context=context).data,
+            "tags": TagSerializer(tags, many=True).data,
+            "ingredients": IngredientSerializer(ingredients, many=True).data,
+            "deleted": deleted,
+        })
+
+
+async def _token_user(request: HttpRequest) -> User | None:
+    """Return the active user of the request's auth token."""
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+
+    if keyword != "Token" or not key:
+        return None
+
+    try:
+        token = await Token.objects.select_related("user").aget(key=key)
+    except Token.DoesNotExist:
+        return None
+
+    return token.user if token.user.is_active else None
+
+
+async def recipe_events(request: HttpRequest) -> HttpResponse:
+    """Stream recipe, tag and ingredient change events of the authenticated
+    user as Server-Sent Events. Only served by the ASGI application, a WSGI
+    worker would be held for the whole connection."""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "Events are served by the ASGI application."},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+
+    user = await _token_user(request)
+
+    if user is None:
+        return JsonResponse(
+            {"detail": "Invalid or missing token."},
+            status=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Token"}
+        )
+
+    try:
+        subscription = events.broker.subscribe(user.pk)
+    except events.TooManySubscribers:
+        return JsonResponse(
+            {"detail": "Too many event subscribers, retry later."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "5"}
+        )
+
+    response = StreamingHttpResponse(
+        events.stream(subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+
+    return response
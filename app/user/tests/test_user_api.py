@@ -8,6 +8,7 @@ from rest_framework import status
 
 from core.models import User
 from utils.helpers import create_user
+from utils.mixins import QueryBudgetTestMixin
 
 from rest_framework.response import Response
 
@@ -177,3 +178,19 @@ class PublicUserApiTests(TestCase):
             self.assertEqual(self.user.first_name, payload["first_name"])
             self.assertTrue(self.user.check_password(payload["password"]))
             self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class UserQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Test the query budget of the user API."""
+
+    def setUp(self) -> None:
+        """Setup for authenticated user and test client."""
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_me_query_budget(self) -> None:
+        """Test retrieving the profile stays within its query budget."""
+        self.assertQueryBudget(ME_URL, grow=lambda: [
+            create_user(email=f"user{i}@example.com") for i in range(3)
+        ])
@@ -5,6 +5,8 @@ from rest_framework import generics, authentication, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.timeouts import StatementTimeoutMixin
+from core.timing import TimedAuthenticationMixin
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
@@ -15,6 +17,8 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for authenticated user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = "login"
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -22,9 +26,11 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(StatementTimeoutMixin, TimedAuthenticationMixin,
+                     generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
+    query_budget = {"get": 3}
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
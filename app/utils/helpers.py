@@ -14,6 +14,11 @@ def image_upload_url(recipe_id) -> str:
     return reverse("recipe:recipe-upload-image", args=(recipe_id,))
 
 
+def image_url(recipe_id) -> str:
+    """Create and return a recipe image URL."""
+    return reverse("recipe:recipe-image", args=(recipe_id,))
+
+
 def recipe_detail_url(recipe_id) -> str:
     """Create and return a recipe detail URL."""
     return reverse("recipe:recipe-detail", args=(recipe_id,))
@@ -0,0 +1,37 @@
+"""
+Test case mixins.
+"""
+from typing import Callable
+
+from django.db import connection
+
+from core.middleware import QueryStats
+from core.query_budget import budgeted, query_budget
+
+
+class QueryBudgetTestMixin:
+    """Assert API views stay within their query budget whatever the amount
+    of data."""
+
+    def assertQueryBudget(self, url: str, grow: Callable[[], None],
+                          method: str = "get", **kwargs) -> None:
+        """Request the url before and after grow() added data. The query
+        count must be within the budget of the view and must not grow with
+        the data."""
+        request = getattr(self.client, method)
+        # Counted like QueryBudgetMiddleware counts them.
+        before, after = QueryStats(budgeted), QueryStats(budgeted)
+
+        with connection.execute_wrapper(before):
+            response = request(url, **kwargs)
+
+        budget = query_budget(response.wsgi_request)
+        grow()
+
+        with connection.execute_wrapper(after):
+            request(url, **kwargs)
+
+        self.assertIsNotNone(budget, f"{url} has no query budget.")
+        self.assertLessEqual(after.count, budget[1])
+        self.assertEqual(before.count, after.count,
+                         "Query count grows with the amount of data.")
@@ -1,8 +1,45 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /files {
-        alias /vol/static;
+    sendfile    on;
+    tcp_nopush  on;
+
+    # collectstatic writes .gz copies of compressible files.
+    location /files/static {
+        alias       /vol/static/static;
+        gzip_static on;
+        gzip_vary   on;
+    }
+
+    # Media files are only reachable through X-Accel-Redirect responses of
+    # the API after Django checked the ownership. nginx keeps the
+    # Cache-Control header of the API response and answers ETag and Range
+    # requests itself.
+    location /protected/media/ {
+        internal;
+        alias       /vol/static/media/;
+        etag        on;
+        max_ranges  16;
+    }
+
+    # Server-Sent Events are served by the ASGI application, responses must
+    # reach the client unbuffered and connections stay open for minutes.
+    location /api/recipe/events {
+        proxy_pass              http://${EVENTS_HOST}:${EVENTS_PORT};
+        proxy_http_version      1.1;
+        proxy_set_header        Connection "";
+        proxy_set_header        Host $host;
+        proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header        X-Request-Start "t=$msec";
+        proxy_buffering         off;
+        proxy_read_timeout      1h;
+    }
+
+    # Probes run every few seconds, keep them out of the access log.
+    location /api/health/ {
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
+        access_log              off;
     }
 
     location / {
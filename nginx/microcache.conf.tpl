@@ -0,0 +1,122 @@
+# Selected by run.sh with NGINX_MODE=microcache. The application is reached
+# over HTTP through the uwsgi HTTP router, so upstream connections are kept
+# alive, and authenticated API reads are cached for the seconds the
+# application allows in Cache-Control.
+
+upstream app {
+    server              ${APP_HOST}:${APP_HTTP_PORT};
+    keepalive           32;
+    keepalive_requests  1000;
+    keepalive_timeout   60s;
+}
+
+# Entries are keyed on the Authorization header, so a token only ever reads
+# its own responses. Keys hold tokens, the cache stays in the container's
+# /tmp and is never written to a volume.
+proxy_cache_path /tmp/nginx/api levels=1:2 keys_zone=api:10m max_size=256m
+                 inactive=1m use_temp_path=off;
+
+# Anonymous requests are neither cached nor answered from the cache, clients
+# sending Cache-Control: no-cache skip the cache too.
+map $http_authorization $api_cache_skip {
+    ""          1;
+    default     0;
+}
+
+map $http_cache_control $api_cache_refresh {
+    ~*no-cache  1;
+    default     0;
+}
+
+server {
+    listen ${LISTEN_PORT};
+
+    sendfile    on;
+    tcp_nopush  on;
+
+    gzip                on;
+    gzip_comp_level     5;
+    gzip_min_length     1024;
+    gzip_proxied        any;
+    gzip_vary           on;
+    gzip_types          application/json application/vnd.oai.openapi+json
+                        application/javascript text/css image/svg+xml;
+
+    # Descriptors and metadata of static and media files are reused instead
+    # of being looked up on every request.
+    open_file_cache             max=10000 inactive=60s;
+    open_file_cache_valid       60s;
+    open_file_cache_min_uses    2;
+    open_file_cache_errors      on;
+
+    # Every location inherits these headers, clients can not pass their own
+    # X-Forwarded-For or X-Request-Start. A location setting any header must
+    # repeat them all.
+    proxy_http_version      1.1;
+    proxy_set_header        Connection "";
+    proxy_set_header        Host $host;
+    proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+    proxy_set_header        X-Forwarded-Proto $scheme;
+    # Time nginx received the request, load shedding measures the time it
+    # waited for a uwsgi worker.
+    proxy_set_header        X-Request-Start "t=$msec";
+
+    # Typical API responses fit the buffers, larger ones spill to disk
+    # instead of holding a worker while slow clients read.
+    proxy_buffer_size       16k;
+    proxy_buffers           32 16k;
+    proxy_busy_buffers_size 64k;
+
+    # collectstatic writes .gz copies of compressible files.
+    location /files/static {
+        alias       /vol/static/static;
+        gzip_static on;
+        gzip_vary   on;
+    }
+
+    # Media files are only reachable through X-Accel-Redirect responses of
+    # the API after Django checked the ownership. nginx keeps the
+    # Cache-Control header of the API response and answers ETag and Range
+    # requests itself.
+    location /protected/media/ {
+        internal;
+        alias       /vol/static/media/;
+        etag        on;
+        max_ranges  16;
+    }
+
+    # Server-Sent Events are served by the ASGI application, responses must
+    # reach the client unbuffered and connections stay open for minutes.
+    location /api/recipe/events {
+        proxy_pass              http://${EVENTS_HOST}:${EVENTS_PORT};
+        proxy_buffering         off;
+        proxy_read_timeout      1h;
+    }
+
+    # Probes run every few seconds, keep them out of the access log.
+    location /api/health/ {
+        proxy_pass              http://app;
+        access_log              off;
+    }
+
+    # Only responses with a Cache-Control max-age are stored, one request
+    # per key refreshes an expired entry while the others wait for it.
+    # X-Accel-Redirect responses are left to the media location.
+    location /api/ {
+        proxy_pass              http://app;
+        client_max_body_size    16M;
+
+        proxy_cache             api;
+        proxy_cache_key         "$http_authorization$request_uri";
+        proxy_cache_bypass      $api_cache_skip $api_cache_refresh;
+        proxy_no_cache          $api_cache_skip $upstream_http_x_accel_redirect;
+        proxy_cache_lock        on;
+        proxy_cache_lock_timeout 5s;
+        add_header              X-Cache-Status $upstream_cache_status always;
+    }
+
+    location / {
+        proxy_pass              http://app;
+        client_max_body_size    16M;
+    }
+}
@@ -2,5 +2,15 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# NGINX_MODE=microcache proxies HTTP with upstream keepalive and caches API
+# reads, the default passes requests over the uwsgi protocol.
+case "${NGINX_MODE:-uwsgi}" in
+    microcache) template=/etc/nginx/microcache.conf.tpl ;;
+    uwsgi) template=/etc/nginx/default.conf.tpl ;;
+    *) echo "Unknown NGINX_MODE ${NGINX_MODE}" >&2; exit 1 ;;
+esac
+
+# Only substitute our variables, nginx variables like $host must stay as is.
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT} ${APP_HTTP_PORT} ${EVENTS_HOST} ${EVENTS_PORT}' \
+    < "$template" > /etc/nginx/conf.d/default.conf
 nginx -g 'daemon off;'
\ No newline at end of file
@@ -0,0 +1,8 @@
+#!/bin/sh
+# One-off release step, runs before the new version starts serving.
+set -e
+python manage.py wait_for_db --timeout 120
+python manage.py makemigrations --check --dry-run
+python manage.py migrate_locked
+python manage.py collectstatic --noinput
+python manage.py build_schema
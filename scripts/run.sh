@@ -1,8 +1,19 @@
 #!/bin/sh
+# Boot path of a serving replica, migrations and static files are handled
+# by release.sh.
 set -e
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py makemigrations
-python manage.py migrate
+export BOOT_STARTED_AT="$(date +%s.%N)"
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# uwsgi.ini settings, see the comments there.
+export WSGI_SOCKET="${WSGI_SOCKET:-:9000}"
+export WSGI_HTTP_SOCKET="${WSGI_HTTP_SOCKET:-:9002}"
+export WSGI_MIN_WORKERS="${WSGI_MIN_WORKERS:-2}"
+export WSGI_MAX_WORKERS="${WSGI_MAX_WORKERS:-8}"
+export WSGI_HARAKIRI="${WSGI_HARAKIRI:-30}"
+export WSGI_MAX_REQUESTS="${WSGI_MAX_REQUESTS:-5000}"
+export WSGI_RELOAD_ON_RSS="${WSGI_RELOAD_ON_RSS:-256}"
+export WSGI_LISTEN_BACKLOG="${WSGI_LISTEN_BACKLOG:-100}"
+
+python manage.py wait_for_db --migrations --timeout 300
+
+exec uwsgi --ini /scripts/uwsgi.ini